@@ -0,0 +1,93 @@
+"""
+Задержка цикла событий asyncio при интенсивном логировании из корутин: синхронные обработчики PyTraceLog и
+асинхронный режим (`PyTraceLog.init_async_logging`).
+
+Записи выводятся в медленный поток (каждый вызов `write()` занимает WRITE_DELAY, как при заполненном канале
+stdout). Фоновая задача каждые TICK секунд измеряет отставание пробуждения от расписания.
+
+Запуск: python -m benchmarks.bench_event_loop_lag
+"""
+import asyncio
+import logging
+import time
+from io import StringIO
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.handlers import StdoutHandler
+
+
+DURATION = 2.0
+TICK = 0.001
+WRITE_DELAY = 0.0002
+PRODUCERS = 10
+# Записей за один шаг каждой задачи
+RECORDS_PER_STEP = 10
+
+
+class SlowStream(StringIO):
+    def write(self, s):
+        time.sleep(WRITE_DELAY)
+        return len(s)
+
+
+async def measure_lag(lags, stop_at):
+    loop = asyncio.get_running_loop()
+    while loop.time() < stop_at:
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - expected)
+
+
+async def produce(counter, stop_at):
+    loop = asyncio.get_running_loop()
+    logger = logging.getLogger('bench.producer')
+    while loop.time() < stop_at:
+        for _ in range(RECORDS_PER_STEP):
+            logger.info('request %s processed', counter[0])
+            counter[0] += 1
+        await asyncio.sleep(0)
+
+
+async def run():
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + DURATION
+    lags = list()
+    counter = [0]
+    await asyncio.gather(measure_lag(lags, stop_at), *(produce(counter, stop_at) for _ in range(PRODUCERS)))
+    return lags, counter[0]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def bench(async_mode):
+    PyTraceLog.init_root_logger(level='INFO')
+    for handler in PyTraceLog._handlers:
+        if isinstance(handler, StdoutHandler):
+            handler.setStream(SlowStream())
+    if async_mode:
+        PyTraceLog.init_async_logging(queue_size=10000)
+
+    try:
+        lags, records = asyncio.run(run())
+        stats = PyTraceLog._async_handler.stats() if async_mode else None
+    finally:
+        PyTraceLog.reset()
+    return lags, records, stats
+
+
+def main():
+    print(f'{"mode":<8}{"records/s":>12}{"lag p50, ms":>14}{"lag p99, ms":>14}{"lag max, ms":>14}{"dropped":>10}')
+    for mode, async_mode in (('sync', False), ('async', True)):
+        lags, records, stats = bench(async_mode)
+        print(
+            f'{mode:<8}{records / DURATION:>12.0f}'
+            f'{percentile(lags, 0.5) * 1000:>14.2f}{percentile(lags, 0.99) * 1000:>14.2f}{max(lags) * 1000:>14.2f}'
+            f'{stats["dropped"] if stats else "-":>10}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Регистрация повторяющихся исключений в SPAN (`TracerHandler`): время вызова `logger.exception` и объем
+событий SPAN при "шторме" повторов одного исключения (RETRIES попыток запроса в каждом SPAN):
+ * no cache - стек вызовов формируется для каждого исключения (кэш без записей);
+ * cache - стек вызовов формируется один раз для отпечатка исключения (`TracebackCache`);
+ * cache + repeats - повторы в SPAN регистрируются ссылкой на отпечаток (`exception_repeat_window`);
+ * limits - дополнительно ограничены количество кадров и длина стека вызовов.
+
+Запуск: python -m benchmarks.bench_exception_events
+"""
+import logging
+from time import perf_counter
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import use_span
+
+from pytracelog.logging.handlers import TracerHandler
+from pytracelog.logging.tracebacks import TracebackCache
+
+
+SPANS = 50
+RETRIES = 100
+DEPTH = 20
+
+logger = logging.getLogger('bench.exception_events')
+logger.propagate = False
+
+
+def query(depth):
+    if depth:
+        query(depth - 1)
+    raise ConnectionError('connection refused')
+
+
+def run(tracer):
+    size = 0
+    start = perf_counter()
+    for _ in range(SPANS):
+        with use_span(tracer.start_span('request'), end_on_exit=True) as span:
+            for attempt in range(RETRIES):
+                try:
+                    query(DEPTH)
+                except ConnectionError:
+                    logger.exception('attempt %s failed', attempt)
+        size += sum(len(str(value)) for event in span.events for value in event.attributes.values())
+    elapsed = perf_counter() - start
+    return elapsed / (SPANS * RETRIES) * 1e6, size / SPANS
+
+
+def main():
+    # События SPAN не ограничиваются: оценивается объем всех зарегистрированных исключений
+    tracer = TracerProvider().get_tracer(__name__)
+    handlers = (
+        ('no cache', TracerHandler(traceback_cache=TracebackCache(max_entries=0))),
+        ('cache', TracerHandler()),
+        ('cache + repeats', TracerHandler(exception_repeat_window=60.0)),
+        ('limits', TracerHandler(exception_repeat_window=60.0, max_stacktrace_frames=10,
+                                 max_stacktrace_length=2048)),
+    )
+
+    print(f'{"handler":<18}{"us/record":>12}{"chars/span":>14}')
+    for name, handler in handlers:
+        logger.handlers = [handler]
+        per_record, per_span = run(tracer)
+        print(f'{name:<18}{per_record:>12.1f}{per_span:>14.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Проверка исключенных путей запросов (проверки работоспособности, метрики, статика): `PathMatcher`
+(множество путей и кортеж префиксов) и `ExcludeList` инструментации OpenTelemetry (регулярное выражение,
+`re.search` для каждого запроса), для исключенных и обычных путей.
+
+Запуск: python -m benchmarks.bench_excluded_paths
+"""
+from timeit import repeat
+
+from opentelemetry.util.http import ExcludeList
+
+from pytracelog.utils import PathMatcher
+
+
+NUMBER = 200000
+REPEAT = 5
+
+PATHS = ('/health', '/ready', '/metrics', '/static/*')
+REGEXES = ('^/health$', '^/ready$', '^/metrics$', '^/static/')
+REQUESTS = (
+    ('excluded', '/health'),
+    ('prefix', '/static/js/app.js'),
+    ('api', '/api/v1/items/42'),
+)
+
+
+def bench(func, path):
+    return min(repeat(lambda: func(path), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main():
+    matchers = (
+        ('PathMatcher', PathMatcher(PATHS)),
+        ('ExcludeList', ExcludeList(REGEXES).url_disabled),
+    )
+
+    print(f'{"matcher":<14}' + ''.join(f'{name + ", ns":>16}' for name, _ in REQUESTS))
+    for name, matcher in matchers:
+        print(f'{name:<14}' + ''.join(f'{bench(matcher, path):>16.0f}' for _, path in REQUESTS))
+
+
+if __name__ == '__main__':
+    main()
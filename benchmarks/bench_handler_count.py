@@ -0,0 +1,98 @@
+"""
+Стоимость обработки записи в зависимости от количества обработчиков: сообщение, атрибуты и текст исключения
+формируются каждым обработчиком (`LogRecord`) или один раз для всех обработчиков (`CachedLogRecord`).
+
+Обработчики добавляются по одному: форматирование стандартным форматтером, `JsonFormatter`,
+`LogstashJsonFormatter` (результат отбрасывается), два `TracerHandler` с одинаковыми настройками (записи
+создаются внутри SPAN SDK без экспорта). Измеряется время вызова логгера для записи с аргументами и для записи с исключением.
+
+Запуск: python -m benchmarks.bench_handler_count
+"""
+import logging
+from time import perf_counter
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import use_span
+
+from pytracelog.logging.formatters import JsonFormatter
+from pytracelog.logging.handlers import TracerHandler
+from pytracelog.logging.logstash import LogstashJsonFormatter
+from pytracelog.logging.records import RecordFactory
+
+
+NUMBER = 2000
+REPEAT = 3
+
+logger = logging.getLogger('bench.handler_count')
+logger.propagate = False
+
+
+class FormatHandler(logging.Handler):
+    """
+    Обработчик, который форматирует запись и отбрасывает результат
+    """
+    def __init__(self, formatter):
+        super().__init__()
+        self.setFormatter(formatter)
+
+    def emit(self, record):
+        self.format(record)
+
+
+def make_handlers():
+    return (
+        ('stream', FormatHandler(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))),
+        ('json', FormatHandler(JsonFormatter())),
+        ('logstash', FormatHandler(LogstashJsonFormatter())),
+        ('tracer', TracerHandler()),
+        ('tracer x2', TracerHandler()),
+    )
+
+
+def log_message():
+    logger.warning('request %s processed in %.3f ms', 'GET /api/items', 12.5)
+
+
+def log_exception():
+    try:
+        raise ValueError('invalid item')
+    except ValueError:
+        logger.exception('request %s failed', 'GET /api/items')
+
+
+def bench(func, tracer):
+    timings = list()
+    for _ in range(REPEAT):
+        with use_span(tracer.start_span('bench'), end_on_exit=True):
+            start = perf_counter()
+            for _ in range(NUMBER):
+                func()
+            timings.append(perf_counter() - start)
+    return min(timings) / NUMBER * 1e9
+
+
+def main():
+    tracer = TracerProvider().get_tracer(__name__)
+    factories = (
+        ('LogRecord', logging.LogRecord),
+        ('CachedLogRecord', RecordFactory(base_factory=logging.LogRecord)),
+    )
+    old_factory = logging.getLogRecordFactory()
+
+    print(f'{"handlers":<12}{"record":<18}{"message, ns":>14}{"exception, ns":>16}')
+    try:
+        handlers = make_handlers()
+        for count in range(1, len(handlers) + 1):
+            logger.handlers = [handler for _, handler in handlers[:count]]
+            for record_name, factory in factories:
+                logging.setLogRecordFactory(factory)
+                print(
+                    f'{handlers[count - 1][0]:<12}{record_name:<18}'
+                    f'{bench(log_message, tracer):>14.0f}{bench(log_exception, tracer):>16.0f}'
+                )
+    finally:
+        logging.setLogRecordFactory(old_factory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Накладные расходы метрик обработчиков (`PyTraceLog.init_metrics`, `HandlerMetrics`): время обработки записи
+обработчиком с метриками и без них, в одном потоке и в нескольких потоках одновременно.
+
+Запуск: python -m benchmarks.bench_handler_metrics
+"""
+import logging
+from io import StringIO
+from threading import Thread
+from time import perf_counter
+from timeit import repeat
+
+from pytracelog.logging.handlers import (
+    StdoutHandler,
+    TracerHandler,
+)
+from pytracelog.metrics import HandlerMetrics
+
+
+NUMBER = 50000
+REPEAT = 5
+THREADS = 4
+
+
+class NullStream(StringIO):
+    def write(self, s):
+        return len(s)
+
+
+def bench(handler, record):
+    return min(repeat(lambda: handler.handle(record), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def bench_threads(handler, record):
+    def run():
+        for _ in range(NUMBER):
+            handler.handle(record)
+
+    threads = [Thread(target=run) for _ in range(THREADS)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (perf_counter() - start) / (NUMBER * THREADS) * 1e9
+
+
+def main():
+    record = logging.LogRecord('bench', logging.INFO, __file__, 1, 'message %s', ('arg',), None)
+    handlers = (
+        ('StdoutHandler', StdoutHandler(stream=NullStream())),
+        ('TracerHandler', TracerHandler(wait_for_provider=True)),
+    )
+
+    print(f'{"handler":<16}{"metrics":<10}{"1 thread, ns":>14}{f"{THREADS} threads, ns":>16}')
+    for name, handler in handlers:
+        metrics = HandlerMetrics(handler=handler)
+        for enabled in (False, True):
+            if enabled:
+                metrics.install()
+            print(
+                f'{name:<16}{"on" if enabled else "off":<10}'
+                f'{bench(handler, record):>14.0f}{bench_threads(handler, record):>16.0f}'
+            )
+        metrics.uninstall()
+
+
+if __name__ == '__main__':
+    main()
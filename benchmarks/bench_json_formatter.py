@@ -0,0 +1,51 @@
+"""
+Стоимость форматирования записи для вывода в stdout: текстовый формат (`basicConfig` по умолчанию и формат
+с временем) и `JsonFormatter` со стандартным `json` и с `orjson`.
+
+Запуск: python -m benchmarks.bench_json_formatter
+"""
+import logging
+from timeit import repeat
+
+from pytracelog.logging.formatters import (
+    JsonFormatter,
+    orjson,
+)
+
+
+NUMBER = 20000
+REPEAT = 5
+
+
+def make_record(extra_count, trace):
+    record = logging.LogRecord('bench.logger', logging.INFO, __file__, 1, 'message %s', ('arg',), None, func='main')
+    if trace:
+        record.otelTraceID = '0af7651916cd43dd8448eb211c80319c'
+        record.otelSpanID = 'b7ad6b7169203331'
+        record.otelServiceName = 'bench'
+    for i in range(extra_count):
+        setattr(record, f'extra_{i}', f'value_{i}' if i % 2 else i)
+    return record
+
+
+def bench(formatter, record):
+    return min(repeat(lambda: formatter.format(record), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main():
+    formatters = [
+        ('text', logging.Formatter(logging.BASIC_FORMAT)),
+        ('text+time', logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')),
+        ('json', JsonFormatter(use_orjson=False)),
+    ]
+    if orjson is not None:
+        formatters.append(('orjson', JsonFormatter()))
+
+    print(f'{"case":<14}' + ''.join(f'{name + ", ns":>15}' for name, _ in formatters))
+    for case, extra_count, trace in (('plain', 0, False), ('trace ids', 0, True), ('trace+5 extra', 5, True)):
+        record = make_record(extra_count, trace)
+        print(f'{case:<14}' + ''.join(f'{bench(formatter, record):>15.0f}' for _, formatter in formatters))
+
+
+if __name__ == '__main__':
+    main()
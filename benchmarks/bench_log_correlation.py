@@ -0,0 +1,72 @@
+"""
+Стоимость связи записей журнала с трассировкой: создание записи внутри SPAN без связи, с фабрикой записей
+`LoggingInstrumentor` и с `SpanCorrelation` (фабрика записей PyTraceLog).
+
+Замеряется создание записи (идентификаторы никто не читает, например, запись уходит только в `TracerHandler`)
+и создание с форматированием `%(otelTraceID)s %(otelSpanID)s`. Во всех случаях установлена фабрика записей
+PyTraceLog (`extend_log_record`, `log_context`), `LoggingInstrumentor` устанавливается поверх нее.
+
+Запуск: python -m benchmarks.bench_log_correlation
+"""
+import logging
+from timeit import repeat
+
+from opentelemetry.instrumentation.logging import LoggingInstrumentor
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import use_span
+
+from pytracelog.base import PyTraceLog
+from pytracelog.tracing.correlation import SpanCorrelation
+
+
+NUMBER = 20000
+REPEAT = 5
+
+FORMATTER = logging.Formatter('%(otelTraceID)s %(otelSpanID)s')
+
+
+def make_record():
+    return logging.getLogRecordFactory()('bench.logger', logging.INFO, __file__, 1, 'message', (), None)
+
+
+def make_and_format():
+    return FORMATTER.formatMessage(make_record())
+
+
+def bench(func):
+    return min(repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def run_cases():
+    return [bench(make_record), bench(make_and_format) if 'otelTraceID' in make_record().__dict__ else None]
+
+
+def main():
+    provider = TracerProvider()
+    results = list()
+
+    record_factory = PyTraceLog._install_record_factory()
+    try:
+        with use_span(provider.get_tracer(__name__).start_span('bench'), end_on_exit=True):
+            results.append(('no correlation', run_cases()))
+
+            instrumentor = LoggingInstrumentor()
+            instrumentor.instrument(tracer_provider=provider)
+            try:
+                results.append(('instrumentor', run_cases()))
+            finally:
+                instrumentor.uninstrument()
+
+            record_factory.correlation = SpanCorrelation(service_name='bench')
+            results.append(('pytracelog', run_cases()))
+    finally:
+        PyTraceLog.reset()
+
+    print(f'{"case":<16}{"record, ns":>14}{"record+format, ns":>20}')
+    for case, (record_ns, format_ns) in results:
+        format_column = f'{format_ns:>20.0f}' if format_ns is not None else f'{"-":>20}'
+        print(f'{case:<16}{record_ns:>14.0f}{format_column}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Пропускная способность отправки записей в Logstash при разных параметрах отправки пакетами.
+
+Вместо Logstash используется локальный TCP сервер, подсчитывающий принятые события. Для каждой конфигурации
+измеряются:
+ * пропускная способность: количество событий в секунду от первого вызова `logger.info()` до приема
+   последнего события сервером;
+ * задержка вызова `logger.info()` (p50, p99), мкс.
+
+Запуск: python -m benchmarks.bench_logstash
+"""
+import logging
+import socketserver
+from threading import (
+    Condition,
+    Thread,
+)
+from time import (
+    perf_counter,
+    perf_counter_ns,
+)
+
+from logstash_async.formatter import LogstashFormatter
+
+from pytracelog.logging.logstash import LogstashHandler
+
+
+EVENTS = 20000
+TIMEOUT = 60
+
+# (транспорт, размер пакета, интервал отправки, сек.)
+CONFIGS = (
+    ('tcp', 50, 10.0),
+    ('tcp', 500, 1.0),
+    ('tcp', 2000, 0.5),
+    ('tcp', 5000, 0.2),
+)
+
+
+class TcpSink:
+    """
+    Локальный TCP сервер, подсчитывающий принятые события (строки)
+    """
+    def __init__(self):
+        self.received = 0
+        self._condition = Condition()
+        sink = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    data = self.request.recv(1 << 16)
+                    if not data:
+                        break
+                    with sink._condition:
+                        sink.received += data.count(b'\n')
+                        sink._condition.notify_all()
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def wait_for(self, count, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: self.received >= count, timeout=timeout)
+
+    def reset(self):
+        with self._condition:
+            self.received = 0
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def percentile(sorted_values, ratio):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def run(sink, transport, batch_size, flush_interval):
+    sink.reset()
+    handler = LogstashHandler(
+        host='127.0.0.1',
+        port=sink.port,
+        transport=transport,
+        batch_size=batch_size,
+        flush_interval=flush_interval
+    )
+    handler.setFormatter(LogstashFormatter(extra_prefix=None, metadata={'beat': 'bench'}))
+
+    logger = logging.Logger('bench_logstash', logging.INFO)
+    logger.addHandler(handler)
+
+    latencies = list()
+    started = perf_counter()
+    for i in range(EVENTS):
+        call_started = perf_counter_ns()
+        logger.info('event %s', i)
+        latencies.append(perf_counter_ns() - call_started)
+
+    delivered = sink.wait_for(EVENTS, timeout=TIMEOUT)
+    elapsed = perf_counter() - started
+    handler.close()
+
+    latencies.sort()
+    return (
+        EVENTS / elapsed if delivered else 0.0,
+        percentile(latencies, 0.5) / 1000,
+        percentile(latencies, 0.99) / 1000,
+    )
+
+
+def main():
+    sink = TcpSink()
+
+    print(f'{"transport":<11}{"batch":>7}{"interval, s":>13}{"events/s":>11}{"p50, us":>10}{"p99, us":>10}')
+    try:
+        for transport, batch_size, flush_interval in CONFIGS:
+            rate, p50, p99 = run(sink, transport, batch_size, flush_interval)
+            print(f'{transport:<11}{batch_size:>7}{flush_interval:>13.1f}{rate:>11.0f}{p50:>10.1f}{p99:>10.1f}')
+    finally:
+        sink.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Сравнение формирования события Logstash: `LogstashFormatter` (справочник и стандартный `json`) и
+`LogstashJsonFormatter` (сериализация сразу в bytes) со стандартным `json` и с `orjson`.
+
+Замеряется запись без дополнительных атрибутов, с дополнительными атрибутами (`extra`) и со статическими
+атрибутами фабрики записей (`PyTraceLog.extend_log_record`). Время `LogstashFormatter` включает кодирование
+результата в bytes, которое для него выполняет обработчик.
+
+Запуск: python -m benchmarks.bench_logstash_formatter
+"""
+import logging
+from timeit import repeat
+
+from logstash_async.formatter import LogstashFormatter
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.logstash import (
+    LogstashJsonFormatter,
+    orjson,
+)
+
+
+NUMBER = 20000
+REPEAT = 5
+
+
+def make_record(extra_count):
+    record = logging.getLogRecordFactory()(
+        'bench.logger', logging.INFO, __file__, 1, 'message %s', ('arg',), None, func='main'
+    )
+    for i in range(extra_count):
+        setattr(record, f'extra_{i}', f'value_{i}' if i % 2 else i)
+    return record
+
+
+def bench(func, record):
+    return min(repeat(lambda: func(record), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main():
+    legacy = LogstashFormatter(message_type='python', extra_prefix=None, metadata={'beat': 'bench'})
+    formatters = [
+        ('legacy', lambda record: legacy.format(record).encode('utf-8')),
+        ('json', LogstashJsonFormatter(message_type='python', metadata={'beat': 'bench'}, use_orjson=False).format),
+    ]
+    if orjson is not None:
+        formatters.append(
+            ('orjson', LogstashJsonFormatter(message_type='python', metadata={'beat': 'bench'}).format)
+        )
+
+    cases = (
+        ('no extra', 0, False),
+        ('10 extra', 10, False),
+        ('factory attrs', 0, True),
+    )
+
+    print(f'{"case":<16}' + ''.join(f'{name + ", ns":>14}' for name, _ in formatters) + f'{"speedup":>10}')
+    try:
+        for case, extra_count, factory_attrs in cases:
+            if factory_attrs:
+                PyTraceLog.extend_log_record(service='bench', environment='production', version='1.0.0')
+            record = make_record(extra_count)
+            results = [bench(func, record) for _, func in formatters]
+            print(
+                f'{case:<16}' + ''.join(f'{result:>14.0f}' for result in results) +
+                f'{results[0] / min(results[1:]):>9.2f}x'
+            )
+    finally:
+        PyTraceLog.reset()
+
+
+if __name__ == '__main__':
+    main()
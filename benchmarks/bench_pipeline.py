@@ -0,0 +1,338 @@
+"""
+Нагрузочный тест конвейера PyTraceLog: стоимость вызова логгера для каждой комбинации инициализации
+(каждая следующая конфигурация включает предыдущие):
+ * root - `init_root_logger` (вывод в stdout/stderr, перенаправленные в /dev/null);
+ * extend - `extend_log_record` (статические атрибуты записей);
+ * tracer - `init_tracer_logger`, записи создаются внутри активного SPAN;
+ * logstash - `init_logstash_logger` с отправкой в локальный TCP сервер;
+ * jaeger - `init_tracer` с экспортом SPAN в локальный UDP сокет вместо агента Jaeger.
+
+Каждая конфигурация запускается в 1, 8 и 64 потоках и в цикле событий asyncio (ASYNCIO_TASKS задач),
+каждый запуск - в отдельном процессе. Для каждого запуска измеряются:
+ * ns_per_call - время выполнения всех вызовов логгера (с ожиданием потоков), деленное на количество вызовов;
+ * p50_ns, p99_ns, p999_ns - задержка одного вызова логгера;
+ * alloc_bytes_per_record - пиковый объем памяти, выделяемой при обработке одной записи (tracemalloc);
+ * retained_blocks_per_record - количество блоков памяти, оставшихся выделенными после обработки записи
+   (записи в очередях и буферах, события SPAN).
+
+Результаты сохраняются в JSON; при сравнении с результатами другой ветки (`--compare`) выводится отношение
+показателей, и при замедлении вызова больше порога (`--threshold`) процесс завершается с кодом 1.
+
+Запуск: python -m benchmarks.bench_pipeline [--output results.json] [--compare baseline.json] [--records N]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from importlib import metadata
+from threading import (
+    Barrier,
+    Thread,
+)
+from time import perf_counter_ns
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+
+from benchmarks.bench_logstash import TcpSink
+from pytracelog.base import PyTraceLog
+
+
+CONFIGS = ('root', 'extend', 'tracer', 'logstash', 'jaeger')
+CONCURRENCY = ('1', '8', '64', 'asyncio')
+RECORDS = 20000
+ASYNCIO_TASKS = 64
+# Количество записей в одном SPAN
+SPAN_RECORDS = 100
+# Количество записей между переключениями задач asyncio
+ASYNCIO_YIELD_EVERY = 10
+ALLOC_RECORDS = 2000
+REGRESSION_THRESHOLD = 0.2
+PACKAGES = ('opentelemetry-api', 'opentelemetry-sdk', 'opentelemetry-exporter-jaeger-thrift', 'python-logstash-async')
+
+logger = logging.getLogger('bench.pipeline')
+
+
+class UdpSink:
+    """
+    Локальный UDP сокет, принимающий и отбрасывающий пакеты (вместо агента Jaeger)
+    """
+    def __init__(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self.port = self._socket.getsockname()[1]
+        Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                self._socket.recv(1 << 16)
+            except OSError:
+                return
+
+
+def setup(config):
+    """
+    Инициализация PyTraceLog для конфигурации
+
+    :return: Трассировщик (None, если записи создаются вне SPAN)
+    """
+    level = CONFIGS.index(config)
+
+    PyTraceLog.init_root_logger(level='INFO')
+    devnull = open(os.devnull, 'w')
+    for handler in PyTraceLog._handlers:
+        handler.setStream(devnull)
+
+    if level >= CONFIGS.index('extend'):
+        PyTraceLog.extend_log_record(service='bench', environment='benchmark', version='1.0')
+
+    if level >= CONFIGS.index('logstash'):
+        os.environ.update({'LOGSTASH_HOST': '127.0.0.1', 'LOGSTASH_PORT': str(TcpSink().port)})
+        PyTraceLog.init_logstash_logger(level='INFO')
+
+    if level < CONFIGS.index('tracer'):
+        return None
+
+    if level >= CONFIGS.index('jaeger'):
+        os.environ.update({
+            'OTEL_EXPORTER_JAEGER_AGENT_HOST': '127.0.0.1',
+            'OTEL_EXPORTER_JAEGER_AGENT_PORT': str(UdpSink().port),
+        })
+        PyTraceLog.init_tracer(service='bench')
+    else:
+        trace.set_tracer_provider(TracerProvider())
+    PyTraceLog.init_tracer_logger(level='INFO')
+    return trace.get_tracer(__name__)
+
+
+def span_context(tracer):
+    if tracer is None:
+        return nullcontext()
+    return trace.use_span(tracer.start_span('bench'), end_on_exit=True)
+
+
+def log_records(tracer, count, latencies):
+    for start in range(0, count, SPAN_RECORDS):
+        with span_context(tracer):
+            for i in range(start, min(count, start + SPAN_RECORDS)):
+                started = perf_counter_ns()
+                logger.info('request %s processed', i)
+                latencies.append(perf_counter_ns() - started)
+
+
+async def log_records_async(tracer, count, latencies):
+    for start in range(0, count, SPAN_RECORDS):
+        with span_context(tracer):
+            for i in range(start, min(count, start + SPAN_RECORDS)):
+                started = perf_counter_ns()
+                logger.info('request %s processed', i)
+                latencies.append(perf_counter_ns() - started)
+                if i % ASYNCIO_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+
+
+def run_threads(tracer, records, threads):
+    """
+    :return: Время выполнения, нс, и задержки вызовов
+    """
+    count = records // threads
+    latencies = [list() for _ in range(threads)]
+    barrier = Barrier(threads + 1)
+
+    def run(thread_latencies):
+        barrier.wait()
+        log_records(tracer, count, thread_latencies)
+
+    workers = [Thread(target=run, args=(thread_latencies,)) for thread_latencies in latencies]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = perf_counter_ns()
+    for worker in workers:
+        worker.join()
+    return perf_counter_ns() - started, [latency for values in latencies for latency in values]
+
+
+def run_asyncio(tracer, records):
+    count = records // ASYNCIO_TASKS
+    latencies = list()
+
+    async def main():
+        await asyncio.gather(*(log_records_async(tracer, count, latencies) for _ in range(ASYNCIO_TASKS)))
+
+    started = perf_counter_ns()
+    asyncio.run(main())
+    return perf_counter_ns() - started, latencies
+
+
+def measure_allocations(tracer):
+    """
+    :return: Пиковый объем памяти, выделяемой при обработке записи, байт, и количество оставшихся блоков
+        памяти на запись
+    """
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    log_records(tracer, ALLOC_RECORDS, list())
+    gc.collect()
+    retained = (sys.getallocatedblocks() - blocks) / ALLOC_RECORDS
+
+    allocated = 0
+    tracemalloc.start()
+    try:
+        with span_context(tracer):
+            for i in range(ALLOC_RECORDS):
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                logger.info('request %s processed', i)
+                allocated += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+    return allocated / ALLOC_RECORDS, retained
+
+
+def percentile(sorted_values, ratio):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def run_case(config, concurrency, records):
+    tracer = setup(config)
+    # Прогрев: кэши форматтеров, соединение с Logstash
+    log_records(tracer, min(records, 1000), list())
+
+    if concurrency == 'asyncio':
+        elapsed, latencies = run_asyncio(tracer, records)
+    else:
+        elapsed, latencies = run_threads(tracer, records, int(concurrency))
+    alloc_bytes, retained_blocks = measure_allocations(tracer)
+
+    latencies.sort()
+    return {
+        'config': config,
+        'concurrency': concurrency,
+        'records': len(latencies),
+        'ns_per_call': round(elapsed / len(latencies), 1),
+        'p50_ns': percentile(latencies, 0.5),
+        'p99_ns': percentile(latencies, 0.99),
+        'p999_ns': percentile(latencies, 0.999),
+        'alloc_bytes_per_record': round(alloc_bytes, 1),
+        'retained_blocks_per_record': round(retained_blocks, 2),
+    }
+
+
+def get_meta():
+    versions = dict()
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+    }
+
+
+def run_all(records):
+    results = list()
+    for config in CONFIGS:
+        for concurrency in CONCURRENCY:
+            # Каждый запуск - в отдельном процессе: глобальный провайдер трассировки устанавливается один раз,
+            # фоновые потоки и буферы предыдущих конфигураций не влияют на результат
+            process = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_pipeline', '--case', config, concurrency,
+                 '--records', str(records)],
+                capture_output=True, text=True, check=True
+            )
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(
+                f'{config:<10}{concurrency:>9}{result["ns_per_call"]:>12.0f}{result["p50_ns"]:>10}'
+                f'{result["p99_ns"]:>10}{result["p999_ns"]:>10}{result["alloc_bytes_per_record"]:>10.0f}'
+                f'{result["retained_blocks_per_record"]:>10.2f}',
+                flush=True
+            )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Сравнение с результатами другой ветки
+
+    :return: Признак замедления вызова больше порога хотя бы в одном запуске
+    """
+    baseline_results = {(r['config'], r['concurrency']): r for r in baseline['results']}
+    regression = False
+
+    print(f'\n{"config":<10}{"threads":>9}{"ns/call":>12}{"p99":>10}{"alloc":>10}  (отношение к базовым)')
+    for result in results:
+        base = baseline_results.get((result['config'], result['concurrency']))
+        if base is None:
+            continue
+        ratios = [
+            result[key] / base[key] if base[key] else float('nan')
+            for key in ('ns_per_call', 'p99_ns', 'alloc_bytes_per_record')
+        ]
+        slower = ratios[0] > 1.0 + threshold
+        regression = regression or slower
+        print(
+            f'{result["config"]:<10}{result["concurrency"]:>9}'
+            + ''.join(f'{ratio:>{12 if index == 0 else 10}.2f}' for index, ratio in enumerate(ratios))
+            + ('  регрессия' if slower else '')
+        )
+    return regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест конвейера PyTraceLog')
+    parser.add_argument('--output', default='bench_pipeline.json', help='Файл результатов (JSON)')
+    parser.add_argument('--compare', help='Файл результатов для сравнения (JSON)')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Допустимое замедление вызова логгера (доля)')
+    parser.add_argument('--records', type=int, default=RECORDS, help='Количество вызовов логгера в запуске')
+    parser.add_argument('--case', nargs=2, metavar=('CONFIG', 'CONCURRENCY'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        config, concurrency = args.case
+        print(json.dumps(run_case(config, concurrency, args.records)))
+        return
+
+    print(f'{"config":<10}{"threads":>9}{"ns/call":>12}{"p50":>10}{"p99":>10}{"p999":>10}{"alloc, B":>10}'
+          f'{"retained":>10}')
+    results = run_all(args.records)
+    with open(args.output, 'w') as output:
+        json.dump({'meta': get_meta(), 'results': results}, output, indent=2)
+    print(f'\nРезультаты сохранены в {args.output}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
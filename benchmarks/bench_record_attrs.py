@@ -0,0 +1,93 @@
+"""
+Сравнение формирования атрибутов записи для TracerHandler: исходная реализация (копия словаря записи и
+последовательное удаление атрибутов) и RecordAttrsExtractor.
+
+Замеряется как само формирование справочника, так и добавление события в SPAN SDK, который проверяет и
+очищает каждый атрибут (каждое пятое дополнительное поле - словарь, недопустимый для OpenTelemetry).
+
+Запуск: python -m benchmarks.bench_record_attrs
+"""
+import logging
+from timeit import repeat
+
+from opentelemetry.sdk.trace import TracerProvider
+
+from pytracelog.logging.attributes import RecordAttrsExtractor
+
+
+NUMBER = 20000
+REPEAT = 5
+
+
+def legacy_get_record_attrs(record, remove_msg=True, message_attr_name='original.message'):
+    """
+    Исходная реализация TracerHandler.get_record_attrs
+    """
+    attrs = record.__dict__.copy()
+
+    for k, v in record.__dict__.items():
+        if not v:
+            attrs.pop(k)
+
+    attrs.pop('name', None)
+    attrs.pop('exc_info', None)
+    attrs.pop('exc_text', None)
+    attrs.pop('msecs', None)
+    attrs.pop('relativeCreated', None)
+    attrs.pop('otelSpanID', None)
+    attrs.pop('otelTraceID', None)
+    attrs.pop('otelServiceName', None)
+
+    if remove_msg:
+        attrs.pop('msg', None)
+    else:
+        msg = attrs.pop('msg', None)
+        if msg:
+            attrs[message_attr_name] = msg
+
+    return attrs
+
+
+def make_record(extra_count):
+    extra = {
+        f'extra_{i}': {'key': i} if i % 5 == 4 else f'value_{i}' if i % 2 else i
+        for i in range(extra_count)
+    }
+    return logging.LogRecord(
+        'bench', logging.INFO, __file__, 1, 'message %s', ('arg',), None, func='main'
+    ), extra
+
+
+def bench(func, record):
+    return min(repeat(lambda: func(record), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main():
+    # Предупреждения SDK об отброшенных атрибутах не выводим, но сама проверка атрибутов выполняется
+    logging.getLogger('opentelemetry.attributes').setLevel(logging.CRITICAL)
+
+    extractor = RecordAttrsExtractor()
+    span = TracerProvider().get_tracer(__name__).start_span('bench')
+
+    def legacy_event(record):
+        span.add_event(name=record.msg, attributes=legacy_get_record_attrs(record))
+
+    def extractor_event(record):
+        span.add_event(name=record.msg, attributes=extractor(record))
+
+    print(f'{"extra":<8}{"case":<12}{"legacy, ns":>12}{"extractor, ns":>15}{"ratio":>10}')
+    for extra_count in (0, 10, 50):
+        record, extra = make_record(extra_count)
+        record.__dict__.update(extra)
+
+        for case, legacy_func, current_func in (
+                ('attrs', legacy_get_record_attrs, extractor),
+                ('add_event', legacy_event, extractor_event),
+        ):
+            legacy = bench(legacy_func, record)
+            current = bench(current_func, record)
+            print(f'{extra_count:<8}{case:<12}{legacy:>12.0f}{current:>15.0f}{legacy / current:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
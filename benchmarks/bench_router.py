@@ -0,0 +1,75 @@
+"""
+Сравнение стоимости вызова логгера для пары StdoutHandler/StderrHandler и LevelRouterHandler: вывод в StringIO
+и в поток, который отбрасывает запись (стоимость самих обработчиков). Замеры пары и маршрутизатора чередуются,
+берется минимум.
+
+Запуск: python -m benchmarks.bench_router
+"""
+import logging
+from io import (
+    StringIO,
+    TextIOBase,
+)
+from timeit import repeat
+
+from pytracelog.logging.handlers import (
+    StdoutHandler,
+    StderrHandler,
+    LevelRouterHandler,
+)
+
+
+NUMBER = 20000
+REPEAT = 7
+
+
+class NullStream(TextIOBase):
+    """
+    Поток, который отбрасывает запись
+    """
+    def write(self, s):
+        return len(s)
+
+
+def make_logger(name, handlers):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+def bench(loggers, level):
+    timings = [list() for _ in loggers]
+    for _ in range(REPEAT):
+        for logger, logger_timings in zip(loggers, timings):
+            logger_timings.extend(repeat(lambda: logger.log(level, 'message %s', 'arg'), number=NUMBER, repeat=1))
+    return [min(logger_timings) / NUMBER * 1e9 for logger_timings in timings]
+
+
+def main():
+    print(f'{"stream":<10}{"level":<10}{"pair, ns":>12}{"router, ns":>12}{"speedup":>10}')
+    for stream_name, stream_type in (('StringIO', StringIO), ('null', NullStream)):
+        stdout, stderr = stream_type(), stream_type()
+        loggers = (
+            make_logger(f'bench.pair.{stream_name}', (StdoutHandler(stream=stdout), StderrHandler(stream=stderr))),
+            make_logger(
+                f'bench.router.{stream_name}',
+                (LevelRouterHandler(routes=((logging.NOTSET, stdout), (logging.ERROR, stderr))),)
+            ),
+        )
+        for level in (logging.INFO, logging.ERROR):
+            pair, router = bench(loggers, level)
+            # Сбрасываем накопленный вывод, чтобы не влиять на следующие замеры
+            for stream in (stdout, stderr):
+                if isinstance(stream, StringIO):
+                    stream.seek(0), stream.truncate()
+            print(
+                f'{stream_name:<10}{logging.getLevelName(level):<10}{pair:>12.0f}{router:>12.0f}'
+                f'{pair / router:>9.2f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Пропускная способность экспорта SPAN при разных параметрах `BatchSpanProcessor`.
+
+SPAN создаются с постоянной частотой и экспортируются в память; экспорт каждого пакета имитирует сетевую
+задержку (фиксированная часть и часть, пропорциональная размеру пакета). Для каждой конфигурации выводятся
+фактическая частота создания SPAN, количество экспортированных и отброшенных SPAN и количество пакетов.
+
+Запуск: python -m benchmarks.bench_span_export
+"""
+import logging
+from time import (
+    perf_counter,
+    sleep,
+)
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from pytracelog.tracing.processors import CountingBatchSpanProcessor
+
+
+RATE = 10000
+DURATION = 2.0
+
+# Задержка экспорта пакета: фиксированная часть и часть на один SPAN, сек.
+EXPORT_LATENCY = 0.02
+EXPORT_LATENCY_PER_SPAN = 0.0001
+
+# (размер очереди, размер пакета, интервал экспорта, мс)
+CONFIGS = (
+    (2048, 512, 5000),
+    (2048, 512, 500),
+    (8192, 512, 1000),
+    (8192, 2048, 200),
+)
+
+
+class SlowExporter(InMemorySpanExporter):
+    """
+    Экспорт в память с имитацией сетевой задержки
+    """
+    def export(self, spans):
+        sleep(EXPORT_LATENCY + EXPORT_LATENCY_PER_SPAN * len(spans))
+        return super().export(spans)
+
+
+def run(max_queue_size, max_export_batch_size, schedule_delay_millis):
+    processor = CountingBatchSpanProcessor(
+        span_exporter=SlowExporter(),
+        max_queue_size=max_queue_size,
+        max_export_batch_size=max_export_batch_size,
+        schedule_delay_millis=schedule_delay_millis
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer(__name__)
+
+    produced = 0
+    interval = 1 / RATE
+    started = perf_counter()
+    while True:
+        elapsed = perf_counter() - started
+        if elapsed >= DURATION:
+            break
+        # Догоняем расписание пачкой SPAN, если отстали
+        while produced < elapsed * RATE:
+            tracer.start_span('span').end()
+            produced += 1
+        sleep(interval)
+
+    produce_rate = produced / (perf_counter() - started)
+    provider.shutdown()
+    return produced, produce_rate, processor.stats()
+
+
+def main():
+    # Предупреждение о заполнении очереди не выводим: отброшенные SPAN видны по счетчику
+    logging.getLogger('opentelemetry.sdk.trace.export').setLevel(logging.ERROR)
+
+    print(
+        f'{"queue":>7}{"batch":>7}{"delay, ms":>11}{"produced":>10}{"spans/s":>9}'
+        f'{"exported":>10}{"dropped":>9}{"batches":>9}'
+    )
+    for max_queue_size, max_export_batch_size, schedule_delay_millis in CONFIGS:
+        produced, produce_rate, stats = run(max_queue_size, max_export_batch_size, schedule_delay_millis)
+        print(
+            f'{max_queue_size:>7}{max_export_batch_size:>7}{schedule_delay_millis:>11}{produced:>10}'
+            f'{produce_rate:>9.0f}{stats["exported"]:>10}{stats["dropped"]:>9}{stats["batches"]:>9}'
+        )
+
+
+if __name__ == '__main__':
+    main()
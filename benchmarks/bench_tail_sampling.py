@@ -0,0 +1,90 @@
+"""
+Пропускная способность выборки трассировок по завершении (`TailSamplingSpanProcessor`): SPAN в секунду при
+создании трассировок (корневой SPAN и CHILDREN дочерних) с обработчиком, который ничего не делает, и с
+выборкой по завершении перед ним, в одном потоке и в нескольких потоках одновременно.
+
+Часть трассировок завершается с ошибкой (ERROR_EVERY), остальные сохраняются с долей SAMPLE_RATIO.
+
+Запуск: python -m benchmarks.bench_tail_sampling
+"""
+from threading import Thread
+from time import perf_counter
+
+from opentelemetry.sdk.trace import (
+    SpanProcessor,
+    TracerProvider,
+)
+from opentelemetry.trace import (
+    Status,
+    StatusCode,
+    set_span_in_context,
+)
+
+from pytracelog.tracing.processors import TailSamplingSpanProcessor
+
+
+TRACES = 5000
+CHILDREN = 9
+ERROR_EVERY = 100
+SAMPLE_RATIO = 0.01
+THREADS = 4
+
+
+class CountingProcessor(SpanProcessor):
+    def __init__(self):
+        self.count = 0
+
+    def on_end(self, span):
+        self.count += 1
+
+
+def make_traces(tracer, traces):
+    for index in range(traces):
+        root = tracer.start_span('request')
+        context = set_span_in_context(root)
+        for _ in range(CHILDREN):
+            child = tracer.start_span('query', context=context)
+            if index % ERROR_EVERY == 0:
+                child.set_status(Status(StatusCode.ERROR))
+            child.end()
+        root.end()
+
+
+def bench(tail_sampling, threads):
+    downstream = CountingProcessor()
+    processor = downstream
+    if tail_sampling:
+        processor = TailSamplingSpanProcessor(span_processor=downstream, sample_ratio=SAMPLE_RATIO)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer(__name__)
+
+    workers = [Thread(target=make_traces, args=(tracer, TRACES // threads)) for _ in range(threads)]
+    start = perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = perf_counter() - start
+
+    spans = TRACES // threads * threads * (CHILDREN + 1)
+    provider.shutdown()
+    return spans / elapsed, downstream.count / spans
+
+
+def main():
+    # Прогрев
+    bench(tail_sampling=False, threads=1)
+
+    print(f'{"processor":<16}{"threads":>8}{"spans/s":>12}{"exported":>10}')
+    for tail_sampling in (False, True):
+        for threads in (1, THREADS):
+            spans_per_second, exported = bench(tail_sampling, threads)
+            print(
+                f'{"tail sampling" if tail_sampling else "no-op":<16}{threads:>8}'
+                f'{spans_per_second:>12.0f}{exported:>10.1%}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Стоимость обработки записи TracerHandler при отключенной трассировке (провайдер трассировки не настроен):
+ * без текущего SPAN;
+ * внутри незаписываемого SPAN с корректным контекстом (например, контекст, полученный из входящего запроса).
+
+Для сравнения приведены NullHandler и исходная реализация TracerHandler.emit. Обработчик, подключаемый
+PyTraceLog.init_tracer_logger, до установки глобального провайдера трассировки не запрашивает текущий SPAN.
+
+Запуск: python -m benchmarks.bench_tracer_disabled
+"""
+import logging
+from timeit import repeat
+
+from opentelemetry.trace import (
+    get_current_span,
+    INVALID_SPAN,
+    NonRecordingSpan,
+    SpanContext,
+    use_span,
+)
+
+from pytracelog.logging.handlers import TracerHandler
+
+
+NUMBER = 50000
+REPEAT = 5
+
+
+class LegacyTracerHandler(TracerHandler):
+    """
+    Исходная реализация: сравнение текущего SPAN с INVALID_SPAN после фильтрации и блокировки обработчика
+    """
+    def handle(self, record):
+        return logging.Handler.handle(self, record)
+
+    def emit(self, record):
+        span = get_current_span()
+        if span != INVALID_SPAN:
+            span.add_event(name=record.msg, attributes=self.get_record_attrs(record=record))
+
+
+def bench(handler, record):
+    return min(repeat(lambda: handler.handle(record), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main():
+    record = logging.LogRecord('bench', logging.INFO, __file__, 1, 'message %s', ('arg',), None)
+    handlers = (
+        ('NullHandler', logging.NullHandler()),
+        ('legacy', LegacyTracerHandler()),
+        ('TracerHandler', TracerHandler()),
+        # Обработчик, подключаемый PyTraceLog.init_tracer_logger
+        ('waiting', TracerHandler(wait_for_provider=True)),
+    )
+    non_recording_span = NonRecordingSpan(SpanContext(trace_id=1, span_id=1, is_remote=True))
+
+    print(f'{"handler":<16}{"no span, ns":>14}{"non-recording span, ns":>26}')
+    for name, handler in handlers:
+        no_span = bench(handler, record)
+        with use_span(non_recording_span):
+            in_span = bench(handler, record)
+        print(f'{name:<16}{no_span:>14.0f}{in_span:>26.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,43 +3,79 @@
 ===================================
 .. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
 """
+from atexit import (
+    register as register_at_exit,
+    unregister as unregister_at_exit,
+)
+from math import ceil
 from os import environ
 from typing import (
+    Any,
+    Dict,
+    Iterable,
     Union,
     Optional,
     List,
-    Callable
+    Callable,
+    Mapping,
+    Sequence,
+    TextIO,
+    Tuple,
 )
 from logging import (
+    BASIC_FORMAT,
+    getLogger,
     getLogRecordFactory,
     setLogRecordFactory,
     WARNING,
+    NOTSET,
     basicConfig,
     Handler,
     _checkLevel,
     root
 )
 
-from logstash_async.formatter import LogstashFormatter
-from logstash_async.handler import AsynchronousLogstashHandler
-from opentelemetry.trace import (
-    set_tracer_provider,
-)
-from opentelemetry.exporter.jaeger.thrift import JaegerExporter
-from opentelemetry.sdk.resources import (
-    SERVICE_NAME,
-    Resource
+from signal import (
+    getsignal,
+    signal,
 )
-from opentelemetry.sdk.trace import (
-    TracerProvider
+from threading import (
+    Event,
+    Thread,
 )
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.instrumentation.logging import LoggingInstrumentor
 
+try:
+    from os import register_at_fork
+except ImportError:
+    # fork не поддерживается (Windows)
+    register_at_fork = None
+
+try:
+    from signal import SIGHUP
+except ImportError:
+    # Сигнал не поддерживается (Windows)
+    SIGHUP = None
+
+from pytracelog.logging.filters import RateLimitFilter
+from pytracelog.logging.formatters import (
+    JsonFormatter,
+    RepeatedFormatter,
+)
 from pytracelog.logging.handlers import (
     StdoutHandler,
     StderrHandler,
+    LevelRouterHandler,
     TracerHandler,
+    EVENT_NAME_TEMPLATE,
+)
+from pytracelog.logging.queues import (
+    BufferedQueueHandler,
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_OLDEST,
+)
+from pytracelog.logging.records import (
+    LogContext,
+    RecordFactory,
 )
 
 
@@ -47,14 +83,121 @@ __all__ = (
     'PyTraceLog',
     'LOGSTASH_HOST',
     'LOGSTASH_PORT',
+    'LOGSTASH_SPOOL_PATH',
+    'LOGSTASH_SPOOL_MAX_EVENTS',
+    'LOGSTASH_SPOOL_EVICTION',
+    'LOGSTASH_EVENT_TTL',
+    'LOGSTASH_BATCH_SIZE',
+    'LOGSTASH_FLUSH_INTERVAL',
+    'LOGSTASH_FLUSH_COUNT',
+    'LOGSTASH_TRANSPORT',
+    'LOGSTASH_SOCKET_TIMEOUT',
+    'LOGSTASH_SSL_ENABLE',
+    'LOGSTASH_SSL_VERIFY',
+    'LOGSTASH_KEYFILE',
+    'LOGSTASH_CERTFILE',
+    'LOGSTASH_CA_CERTS',
+    'LOGSTASH_USERNAME',
+    'LOGSTASH_PASSWORD',
+    'LOGSTASH_FIELDS',
     'OTEL_EXPORTER_JAEGER_AGENT_HOST',
+    'OTEL_EXPORTER_JAEGER_ENDPOINT',
+    'LOG_LEVELS',
+    'LOG_LEVELS_FILE',
 )
 
 
 LOGSTASH_HOST = 'LOGSTASH_HOST'
 LOGSTASH_PORT = 'LOGSTASH_PORT'
+LOGSTASH_SPOOL_PATH = 'LOGSTASH_SPOOL_PATH'
+LOGSTASH_SPOOL_MAX_EVENTS = 'LOGSTASH_SPOOL_MAX_EVENTS'
+LOGSTASH_SPOOL_EVICTION = 'LOGSTASH_SPOOL_EVICTION'
+LOGSTASH_EVENT_TTL = 'LOGSTASH_EVENT_TTL'
+LOGSTASH_BATCH_SIZE = 'LOGSTASH_BATCH_SIZE'
+LOGSTASH_FLUSH_INTERVAL = 'LOGSTASH_FLUSH_INTERVAL'
+LOGSTASH_FLUSH_COUNT = 'LOGSTASH_FLUSH_COUNT'
+LOGSTASH_TRANSPORT = 'LOGSTASH_TRANSPORT'
+LOGSTASH_SOCKET_TIMEOUT = 'LOGSTASH_SOCKET_TIMEOUT'
+LOGSTASH_SSL_ENABLE = 'LOGSTASH_SSL_ENABLE'
+LOGSTASH_SSL_VERIFY = 'LOGSTASH_SSL_VERIFY'
+LOGSTASH_KEYFILE = 'LOGSTASH_KEYFILE'
+LOGSTASH_CERTFILE = 'LOGSTASH_CERTFILE'
+LOGSTASH_CA_CERTS = 'LOGSTASH_CA_CERTS'
+LOGSTASH_USERNAME = 'LOGSTASH_USERNAME'
+LOGSTASH_PASSWORD = 'LOGSTASH_PASSWORD'
+LOGSTASH_FIELDS = 'LOGSTASH_FIELDS'
 
 OTEL_EXPORTER_JAEGER_AGENT_HOST = 'OTEL_EXPORTER_JAEGER_AGENT_HOST'
+OTEL_EXPORTER_JAEGER_ENDPOINT = 'OTEL_EXPORTER_JAEGER_ENDPOINT'
+
+LOG_LEVELS = 'LOG_LEVELS'
+LOG_LEVELS_FILE = 'LOG_LEVELS_FILE'
+
+# Наименование root логгера в настройке уровней логгеров
+ROOT_LOGGER_NAME = 'root'
+
+logger = getLogger(__name__)
+
+
+def _to_bool(value: str) -> bool:
+    """
+    Преобразование значения переменной окружения в логическое значение
+    """
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _to_ssl_verify(value: str) -> Union[bool, str]:
+    """
+    Преобразование значения переменной окружения в параметр проверки сертификата: логическое значение или
+    путь к файлу сертификатов
+    """
+    if value.strip().lower() in ('0', 'false', 'no', 'off', '1', 'true', 'yes', 'on'):
+        return _to_bool(value)
+    return value
+
+
+def _to_list(value: str) -> List[str]:
+    """
+    Преобразование значения переменной окружения в список (значения через запятую)
+    """
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _to_levels(value: str) -> Dict[str, int]:
+    """
+    Преобразование описания уровней логгеров вида `логгер=УРОВЕНЬ` (через запятую или с новой строки,
+    `#` - комментарий) в справочник
+    """
+    levels = dict()
+    for line in value.splitlines():
+        for item in line.split('#', 1)[0].split(','):
+            if not item.strip():
+                continue
+            name, separator, level = item.partition('=')
+            if not separator or not name.strip():
+                raise ValueError(f'Некорректная настройка уровня логгера: {item.strip()}')
+            level = level.strip()
+            levels[name.strip()] = _checkLevel(int(level) if level.isdigit() else level.upper())
+    return levels
+
+
+def _env_option(value: Any, name: str, cast: Callable[[str], Any] = str) -> Any:
+    """
+    Значение параметра: явно заданное значение или значение переменной окружения
+
+    :param value: Явно заданное значение (None - не задано)
+    :param name: Наименование переменной окружения
+    :param cast: Преобразование значения переменной окружения
+
+    :return: Значение параметра или None, если оно не задано
+    """
+    if value is not None:
+        return value
+
+    env_value = environ.get(name)
+    if not env_value:
+        return None
+    return cast(env_value)
 
 
 class PyTraceLog:
@@ -64,171 +207,992 @@ class PyTraceLog:
        уровня записи журнала);
      * Инициализация отправки записей журнала напрямую в Logstash;
      * Инициализация трассировки;
-     * Добавление дополнительных атрибутов к записям журнала.
+     * Добавление дополнительных атрибутов к записям журнала;
+     * Ограничение частоты повторяющихся записей журнала;
+     * Метрики обработчиков записей журнала и экспорта SPAN;
+     * Перезапуск обработчиков в дочерних процессах после fork и передача записей дочерних процессов
+       в родительский процесс;
+     * Трассировка и контекст логирования запросов Falcon и задач Celery.
 
     """
     _old_factory: Optional[Callable] = None
+    _record_factory: Optional[RecordFactory] = None
     _handlers: Optional[List[Handler]] = list()
+    # Обработчики вывода в stdout и stderr (см. `init_root_logger`)
+    _stream_handlers: List[Handler] = list()
+    _span_processor = None
+    _record_receiver = None
+    _async_handler: Optional[BufferedQueueHandler] = None
+    _rate_limit_filter: Optional[RateLimitFilter] = None
+    # Метрики обработчиков (`HandlerMetrics`, None - метрики не включены) и сервер метрик Prometheus
+    _handler_metrics: Optional[List[Any]] = None
+    _metrics_server = None
+    # Приложения Falcon с middleware PyTraceLog и привязка контекста задач Celery
+    _falcon_apps: List[Any] = list()
+    _task_log_context = None
+    # Уровни логгеров, установленные `set_levels`, и уровни этих логгеров до изменения
+    _logger_levels: Dict[str, int] = dict()
+    _original_levels: Dict[str, int] = dict()
+    _levels_path: Optional[str] = None
+    _previous_signal_handler = None
+    # Запрос перечитывания файла настройки уровней (устанавливается обработчиком сигнала) и поток перечитывания
+    _levels_reload: Optional[Event] = None
+    _levels_reloader: Optional[Thread] = None
 
     @staticmethod
     def init_root_logger(
             level: Union[str, int] = WARNING,
+            queue_size: Optional[int] = None,
+            overflow_policy: str = OVERFLOW_BLOCK,
+            batch_size: int = 512,
+            router: bool = False,
+            routes: Optional[Sequence[Tuple[Union[str, int], Union[TextIO, Handler]]]] = None,
+            json_lines: bool = False,
     ) -> None:
         """
         Инициализация логирования: инициализирует root логгер
         LOGSTASH_HOST.
 
+        Если задан флаг `router` или список маршрутов `routes`, вместо пары `StdoutHandler`/`StderrHandler`
+        используется один обработчик `LevelRouterHandler`, который выбирает поток вывода по уровню записи.
+
+        Если задан размер очереди `queue_size`, вывод в stdout и stderr выполняется фоновым потоком через
+        ограниченную очередь (см. `BufferedQueueHandler`), и вызов логгера не блокируется на записи в поток.
+
+        Может вызываться после других методов инициализации: обработчики добавляются так же, как обработчики
+        Logstash (за очередь асинхронного режима, с ограничением частоты записей и метриками).
+
         :param level: Уровень логирования
+        :param queue_size: Размер очереди записей (None - синхронный вывод)
+        :param overflow_policy: Поведение при заполнении очереди (см. `OVERFLOW_POLICIES`)
+        :param batch_size: Максимальное количество записей, выводимых одним вызовом `write()`
+        :param router: Использовать маршрутизацию записей по уровню одним обработчиком
+        :param routes: Список пар (минимальный уровень, поток вывода или обработчик) для маршрутизации
+        :param json_lines: Выводить записи в формате JSON, одна запись в строке (см. `JsonFormatter`):
+            с идентификаторами трассировки, атрибутами записи и исключением
         """
-        # Выходим, т.к. все уже инициализировано
-        if len(root.handlers) != 0:
+        # Выходим, если вывод уже инициализирован или root логгер настроен без PyTraceLog
+        handlers = PyTraceLog._handlers
+        if (
+                any(handler in handlers for handler in PyTraceLog._stream_handlers)
+                or any(handler not in handlers for handler in root.handlers)
+        ):
             return
 
+        # Записи кэшируют сообщение и атрибуты для всех обработчиков (см. `CachedLogRecord`)
+        PyTraceLog._install_record_factory()
+
         if isinstance(level, str):
             level = _checkLevel(level.upper())
 
-        # Добавление обработчика для вывода логов в stdout
-        stdout_handler = StdoutHandler()
-        PyTraceLog._handlers.append(stdout_handler)
+        # Обработчики для вывода логов в stdout и stderr
+        if router or routes is not None:
+            stream_handlers = [LevelRouterHandler(routes=routes)]
+            if json_lines:
+                stream_handlers[0].setFormatter(JsonFormatter())
+        else:
+            stream_handlers = [StdoutHandler(json_lines=json_lines), StderrHandler(json_lines=json_lines)]
+        # Формат по умолчанию, как у `basicConfig`, с количеством подавленных повторов записи
+        formatter = RepeatedFormatter(BASIC_FORMAT)
+        for handler in stream_handlers:
+            if handler.formatter is None:
+                handler.setFormatter(formatter)
+
+        if queue_size:
+            stream_handlers = [
+                BufferedQueueHandler(
+                    handlers=stream_handlers,
+                    queue_size=queue_size,
+                    overflow_policy=overflow_policy,
+                    batch_size=batch_size
+                )
+            ]
+
+        PyTraceLog._stream_handlers = stream_handlers
+        root.setLevel(level)
+        for handler in stream_handlers:
+            PyTraceLog._add_handler(handler=handler, level=level)
+
+    @staticmethod
+    def set_levels(levels: Optional[Union[Mapping[str, Union[str, int]], str]] = None) -> Dict[str, int]:
+        """
+        Установка уровней логгеров за один проход: уровни присваиваются без `Logger.setLevel` (который сбрасывает
+        кэш `isEnabledFor` всех логгеров при каждом вызове), кэш сбрасывается один раз. Для логгеров с повышенным
+        уровнем вызовы ниже уровня отсекаются кэшем `isEnabledFor`: запись не создается и фабрики записей
+        (`extend_log_record`, `log_context`) не вызываются.
+
+        Логгеры, уровни которых были установлены предыдущим вызовом и отсутствуют в новой настройке,
+        возвращаются к исходному уровню.
+
+        :param levels: Справочник или строка вида ``root=INFO,urllib3=WARNING,sqlalchemy.engine=ERROR``;
+            по умолчанию - содержимое файла LOG_LEVELS_FILE или значение переменной окружения LOG_LEVELS.
+            Root логгер задается наименованием `root`
+
+        :return: Установленные уровни логгеров
+        """
+        if levels is None:
+            path = PyTraceLog._levels_path or environ.get(LOG_LEVELS_FILE)
+            if path:
+                with open(path, encoding='utf-8') as levels_file:
+                    levels = levels_file.read()
+            else:
+                levels = environ.get(LOG_LEVELS, '')
+
+        if isinstance(levels, str):
+            levels = _to_levels(levels)
+        else:
+            levels = {
+                name: _checkLevel(level.upper() if isinstance(level, str) else level)
+                for name, level in levels.items()
+            }
+
+        def get_logger(logger_name):
+            return root if logger_name in (ROOT_LOGGER_NAME, '') else getLogger(logger_name)
+
+        for name in PyTraceLog._logger_levels.keys() - levels.keys():
+            get_logger(name).level = PyTraceLog._original_levels.pop(name)
+
+        for name, level in levels.items():
+            target = get_logger(name)
+            PyTraceLog._original_levels.setdefault(name, target.level)
+            target.level = level
+
+        PyTraceLog._logger_levels = levels
+        root.manager._clear_cache()
+        return levels
+
+    @staticmethod
+    def init_levels(
+            levels: Optional[Union[Mapping[str, Union[str, int]], str]] = None,
+            path: Optional[str] = None,
+            reload_signal: Optional[int] = SIGHUP,
+    ) -> None:
+        """
+        Инициализация уровней логгеров (см. `set_levels`) с перечитыванием файла настройки по сигналу: уровень
+        шумного логгера можно изменить без перезапуска процесса, изменив файл (например, ConfigMap) и отправив
+        процессу сигнал (по умолчанию SIGHUP). Вызывается из главного потока.
+
+        Обработчик сигнала только передает запрос фоновому потоку: чтение файла и запись в журнал при ошибке
+        выполняются вне обработчика сигнала, т.к. сигнал может прервать главный поток, удерживающий блокировку
+        обработчика журнала.
+
+        :param levels: Уровни логгеров (справочник или строка); по умолчанию - из файла или переменной окружения
+            LOG_LEVELS
+        :param path: Путь к файлу настройки уровней (LOG_LEVELS_FILE)
+        :param reload_signal: Сигнал перечитывания файла настройки (None - без перечитывания); обработчик
+            сигнала устанавливается, только если задан файл
+        """
+        PyTraceLog._levels_path = _env_option(path, LOG_LEVELS_FILE)
+        PyTraceLog.set_levels(levels=levels)
+
+        if reload_signal is not None and PyTraceLog._levels_path and PyTraceLog._previous_signal_handler is None:
+            PyTraceLog._start_levels_reloader()
+            PyTraceLog._previous_signal_handler = (reload_signal, getsignal(reload_signal))
+            signal(reload_signal, PyTraceLog._reload_levels_on_signal)
+
+    @staticmethod
+    def reload_levels() -> bool:
+        """
+        Перечитывание файла настройки уровней логгеров. Ошибка в настройке не изменяет текущие уровни.
+
+        :return: Признак успешного применения настройки
+        """
+        try:
+            PyTraceLog.set_levels()
+        except (OSError, ValueError, TypeError):
+            logger.exception('Ошибка перечитывания уровней логгеров')
+            return False
+        return True
 
-        # Добавление обработчика для вывода логов в stderr
-        stderr_handler = StderrHandler()
-        PyTraceLog._handlers.append(stderr_handler)
+    @staticmethod
+    def _reload_levels_on_signal(signum, frame) -> None:
+        reload = PyTraceLog._levels_reload
+        if reload is not None:
+            reload.set()
 
-        basicConfig(
-            level=level,
-            handlers=PyTraceLog._handlers
+    @staticmethod
+    def _start_levels_reloader() -> None:
+        """
+        Запуск фонового потока перечитывания файла настройки уровней по запросу обработчика сигнала
+        """
+        reload = Event()
+        PyTraceLog._levels_reload = reload
+        PyTraceLog._levels_reloader = Thread(
+            target=PyTraceLog._reload_levels_loop, args=(reload,), name='PyTraceLogLevelsReloader', daemon=True
         )
+        PyTraceLog._levels_reloader.start()
+
+    @staticmethod
+    def _stop_levels_reloader() -> None:
+        reload, reloader = PyTraceLog._levels_reload, PyTraceLog._levels_reloader
+        PyTraceLog._levels_reload = PyTraceLog._levels_reloader = None
+        if reload is not None:
+            reload.set()
+            reloader.join(timeout=5.0)
+
+    @staticmethod
+    def _reload_levels_loop(reload: Event) -> None:
+        """
+        Перечитывание файла настройки уровней до остановки потока (см. `_stop_levels_reloader`)
+
+        :param reload: Запрос перечитывания
+        """
+        while True:
+            reload.wait()
+            reload.clear()
+            if PyTraceLog._levels_reload is not reload:
+                return
+            PyTraceLog.reload_levels()
 
     @staticmethod
     def extend_log_record(**_kwargs) -> None:
         """
-        Расширение записи лога статическими атрибутами
+        Расширение записи лога атрибутами.
+        Значения могут быть статическими, вызываемыми объектами (вызываются при создании каждой записи) или
+        `ContextVar` (значение берется из текущего контекста). Повторные вызовы дополняют одну фабрику записей.
 
         :param _kwargs: Список атрибутов со значениями
         """
-        old_factory = getLogRecordFactory()
-        PyTraceLog._old_factory = old_factory
+        PyTraceLog._install_record_factory().extend(**_kwargs)
+
+    @staticmethod
+    def log_context(**_kwargs) -> LogContext:
+        """
+        Привязка атрибутов записей к контексту запроса или задачи (контекстный менеджер и декоратор).
+        Атрибуты попадают во все записи, созданные в контексте, в том числе в Logstash и в атрибуты событий
+        трассировки, и корректно передаются между `await` в asyncio.
+
+        Пример::
+
+            with PyTraceLog.log_context(request_id=request_id, tenant=tenant):
+                logger.info('Обработка запроса')
+
+        :param _kwargs: Список атрибутов со значениями
 
-        def record_factory(*args, **kwargs):
-            record = old_factory(*args, **kwargs)
+        :return: Контекстный менеджер
+        """
+        PyTraceLog._install_record_factory()
+        return LogContext(**_kwargs)
 
-            for k, v in _kwargs.items():
-                record.__setattr__(k, v)
+    @staticmethod
+    def _install_record_factory() -> RecordFactory:
+        """
+        Установка фабрики записей PyTraceLog поверх текущей фабрики (однократно)
 
-            return record
+        :return: Фабрика записей
+        """
+        if PyTraceLog._record_factory is None:
+            PyTraceLog._old_factory = getLogRecordFactory()
+            PyTraceLog._record_factory = RecordFactory(base_factory=PyTraceLog._old_factory)
+            setLogRecordFactory(PyTraceLog._record_factory)
 
-        setLogRecordFactory(record_factory)
+        return PyTraceLog._record_factory
 
     @staticmethod
     def init_logstash_logger(
             level: Union[str, int] = WARNING,
             message_type: str = 'python',
-            index_name: str = 'python'
+            index_name: str = 'python',
+            spool_path: Optional[str] = None,
+            spool_max_events: Optional[int] = None,
+            spool_eviction: Optional[str] = None,
+            event_ttl: Optional[int] = None,
+            batch_size: Optional[int] = None,
+            flush_interval: Optional[float] = None,
+            flush_count: Optional[int] = None,
+            transport: Optional[str] = None,
+            socket_timeout: Optional[float] = None,
+            ssl_enable: Optional[bool] = None,
+            ssl_verify: Optional[Union[bool, str]] = None,
+            keyfile: Optional[str] = None,
+            certfile: Optional[str] = None,
+            ca_certs: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None,
     ) -> None:
         """
-        Инициализация Logstash логгера: добавление обработчика для отправки записей журналов в Logstash
+        Инициализация Logstash логгера: добавление обработчика для отправки записей журналов в Logstash.
+
+        Если задан файл буфера (`spool_path` или переменная окружения LOGSTASH_SPOOL_PATH), события до отправки
+        хранятся на диске: они не теряются при перезапуске процесса и отправляются при следующем запуске.
+        Не заданные параметры берутся из переменных окружения LOGSTASH_* (указаны в скобках), иначе действуют
+        значения по умолчанию `logstash_async`. Учетные данные для транспорта http задаются только переменными
+        окружения LOGSTASH_USERNAME и LOGSTASH_PASSWORD.
 
         :param level: Уровень логирования (только если root логгер еще не инициализирован)
         :param message_type: Тип сообщения
         :param index_name: Наименование индекса в Elasticsearch
+        :param spool_path: Путь к файлу буфера событий (LOGSTASH_SPOOL_PATH; None - буфер в памяти)
+        :param spool_max_events: Максимальное количество событий в буфере (LOGSTASH_SPOOL_MAX_EVENTS)
+        :param spool_eviction: Поведение при заполнении буфера: drop_oldest или drop_newest
+            (LOGSTASH_SPOOL_EVICTION)
+        :param event_ttl: Время хранения события в буфере, сек. (LOGSTASH_EVENT_TTL)
+        :param batch_size: Максимальное количество событий, отправляемых одним пакетом (LOGSTASH_BATCH_SIZE)
+        :param flush_interval: Интервал отправки событий, сек. (LOGSTASH_FLUSH_INTERVAL)
+        :param flush_count: Количество накопленных событий, при котором выполняется отправка
+            (LOGSTASH_FLUSH_COUNT; по умолчанию - `batch_size`)
+        :param transport: Транспорт: tcp, udp, beats, http или путь к классу транспорта (LOGSTASH_TRANSPORT)
+        :param socket_timeout: Таймаут сокета, сек. (LOGSTASH_SOCKET_TIMEOUT)
+        :param ssl_enable: Использовать TLS (LOGSTASH_SSL_ENABLE)
+        :param ssl_verify: Проверять сертификат сервера; может быть задан путь к файлу сертификатов
+            (LOGSTASH_SSL_VERIFY)
+        :param keyfile: Путь к закрытому ключу клиента (LOGSTASH_KEYFILE)
+        :param certfile: Путь к сертификату клиента (LOGSTASH_CERTFILE)
+        :param ca_certs: Путь к сертификатам удостоверяющих центров (LOGSTASH_CA_CERTS)
+        :param fields: Дополнительные атрибуты записи, передаваемые в Logstash; None - все атрибуты
+            (LOGSTASH_FIELDS, через запятую)
         """
+        logstash_host = environ.get(LOGSTASH_HOST)
+
+        # Инициализируем обработчик, только если задан хост Logstash
+        if not logstash_host:
+            return
+
+        # Импорт выполняется только при инициализации, т.к. занимает заметное время
+        from logstash_async.handler import AsynchronousLogstashHandler
+        from pytracelog.logging.logstash import (
+            LogstashHandler,
+            LogstashJsonFormatter,
+        )
+
         # Ничего не делаем, если обработчик уже есть в списке
         for handler in PyTraceLog._handlers:
             if isinstance(handler, AsynchronousLogstashHandler):
                 return
 
-        logstash_host = environ.get(LOGSTASH_HOST)
-
-        # Инициализируем обработчик, только если задан хост Logstash
-        if logstash_host:
-            logstash_formatter = LogstashFormatter(
-                message_type=message_type,
-                extra_prefix=None,
-                metadata={
-                    'beat': index_name
-                }
+        # Параметры транспорта передаются, только если заданы (иначе действуют значения по умолчанию транспорта)
+        transport_options = {
+            name: value
+            for name, value in (
+                ('ssl_enable', _env_option(ssl_enable, LOGSTASH_SSL_ENABLE, _to_bool)),
+                ('ssl_verify', _env_option(ssl_verify, LOGSTASH_SSL_VERIFY, _to_ssl_verify)),
+                ('keyfile', _env_option(keyfile, LOGSTASH_KEYFILE)),
+                ('certfile', _env_option(certfile, LOGSTASH_CERTFILE)),
+                ('ca_certs', _env_option(ca_certs, LOGSTASH_CA_CERTS)),
+                ('username', environ.get(LOGSTASH_USERNAME) or None),
+                ('password', environ.get(LOGSTASH_PASSWORD) or None),
             )
-            logstash_handler = AsynchronousLogstashHandler(
-                host=logstash_host,
-                port=int(environ.get(LOGSTASH_PORT, 5959)),
-                database_path=None
+            if value is not None
+        }
+
+        logstash_formatter = LogstashJsonFormatter(
+            message_type=message_type,
+            metadata={
+                'beat': index_name
+            },
+            fields=_env_option(fields, LOGSTASH_FIELDS, _to_list)
+        )
+        logstash_handler = LogstashHandler(
+            host=logstash_host,
+            port=int(environ.get(LOGSTASH_PORT, 5959)),
+            database_path=_env_option(spool_path, LOGSTASH_SPOOL_PATH),
+            max_events=_env_option(spool_max_events, LOGSTASH_SPOOL_MAX_EVENTS, int),
+            eviction_policy=_env_option(spool_eviction, LOGSTASH_SPOOL_EVICTION) or OVERFLOW_DROP_OLDEST,
+            event_ttl=_env_option(event_ttl, LOGSTASH_EVENT_TTL, int),
+            batch_size=_env_option(batch_size, LOGSTASH_BATCH_SIZE, int),
+            flush_count=_env_option(flush_count, LOGSTASH_FLUSH_COUNT, int),
+            flush_interval=_env_option(flush_interval, LOGSTASH_FLUSH_INTERVAL, float),
+            socket_timeout=_env_option(socket_timeout, LOGSTASH_SOCKET_TIMEOUT, float),
+            transport=_env_option(transport, LOGSTASH_TRANSPORT) or 'tcp',
+            **transport_options
+        )
+        logstash_handler.setFormatter(fmt=logstash_formatter)
+        PyTraceLog._add_handler(handler=logstash_handler, level=level)
+
+    @staticmethod
+    def _add_handler(handler: Handler, level: Union[str, int]) -> None:
+        """
+        Добавление обработчика к root логгеру (в асинхронном режиме - за очередью, см. `init_async_logging`)
+
+        :param handler: Обработчик
+        :param level: Уровень логирования (только если root логгер еще не инициализирован)
+        """
+        PyTraceLog._handlers.append(handler)
+        if PyTraceLog._handler_metrics is not None:
+            PyTraceLog._instrument_handler(handler=handler)
+
+        async_handler = PyTraceLog._async_handler
+        if async_handler is not None and not isinstance(handler, TracerHandler):
+            # Список заменяется, а не изменяется: фоновый поток очереди может перебирать обработчики
+            async_handler.handlers = async_handler.handlers + [handler]
+            return
+
+        if PyTraceLog._rate_limit_filter is not None:
+            handler.addFilter(PyTraceLog._rate_limit_filter)
+        # Если root логгер инициализирован, добавляем обработчик
+        if len(root.handlers) != 0:
+            root.addHandler(hdlr=handler)
+        # Иначе выполняем его инициализацию
+        else:
+            basicConfig(
+                level=level,
+                handlers=PyTraceLog._handlers
             )
-            logstash_handler.setFormatter(fmt=logstash_formatter)
-            PyTraceLog._handlers.append(logstash_handler)
 
-            # Если root логгер инициализирован, добавляем обработчик
-            if len(root.handlers) != 0:
-                root.addHandler(hdlr=logstash_handler)
-            # Иначе выполняем его инициализацию
-            else:
-                basicConfig(
-                    level=level,
-                    handlers=PyTraceLog._handlers
-                )
+    @staticmethod
+    def _remove_handler(handler: Handler) -> None:
+        """
+        Удаление обработчика из root логгера (или из очереди асинхронного режима) без закрытия
+
+        :param handler: Обработчик
+        """
+        root.removeHandler(hdlr=handler)
+        if PyTraceLog._rate_limit_filter is not None:
+            handler.removeFilter(PyTraceLog._rate_limit_filter)
+        async_handler = PyTraceLog._async_handler
+        if async_handler is not None and handler in async_handler.handlers:
+            async_handler.handlers = [h for h in async_handler.handlers if h is not handler]
+        if handler in PyTraceLog._handlers:
+            PyTraceLog._handlers.remove(handler)
+        if PyTraceLog._handler_metrics is not None:
+            for metrics in PyTraceLog._handler_metrics:
+                if metrics.handler is handler:
+                    metrics.uninstall()
+                    PyTraceLog._handler_metrics.remove(metrics)
+                    break
+
+    @staticmethod
+    def init_async_logging(
+            queue_size: int = 10000,
+            overflow_policy: str = OVERFLOW_DROP_OLDEST,
+            batch_size: int = 512,
+    ) -> None:
+        """
+        Асинхронный режим для сервисов на asyncio: обработчики PyTraceLog переносятся за одну ограниченную
+        очередь (см. `BufferedQueueHandler`), и вызов логгера в корутине только помещает запись в очередь, не
+        ожидая блокировок обработчиков, записи в поток и сети. Записи форматируются и выводятся пакетами
+        фоновым потоком. Обработчики, инициализированные после вызова, также добавляются за очередь.
+
+        Связь с трассировкой фиксируется при вызове логгера: идентификаторы трассировки добавляются в запись
+        фабрикой записей (см. `SpanCorrelation`), а `TracerHandler` остается в вызывающем потоке - он не
+        выполняет ввод-вывод, а событие, добавленное фоновым потоком после завершения SPAN, было бы отброшено.
+
+        :param queue_size: Максимальное количество записей в очереди
+        :param overflow_policy: Поведение при заполнении очереди (см. `OVERFLOW_POLICIES`); политика
+            `OVERFLOW_BLOCK` блокирует цикл событий и не допускается
+        :param batch_size: Максимальное количество записей, выводимых одним вызовом `write()`
+        """
+        if overflow_policy == OVERFLOW_BLOCK:
+            raise ValueError('В асинхронном режиме политика переполнения очереди не может блокировать вызов')
+        if PyTraceLog._async_handler is not None:
+            return
+
+        handlers = [
+            handler for handler in PyTraceLog._handlers
+            if handler in root.handlers and not isinstance(handler, TracerHandler)
+        ]
+        async_handler = BufferedQueueHandler(
+            handlers=handlers,
+            queue_size=queue_size,
+            overflow_policy=overflow_policy,
+            batch_size=batch_size
+        )
+        rate_limit_filter = PyTraceLog._rate_limit_filter
+        for handler in handlers:
+            root.removeHandler(hdlr=handler)
+            if rate_limit_filter is not None:
+                handler.removeFilter(rate_limit_filter)
+        if rate_limit_filter is not None:
+            async_handler.addFilter(rate_limit_filter)
+        root.addHandler(hdlr=async_handler)
+
+        # Очередь закрывается первой, чтобы вывести оставшиеся записи до закрытия обработчиков
+        PyTraceLog._handlers.insert(0, async_handler)
+        PyTraceLog._async_handler = async_handler
+        if PyTraceLog._handler_metrics is not None:
+            PyTraceLog._instrument_handler(handler=async_handler)
+
+    @staticmethod
+    def init_rate_limit(
+            rate: float = 10.0,
+            burst: Optional[float] = None,
+            summary_interval: float = 60.0,
+            max_keys: int = 10000,
+    ) -> None:
+        """
+        Ограничение частоты повторяющихся записей (одинаковые логгер, уровень, шаблон сообщения и место вызова)
+        для обработчиков PyTraceLog, в том числе инициализированных после вызова: при лавине одинаковых ошибок
+        записи сверх ограничения не выводятся, не отправляются в Logstash и не регистрируются в SPAN, а
+        периодически пропускается запись с количеством подавленных записей в атрибуте `repeated`
+        (см. `RateLimitFilter`, `RepeatedFormatter`). Сводки оставшихся подавленных записей выводятся
+        при `reset` и при завершении процесса.
+
+        :param rate: Максимальная частота одинаковых записей, записей в секунду
+        :param burst: Допустимый всплеск одинаковых записей (по умолчанию - `rate`)
+        :param summary_interval: Интервал между сводками подавленных записей, сек.
+        :param max_keys: Максимальное количество отслеживаемых записей
+        """
+        if PyTraceLog._rate_limit_filter is not None:
+            return
+
+        rate_limit_filter = RateLimitFilter(
+            rate=rate,
+            burst=burst,
+            summary_interval=summary_interval,
+            max_keys=max_keys
+        )
+        # Фильтр устанавливается на обработчики root логгера; обработчики за очередью асинхронного режима
+        # получают только записи, пропущенные фильтром очереди
+        for handler in PyTraceLog._handlers:
+            if handler in root.handlers:
+                handler.addFilter(rate_limit_filter)
+        PyTraceLog._rate_limit_filter = rate_limit_filter
+        # Сводки подавленных записей выводятся при завершении процесса до закрытия обработчиков
+        # (`logging.shutdown` зарегистрирован раньше и вызывается позже)
+        register_at_exit(rate_limit_filter.close)
+
+    @staticmethod
+    def init_metrics(port: Optional[int] = None, addr: str = '') -> None:
+        """
+        Включение метрик обработчиков PyTraceLog, в том числе инициализированных после вызова: количество
+        записей и гистограмма времени обработки записи (см. `HandlerMetrics`). Снимок метрик и счетчиков
+        обработчиков доступен через `stats`.
+
+        Если задан порт, метрики также доступны в текстовом формате Prometheus по HTTP (`/metrics`).
+
+        :param port: Порт сервера метрик Prometheus (None - сервер не запускается, 0 - свободный порт)
+        :param addr: Адрес сервера метрик
+        """
+        if PyTraceLog._handler_metrics is None:
+            PyTraceLog._handler_metrics = list()
+            for handler in PyTraceLog._handlers:
+                PyTraceLog._instrument_handler(handler=handler)
+
+        if port is not None and PyTraceLog._metrics_server is None:
+            # Модуль метрик импортирует HTTP сервер, поэтому импортируется только при включении метрик
+            from pytracelog.metrics import MetricsServer
+
+            PyTraceLog._metrics_server = MetricsServer(get_stats=PyTraceLog.stats, port=port, addr=addr)
 
     @staticmethod
-    def init_tracer(service: str) -> None:
+    def _instrument_handler(handler: Handler) -> None:
         """
-        Инициализация трассировки, если задана переменная окружения OTEL_EXPORTER_JAEGER_AGENT_HOST.
+        Установка метрик обработчика
+
+        :param handler: Обработчик
+        """
+        from pytracelog.metrics import HandlerMetrics
+
+        metrics = HandlerMetrics(handler=handler)
+        metrics.install()
+        PyTraceLog._handler_metrics.append(metrics)
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        """
+        Снимок счетчиков подсистем логирования и трассировки:
+         * handlers - справочник по обработчикам PyTraceLog (наименование обработчика или его класса): счетчики
+           обработчика (записи в очереди, отброшенные записи и события и т.д.) и, если метрики включены
+           (см. `init_metrics`), количество записей и гистограмма времени обработки (см. `HandlerMetrics.snapshot`);
+         * rate_limit - счетчики ограничения частоты записей (см. `init_rate_limit`);
+         * spans - счетчики экспорта SPAN (см. `get_span_stats`).
+
+        :return: Справочник счетчиков
+        """
+        metrics = {m.handler: m for m in PyTraceLog._handler_metrics or ()}
+        handlers = dict()
+        for handler in PyTraceLog._handlers:
+            name = handler.get_name() or type(handler).__name__
+            index = 1
+            while name in handlers:
+                index += 1
+                name = f'{handler.get_name() or type(handler).__name__}#{index}'
+
+            handler_stats = dict()
+            get_stats = getattr(handler, 'stats', None)
+            if get_stats is not None:
+                handler_stats.update(get_stats())
+            if handler in metrics:
+                handler_stats.update(metrics[handler].snapshot())
+            handlers[name] = handler_stats
+
+        stats = {
+            'handlers': handlers,
+            'spans': PyTraceLog.get_span_stats(),
+        }
+        if PyTraceLog._rate_limit_filter is not None:
+            stats['rate_limit'] = PyTraceLog._rate_limit_filter.stats()
+        return stats
+
+    @staticmethod
+    def init_forwarding(
+            handlers: Optional[Sequence[Handler]] = None,
+            socket_path: Optional[str] = None,
+    ) -> None:
+        """
+        Передача записей журнала из дочерних процессов (воркеров gunicorn, Celery prefork) в родительский процесс.
+
+        Вызывается в родительском процессе после инициализации обработчиков и до создания дочерних процессов.
+        После fork в дочернем процессе обработчики `handlers` заменяются одним `ForwardingHandler`, который
+        передает записи через Unix socket, а отправку выполняют обработчики родительского процесса: N воркеров
+        не держат собственные соединения с Logstash и буферы событий.
+
+        :param handlers: Обработчики родительского процесса, которым передаются записи дочерних процессов
+            (по умолчанию - обработчики Logstash, см. `init_logstash_logger`)
+        :param socket_path: Путь к Unix socket (по умолчанию - во временном каталоге)
+        """
+        if PyTraceLog._record_receiver is not None:
+            return
+
+        if handlers is None:
+            # Импорт выполняется только при инициализации, т.к. занимает заметное время
+            from logstash_async.handler import AsynchronousLogstashHandler
+
+            handlers = [
+                handler for handler in PyTraceLog._handlers if isinstance(handler, AsynchronousLogstashHandler)
+            ]
+        if not handlers:
+            return
+
+        from pytracelog.logging.forwarding import RecordReceiver
+
+        PyTraceLog._record_receiver = RecordReceiver(handlers=handlers, path=socket_path)
+
+    @staticmethod
+    def _after_fork_in_child() -> None:
+        """
+        Перезапуск обработчиков в дочернем процессе после fork: фоновые потоки родительского процесса в дочернем
+        процессе не существуют, а их очереди и блокировки могли быть захвачены в момент fork.
+        Поток экспорта SPAN перезапускает `BatchSpanProcessor`.
+        """
+        receiver = PyTraceLog._record_receiver
+        handlers = PyTraceLog._handlers
+        if receiver is not None:
+            handlers = handlers + [handler for handler in receiver.handlers if handler not in handlers]
+
+        for handler in handlers:
+            reinit_after_fork = getattr(handler, 'reinit_after_fork', None)
+            if reinit_after_fork is not None:
+                reinit_after_fork()
+
+        for metrics in PyTraceLog._handler_metrics or ():
+            metrics.reinit_after_fork()
+        # Обработчик сигнала наследуется дочерним процессом, поток перечитывания уровней - нет
+        if PyTraceLog._levels_reload is not None:
+            PyTraceLog._start_levels_reloader()
+        # Сервер метрик обслуживает родительский процесс
+        if PyTraceLog._metrics_server is not None:
+            PyTraceLog._metrics_server.socket.close()
+            PyTraceLog._metrics_server = None
+
+        if receiver is None:
+            return
+
+        # Записи передаются в родительский процесс вместо обработчиков receiver.handlers; обработчики
+        # не закрываются, т.к. их ресурсы принадлежат родительскому процессу
+        from pytracelog.logging.forwarding import ForwardingHandler
+
+        PyTraceLog._record_receiver = None
+        receiver.detach_after_fork()
+
+        forwarding_handler = ForwardingHandler(path=receiver.path)
+        forwarding_handler.setLevel(min(handler.level for handler in receiver.handlers))
+        for handler in receiver.handlers:
+            PyTraceLog._remove_handler(handler=handler)
+        PyTraceLog._add_handler(handler=forwarding_handler, level=root.level)
+
+    @staticmethod
+    def init_tracer(
+            service: str,
+            max_queue_size: Optional[int] = None,
+            max_export_batch_size: Optional[int] = None,
+            schedule_delay_millis: Optional[float] = None,
+            export_timeout_millis: Optional[float] = None,
+            collector_endpoint: Optional[str] = None,
+            udp_split_oversized_batches: bool = True,
+            sampler: Optional[Any] = None,
+            sampler_arg: Optional[str] = None,
+            tail_sampling: bool = False,
+            tail_latency_threshold_millis: Optional[float] = 1000.0,
+            tail_sample_ratio: float = 0.01,
+    ) -> None:
+        """
+        Инициализация трассировки, если задана переменная окружения OTEL_EXPORTER_JAEGER_AGENT_HOST (экспорт
+        через агент Jaeger по UDP) или адрес коллектора Jaeger (экспорт по HTTP).
+
+        Не заданные параметры пакетной отправки берутся из стандартных переменных окружения OTEL_BSP_*, адрес
+        коллектора - из OTEL_EXPORTER_JAEGER_ENDPOINT. Счетчики отброшенных и экспортированных SPAN доступны
+        через `get_span_stats`.
+
+        К записям журнала добавляются идентификаторы трассировки и SPAN (атрибуты otelTraceID, otelSpanID и
+        otelServiceName, см. `SpanCorrelation`).
 
         :param service: Наименование сервиса
+        :param max_queue_size: Максимальный размер очереди SPAN (OTEL_BSP_MAX_QUEUE_SIZE)
+        :param max_export_batch_size: Максимальное количество SPAN в пакете экспорта
+            (OTEL_BSP_MAX_EXPORT_BATCH_SIZE)
+        :param schedule_delay_millis: Интервал экспорта, мс (OTEL_BSP_SCHEDULE_DELAY)
+        :param export_timeout_millis: Таймаут экспорта, мс (OTEL_BSP_EXPORT_TIMEOUT); для коллектора также
+            таймаут HTTP запроса
+        :param collector_endpoint: Адрес коллектора Jaeger, например http://jaeger-collector:14268/api/traces
+            (OTEL_EXPORTER_JAEGER_ENDPOINT)
+        :param udp_split_oversized_batches: Разбивать пакеты, превышающие максимальный размер UDP пакета,
+            вместо их отбрасывания (только для агента)
+        :param sampler: Выборка трассировок: экземпляр `Sampler` или наименование (см. `get_sampler`);
+            по умолчанию - из переменной окружения OTEL_TRACES_SAMPLER
+        :param sampler_arg: Аргумент выборки, если она задана наименованием (OTEL_TRACES_SAMPLER_ARG)
+        :param tail_sampling: Выборка трассировок по завершении перед экспортом: сохраняются трассировки с
+            ошибками, медленные трассировки и доля остальных (см. `TailSamplingSpanProcessor`)
+        :param tail_latency_threshold_millis: Длительность SPAN, при которой трассировка сохраняется, мс
+        :param tail_sample_ratio: Доля сохраняемых трассировок без ошибок и медленных SPAN
         """
-        if not environ.get(OTEL_EXPORTER_JAEGER_AGENT_HOST):
+        collector_endpoint = collector_endpoint or environ.get(OTEL_EXPORTER_JAEGER_ENDPOINT)
+        if not environ.get(OTEL_EXPORTER_JAEGER_AGENT_HOST) and not collector_endpoint:
             return
 
-        jaeger_exporter = JaegerExporter()
-        span_processor = BatchSpanProcessor(span_exporter=jaeger_exporter)
+        # Импорт выполняется только при инициализации, т.к. занимает заметное время
+        from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+        from opentelemetry.sdk.resources import (
+            SERVICE_NAME,
+            Resource
+        )
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.trace import set_tracer_provider
+        from pytracelog.tracing.correlation import SpanCorrelation
+        from pytracelog.tracing.processors import (
+            CountingBatchSpanProcessor,
+            TailSamplingSpanProcessor,
+        )
+        from pytracelog.tracing.samplers import get_sampler
+
+        if sampler is None or isinstance(sampler, str):
+            sampler = get_sampler(name=sampler, arg=sampler_arg)
+
+        jaeger_exporter = JaegerExporter(
+            collector_endpoint=collector_endpoint,
+            udp_split_oversized_batches=udp_split_oversized_batches,
+            # Таймаут HTTP запроса к коллектору задается в секундах
+            timeout=ceil(export_timeout_millis / 1000) if export_timeout_millis else None
+        )
+        span_processor = CountingBatchSpanProcessor(
+            span_exporter=jaeger_exporter,
+            max_queue_size=max_queue_size,
+            max_export_batch_size=max_export_batch_size,
+            schedule_delay_millis=schedule_delay_millis,
+            export_timeout_millis=export_timeout_millis
+        )
+        if tail_sampling:
+            span_processor = TailSamplingSpanProcessor(
+                span_processor=span_processor,
+                latency_threshold_millis=tail_latency_threshold_millis,
+                sample_ratio=tail_sample_ratio
+            )
         tracer_provider = TracerProvider(
+            sampler=sampler,
             resource=Resource.create({
                 SERVICE_NAME: service
             })
         )
         tracer_provider.add_span_processor(span_processor=span_processor)
         set_tracer_provider(tracer_provider=tracer_provider)
+        PyTraceLog._span_processor = span_processor
+
+        # Добавляем к атрибутам записей идентификаторы трассировки (форматируются один раз для SPAN)
+        PyTraceLog._install_record_factory().correlation = SpanCorrelation(service_name=service)
+
+    @staticmethod
+    def get_span_stats() -> Dict[str, int]:
+        """
+        Счетчики экспорта SPAN (см. `CountingBatchSpanProcessor.stats`, при выборке по завершении - также
+        `TailSamplingSpanProcessor.stats`)
 
-        # Добавляем к атрибутам для логирования идентификаторы трассировки
-        LoggingInstrumentor().instrument(tracer_provider=tracer_provider)
+        :return: Справочник счетчиков; пустой, если трассировка не инициализирована
+        """
+        if PyTraceLog._span_processor is None:
+            return dict()
+        return PyTraceLog._span_processor.stats()
 
     @staticmethod
     def init_tracer_logger(
             level: Union[str, int] = WARNING,
+            event_level: Union[str, int] = NOTSET,
+            max_events_per_span: Optional[int] = None,
+            sample_level: Union[str, int] = WARNING,
+            sample_ratio: float = 1.0,
+            rate_limit: Optional[float] = None,
+            event_name: str = EVENT_NAME_TEMPLATE,
+            max_stacktrace_frames: Optional[int] = None,
+            max_stacktrace_length: Optional[int] = None,
+            exception_repeat_window: Optional[float] = None,
     ) -> None:
         """
-        Инициализация обработчика для экспорта записей журнала в систему трассировки
+        Инициализация обработчика для экспорта записей журнала в систему трассировки.
+        Записи уровня ERROR и выше регистрируются в SPAN всегда, для остальных действуют ограничения
+        (см. `TracerHandler`).
+
+        Пока глобальный провайдер трассировки не установлен (см. `init_tracer`), обработчик пропускает записи
+        без получения текущего SPAN, фильтрации, блокировки и формирования атрибутов.
 
         :param level: Уровень логирования (только если root логгер еще не инициализирован)
+        :param event_level: Минимальный уровень записи для создания события
+        :param max_events_per_span: Максимальное количество событий в одном SPAN
+        :param sample_level: Записи с уровнем ниже указанного подлежат выборке (`sample_ratio`, `rate_limit`)
+        :param sample_ratio: Доля записей уровня ниже `sample_level`, для которых создаются события
+        :param rate_limit: Максимальное количество событий в секунду для записей уровня ниже `sample_level`
+        :param event_name: Наименование событий: шаблон или сформированное сообщение (см. `EVENT_NAMES`)
+        :param max_stacktrace_frames: Максимальное количество кадров стека вызовов исключения
+        :param max_stacktrace_length: Максимальная длина стека вызовов исключения, символов
+        :param exception_repeat_window: Время (сек.), в течение которого повторы исключения с тем же отпечатком
+            регистрируются без стека вызовов (повторы в том же SPAN - всегда); None - без сокращения повторов
         """
         # Ничего не делаем, если обработчик уже есть в списке
         for handler in PyTraceLog._handlers:
             if isinstance(handler, TracerHandler):
                 return
 
-        tracer_handler = TracerHandler()
-        PyTraceLog._handlers.append(tracer_handler)
+        tracer_handler = TracerHandler(
+            event_level=event_level,
+            max_events_per_span=max_events_per_span,
+            sample_level=sample_level,
+            sample_ratio=sample_ratio,
+            rate_limit=rate_limit,
+            wait_for_provider=True,
+            event_name=event_name,
+            max_stacktrace_frames=max_stacktrace_frames,
+            max_stacktrace_length=max_stacktrace_length,
+            exception_repeat_window=exception_repeat_window
+        )
+        PyTraceLog._add_handler(handler=tracer_handler, level=level)
 
-        # Если root логгер инициализирован, добавляем обработчик
-        if len(root.handlers) != 0:
-            root.addHandler(hdlr=tracer_handler)
-        # Иначе выполняем его инициализацию
-        else:
-            basicConfig(
-                level=level,
-                handlers=PyTraceLog._handlers
+    @staticmethod
+    def init_falcon(
+            app: Any,
+            excluded_paths: Iterable[str] = (),
+            request_id_header: Optional[str] = 'X-Request-ID',
+    ) -> None:
+        """
+        Трассировка запросов приложения Falcon (WSGI, Falcon 3) и привязка идентификатора запроса к записям журнала
+        (см. `TracingMiddleware`). Middleware добавляется в приложение один раз; если приложение создано после
+        `FalconInstrumentor().instrument()`, SPAN запросов создает инструментация OpenTelemetry, а middleware только
+        привязывает идентификатор запроса.
+
+        Middleware устанавливается первым, чтобы SPAN и идентификатор запроса охватывали middleware приложения.
+        Если приложение не позволяет изменить порядок middleware (не Falcon 3), middleware добавляется последним;
+        в этом случае `TracingMiddleware` следует передать первым в параметре middleware при создании приложения.
+
+        SPAN создаются трассировщиком провайдера, установленного `init_tracer` (в том числе после вызова метода).
+
+        :param app: Приложение Falcon
+        :param excluded_paths: Пути, для которых SPAN не создаются (проверки работоспособности, метрики);
+            путь, оканчивающийся на `*`, задает префикс
+        :param request_id_header: Заголовок с идентификатором запроса (при отсутствии идентификатор формируется)
+        """
+        if any(instrumented is app for instrumented in PyTraceLog._falcon_apps):
+            return
+        if not hasattr(app, 'add_middleware'):
+            raise TypeError(
+                'Приложение не поддерживает add_middleware (Falcon 2): '
+                'передайте TracingMiddleware в параметре middleware при создании приложения'
             )
 
+        # Импорт выполняется только при инициализации: модуль требует инструментации WSGI
+        from pytracelog.integrations.falcon import TracingMiddleware
+
+        try:
+            from opentelemetry.instrumentation.falcon import _InstrumentedFalconAPI
+        except ImportError:
+            _InstrumentedFalconAPI = None
+
+        PyTraceLog._install_record_factory()
+        middleware = TracingMiddleware(
+            excluded_paths=excluded_paths,
+            request_id_header=request_id_header,
+            # Приложение, созданное после FalconInstrumentor().instrument(), уже создает SPAN запросов
+            create_spans=_InstrumentedFalconAPI is None or not isinstance(app, _InstrumentedFalconAPI)
+        )
+        unprepared = getattr(app, '_unprepared_middleware', None)
+        if isinstance(unprepared, list):
+            # Falcon 3 добавляет middleware в конец списка: ставим middleware первым и пересобираем цепочку
+            app._unprepared_middleware = [middleware] + unprepared
+            app.add_middleware([])
+        else:
+            app.add_middleware(middleware)
+        PyTraceLog._falcon_apps.append(app)
+
+    @staticmethod
+    def init_celery(app: Any) -> None:
+        """
+        Трассировка задач Celery (`CeleryInstrumentor`, однократно для процесса) и привязка идентификатора
+        и наименования задачи к записям журнала (см. `TaskLogContext`).
+
+        SPAN создаются трассировщиком провайдера, установленного `init_tracer`. Трассировку следует инициализировать
+        один раз в основном процессе до запуска дочерних процессов worker: обработчики SPAN и записей журнала
+        перезапускаются в дочерних процессах после fork, отдельные провайдеры для каждого процесса не нужны.
+
+        Celery по умолчанию заменяет обработчики root логгера в процессе worker, поэтому для приложения
+        отключается `worker_hijack_root_logger`.
+
+        :param app: Приложение Celery
+        """
+        # Импорт выполняется только при инициализации, т.к. требует Celery
+        from opentelemetry.instrumentation.celery import CeleryInstrumentor
+        from pytracelog.integrations.celery import TaskLogContext
+
+        app.conf.worker_hijack_root_logger = False
+
+        instrumentor = CeleryInstrumentor()
+        if not instrumentor.is_instrumented_by_opentelemetry:
+            instrumentor.instrument()
+
+        if PyTraceLog._task_log_context is None:
+            PyTraceLog._install_record_factory()
+            PyTraceLog._task_log_context = TaskLogContext()
+            PyTraceLog._task_log_context.connect()
+
     @staticmethod
     def reset() -> None:
         """
         Сброс настроек
         """
+        if PyTraceLog._previous_signal_handler is not None:
+            signal(*PyTraceLog._previous_signal_handler)
+            PyTraceLog._previous_signal_handler = None
+        PyTraceLog._stop_levels_reloader()
+        PyTraceLog._levels_path = None
+        PyTraceLog.set_levels(levels={})
+
         root.level = WARNING
 
+        # Middleware остается в приложениях Falcon, инструментация Celery - в процессе
+        PyTraceLog._falcon_apps = list()
+        if PyTraceLog._task_log_context is not None:
+            PyTraceLog._task_log_context.disconnect()
+            PyTraceLog._task_log_context = None
+
         if PyTraceLog._old_factory:
             setLogRecordFactory(PyTraceLog._old_factory)
             PyTraceLog._old_factory = None
+            PyTraceLog._record_factory = None
+
+        if PyTraceLog._record_receiver is not None:
+            PyTraceLog._record_receiver.close()
+            PyTraceLog._record_receiver = None
+
+        if PyTraceLog._metrics_server is not None:
+            PyTraceLog._metrics_server.close()
+            PyTraceLog._metrics_server = None
+        for metrics in PyTraceLog._handler_metrics or ():
+            metrics.uninstall()
+        PyTraceLog._handler_metrics = None
+
+        if PyTraceLog._rate_limit_filter is not None:
+            # Выводим сводки подавленных записей, пока обработчики установлены
+            unregister_at_exit(PyTraceLog._rate_limit_filter.close)
+            PyTraceLog._rate_limit_filter.close()
 
         for handler in PyTraceLog._handlers:
             root.removeHandler(hdlr=handler)
+            # Выводим записи, оставшиеся в очереди, и останавливаем фоновые потоки обработчиков
+            # (события Logstash, которые не удалось отправить, остаются в файле буфера)
+            handler.close()
+
+            if PyTraceLog._rate_limit_filter is not None:
+                handler.removeFilter(PyTraceLog._rate_limit_filter)
 
         PyTraceLog._handlers = list()
+        PyTraceLog._stream_handlers = list()
+        PyTraceLog._async_handler = None
+        PyTraceLog._rate_limit_filter = None
+
+
+if register_at_fork is not None:
+    register_at_fork(after_in_child=PyTraceLog._after_fork_in_child)
@@ -0,0 +1,5 @@
+"""
+:mod:`integrations` -- Интеграция с веб-фреймворками и очередями задач
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
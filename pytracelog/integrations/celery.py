@@ -0,0 +1,71 @@
+"""
+:mod:`celery` -- Контекст логирования задач Celery
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from contextvars import Token
+from typing import (
+    Any,
+    Dict,
+)
+
+from celery import signals
+
+from pytracelog.logging.records import (
+    bind_log_context,
+    reset_log_context,
+)
+
+
+__all__ = (
+    'TaskLogContext',
+    'TASK_ID_ATTR',
+    'TASK_NAME_ATTR',
+)
+
+
+# Атрибуты записей журнала с идентификатором и наименованием задачи
+TASK_ID_ATTR = 'task_id'
+TASK_NAME_ATTR = 'task_name'
+
+
+class TaskLogContext:
+    """
+    Привязка идентификатора и наименования задачи к записям журнала на время выполнения задачи (сигналы
+    `task_prerun` и `task_postrun`, в том числе при выполнении задач в режиме eager)
+    """
+    def __init__(self):
+        # Маркеры контекста логирования выполняемых задач
+        self._tokens: Dict[str, Token] = dict()
+
+    def connect(self) -> None:
+        """
+        Подключение к сигналам Celery
+        """
+        signals.task_prerun.connect(self._on_prerun, weak=False, dispatch_uid=f'pytracelog-prerun-{id(self)}')
+        signals.task_postrun.connect(self._on_postrun, weak=False, dispatch_uid=f'pytracelog-postrun-{id(self)}')
+
+    def disconnect(self) -> None:
+        """
+        Отключение от сигналов Celery
+        """
+        signals.task_prerun.disconnect(dispatch_uid=f'pytracelog-prerun-{id(self)}')
+        signals.task_postrun.disconnect(dispatch_uid=f'pytracelog-postrun-{id(self)}')
+
+    def _on_prerun(self, task_id: str = None, task: Any = None, **kwargs) -> None:
+        if task_id is None:
+            return
+        self._tokens[task_id] = bind_log_context(**{
+            TASK_ID_ATTR: task_id,
+            TASK_NAME_ATTR: getattr(task, 'name', None),
+        })
+
+    def _on_postrun(self, task_id: str = None, **kwargs) -> None:
+        token = self._tokens.pop(task_id, None)
+        if token is None:
+            return
+        try:
+            reset_log_context(token)
+        except ValueError:
+            # Задача завершена в другом контексте (например, в другом потоке пула)
+            pass
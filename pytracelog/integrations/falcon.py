@@ -0,0 +1,141 @@
+"""
+:mod:`falcon` -- Трассировка и контекст логирования запросов Falcon
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Optional,
+)
+from uuid import uuid4
+
+from opentelemetry import context as context_api
+from opentelemetry import trace as trace_api
+from opentelemetry.instrumentation.utils import http_status_to_status_code
+from opentelemetry.instrumentation.wsgi import (
+    collect_request_attributes,
+    wsgi_getter,
+)
+from opentelemetry.propagate import extract
+from opentelemetry.semconv.trace import SpanAttributes
+from opentelemetry.trace import (
+    SpanKind,
+    Status,
+    TracerProvider,
+    set_span_in_context,
+)
+
+from pytracelog.logging.records import (
+    bind_log_context,
+    reset_log_context,
+)
+from pytracelog.utils import PathMatcher
+
+
+__all__ = (
+    'TracingMiddleware',
+    'REQUEST_ID_ATTR',
+)
+
+
+# Атрибут записей журнала с идентификатором запроса
+REQUEST_ID_ATTR = 'request_id'
+
+# Ключ окружения WSGI для состояния запроса: SPAN, маркеры контекста трассировки и контекста логирования
+_ENVIRON_STATE_KEY = 'pytracelog.falcon.state'
+
+
+class TracingMiddleware:
+    """
+    Middleware Falcon (WSGI): SPAN запроса (с контекстом трассировки из заголовков запроса) и привязка
+    идентификатора запроса к записям журнала (`REQUEST_ID_ATTR`, см. `bind_log_context`).
+
+    Для исключенных путей (например, проверок работоспособности) SPAN не создается и контекст не привязывается;
+    проверка пути выполняется без регулярных выражений (см. `PathMatcher`).
+
+    SPAN создается трассировщиком глобального провайдера (см. `PyTraceLog.init_tracer`), в том числе если провайдер
+    установлен после создания middleware. Middleware следует добавлять первым, чтобы записи остальных middleware
+    содержали идентификатор запроса и относились к SPAN запроса.
+    """
+    def __init__(
+            self,
+            excluded_paths: Iterable[str] = (),
+            request_id_header: Optional[str] = 'X-Request-ID',
+            create_spans: bool = True,
+            tracer_provider: Optional[TracerProvider] = None,
+    ):
+        """
+        :param excluded_paths: Исключаемые пути (см. `PathMatcher`)
+        :param request_id_header: Заголовок с идентификатором запроса; если заголовка нет в запросе (или он не
+            задан), идентификатор формируется
+        :param create_spans: Создавать SPAN запросов (False - SPAN создает другая инструментация, например
+            `FalconInstrumentor`, привязывается только идентификатор запроса)
+        :param tracer_provider: Провайдер трассировки (по умолчанию - глобальный)
+        """
+        self._excluded = PathMatcher(excluded_paths)
+        self.request_id_header = request_id_header
+        self.create_spans = create_spans
+        self._tracer = trace_api.get_tracer(__name__, tracer_provider=tracer_provider)
+
+    def process_request(self, req: Any, resp: Any) -> None:
+        env: Dict[str, Any] = req.env
+        if self._excluded and self._excluded(req.path):
+            return
+
+        request_id = None
+        if self.request_id_header is not None:
+            request_id = req.get_header(self.request_id_header)
+        log_token = bind_log_context(**{REQUEST_ID_ATTR: request_id or uuid4().hex})
+
+        span = token = None
+        if self.create_spans:
+            parent = extract(env, getter=wsgi_getter)
+            span = self._tracer.start_span(f'HTTP {req.method}', context=parent, kind=SpanKind.SERVER)
+            if span.is_recording():
+                span.set_attributes(collect_request_attributes(env))
+            token = context_api.attach(set_span_in_context(span, parent))
+
+        env[_ENVIRON_STATE_KEY] = (span, token, log_token)
+
+    def process_resource(self, req: Any, resp: Any, resource: Any, params: Dict[str, Any]) -> None:
+        state = req.env.get(_ENVIRON_STATE_KEY)
+        if state is None or state[0] is None or not state[0].is_recording():
+            return
+
+        # Наименование SPAN - шаблон маршрута, а не путь: количество наименований ограничено
+        route = getattr(req, 'uri_template', None)
+        if route:
+            state[0].update_name(f'{req.method} {route}')
+            state[0].set_attribute(SpanAttributes.HTTP_ROUTE, route)
+
+    def process_response(self, req: Any, resp: Any, resource: Any, req_succeeded: bool) -> None:
+        state = req.env.pop(_ENVIRON_STATE_KEY, None)
+        if state is None:
+            return
+
+        span, token, log_token = state
+        try:
+            if span is not None and span.is_recording():
+                status_code = _get_status_code(resp.status)
+                if status_code is not None:
+                    span.set_attribute(SpanAttributes.HTTP_STATUS_CODE, status_code)
+                    span.set_status(Status(http_status_to_status_code(status_code, server_span=True)))
+        finally:
+            if span is not None:
+                span.end()
+                context_api.detach(token)
+            reset_log_context(log_token)
+
+
+def _get_status_code(status: Any) -> Optional[int]:
+    """
+    Код статуса ответа: Falcon допускает строку вида "200 OK", число и `http.HTTPStatus`
+    """
+    if isinstance(status, int):
+        return int(status)
+    try:
+        return int(str(status).split(' ', 1)[0])
+    except ValueError:
+        return None
@@ -0,0 +1,153 @@
+"""
+:mod:`attributes` -- Формирование атрибутов из записей журнала
+=================================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from logging import (
+    LogRecord,
+    makeLogRecord,
+)
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+from pytracelog.logging.records import CachedLogRecord
+
+
+__all__ = (
+    'RecordAttrsExtractor',
+    'DEFAULT_EXCLUDED_ATTRS',
+    'STANDARD_RECORD_ATTRS',
+    'coerce_attr_value',
+)
+
+
+# Атрибуты записи, которые не передаются в систему трассировки
+DEFAULT_EXCLUDED_ATTRS = frozenset((
+    'name',
+    'exc_info',
+    'exc_text',
+    'msecs',
+    'relativeCreated',
+    'otelSpanID',
+    'otelTraceID',
+    'otelServiceName',
+))
+
+# Стандартные атрибуты записи (все остальные атрибуты добавлены через `extra` или фабрику записей)
+STANDARD_RECORD_ATTRS = frozenset(makeLogRecord({}).__dict__) | {'message', 'asctime'}
+
+# Типы значений, которые OpenTelemetry принимает без преобразования
+_PRIMITIVE_TYPES = frozenset((str, bool, int, float))
+_PRIMITIVE_BASES = (str, bool, int, float)
+
+
+def coerce_attr_value(value: Any) -> Any:
+    """
+    Приведение значения к типу, допустимому для атрибута OpenTelemetry: str/bool/int/float или однородная
+    последовательность таких значений. Разнородные последовательности преобразуются в кортеж строк,
+    остальные значения - в строку.
+
+    :param value: Значение атрибута
+
+    :return: Допустимое значение атрибута
+    """
+    value_type = type(value)
+    if value_type in _PRIMITIVE_TYPES or isinstance(value, _PRIMITIVE_BASES):
+        return value
+
+    if value_type is tuple or value_type is list:
+        if value:
+            item_type = type(value[0])
+            if item_type in _PRIMITIVE_TYPES:
+                for item in value:
+                    if type(item) is not item_type:
+                        break
+                else:
+                    return value if value_type is tuple else tuple(value)
+        return tuple(str(item) for item in value)
+
+    return str(value)
+
+
+class RecordAttrsExtractor:
+    """
+    Формирование справочника атрибутов записи журнала. Набор исключаемых (и, при необходимости, разрешенных)
+    атрибутов вычисляется один раз при создании.
+
+    Пустые значения пропускаются (чтобы в лог не сыпало предупреждениями), остальные приводятся к типам,
+    допустимым для атрибутов OpenTelemetry.
+
+    Справочник атрибутов записи `CachedLogRecord` кэшируется в записи: повторный вызов того же экстрактора для
+    записи (например, другим обработчиком с теми же настройками) возвращает тот же справочник, поэтому
+    возвращаемый справочник не изменяется. Кэш действителен, пока в записи не заменен шаблон сообщения и не
+    добавлены атрибуты (например, фильтром обработчика).
+    """
+    def __init__(
+            self,
+            exclude: Iterable[str] = DEFAULT_EXCLUDED_ATTRS,
+            extra_attrs: Optional[Iterable[str]] = None,
+            remove_msg: bool = True,
+            message_attr_name: str = 'original.message',
+    ):
+        """
+        :param exclude: Исключаемые атрибуты
+        :param extra_attrs: Разрешенные дополнительные (нестандартные) атрибуты; None - разрешены все
+        :param remove_msg: Не добавлять сообщение записи в справочник атрибутов
+        :param message_attr_name: Наименование атрибута для сообщения записи (если не задан флаг `remove_msg`)
+        """
+        # Сообщение обрабатывается отдельно
+        self.excluded = frozenset(exclude) | {'msg'}
+        self._excluded = tuple(self.excluded)
+        self.allowed = None
+        if extra_attrs is not None:
+            self.allowed = (STANDARD_RECORD_ATTRS | frozenset(extra_attrs)) - self.excluded
+
+        self.remove_msg = remove_msg
+        self.message_attr_name = message_attr_name
+
+    def __call__(self, record: LogRecord) -> dict:
+        """
+        Формирование справочника атрибутов записи.
+
+        Копирование словаря записи выполняется на уровне C и обходится дешевле, чем построение нового справочника
+        в цикле Python, поэтому исключенные атрибуты удаляются из копии, после чего за один проход удаляются
+        пустые значения и приводятся типы остальных.
+
+        :param record: Запись лога
+
+        :return: Справочник атрибутов
+        """
+        cached = record._attrs if type(record) is CachedLogRecord else None
+        if (
+                cached is not None and cached[0] is self and cached[1] is record.msg
+                and cached[2] == len(record.__dict__)
+        ):
+            return cached[3]
+
+        if self.allowed is None:
+            attrs = record.__dict__.copy()
+            pop = attrs.pop
+            for key in self._excluded:
+                pop(key, None)
+        else:
+            allowed = self.allowed
+            attrs = {k: v for k, v in record.__dict__.items() if k in allowed}
+
+        primitive_types = _PRIMITIVE_TYPES
+        for k, v in list(attrs.items()):
+            if not v:
+                del attrs[k]
+            elif type(v) not in primitive_types:
+                attrs[k] = coerce_attr_value(v)
+
+        if not self.remove_msg:
+            msg = record.msg
+            if msg:
+                attrs[self.message_attr_name] = msg if type(msg) is str else coerce_attr_value(msg)
+
+        if type(record) is CachedLogRecord:
+            record._attrs = (self, record.msg, len(record.__dict__), attrs)
+        return attrs
@@ -0,0 +1,255 @@
+"""
+:mod:`filters` -- Фильтры записей журнала
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from collections import OrderedDict
+from logging import (
+    Filter,
+    LogRecord,
+    getLevelName,
+    getLogger,
+    makeLogRecord,
+)
+from os.path import (
+    basename,
+    splitext,
+)
+from threading import (
+    Lock,
+    local,
+)
+from time import monotonic
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+from weakref import ref
+
+from pytracelog.utils import TokenBucket
+
+
+__all__ = (
+    'RateLimitFilter',
+    'REPEATED_ATTR',
+)
+
+
+# Атрибут записи с количеством подавленных повторов
+REPEATED_ATTR = 'repeated'
+
+
+class _Entry:
+    """
+    Состояние повторяющейся записи
+    """
+    __slots__ = ('bucket', 'suppressed', 'reported_at')
+
+    def __init__(self, bucket: TokenBucket, now: float):
+        self.bucket = bucket
+        # Количество записей, подавленных с момента последней пропущенной записи
+        self.suppressed = 0
+        self.reported_at = now
+
+
+class RateLimitFilter(Filter):
+    """
+    Ограничение частоты повторяющихся записей журнала и подавление дубликатов.
+
+    Повторяющимися считаются записи с одинаковыми логгером, уровнем, шаблоном сообщения и местом вызова.
+    Для каждой такой записи действует ограничение "token bucket" (`rate` записей в секунду, всплеск до `burst`),
+    записи сверх ограничения отбрасываются. Не чаще раза в `summary_interval` секунд одна из отброшенных записей
+    пропускается как сводка с количеством подавленных записей в атрибуте `repeated`. Количество подавленных
+    записей также добавляется к первой записи, пропущенной после исчерпания ограничения. Сообщение записи
+    не изменяется: по шаблону сообщения группируются записи и формируются наименования событий трассировки
+    (в текстовом выводе количество показывает `RepeatedFormatter`).
+
+    Если одинаковые записи прекратились, оставшиеся подавленные записи выводятся отдельной записью сводки
+    (шаблон сообщения без аргументов, атрибут `repeated`) через логгер исходной записи: при обработке любой
+    записи после истечения `summary_interval` и при вызове `close()`.
+
+    Состояние хранится в LRU кэше не более чем для `max_keys` записей; поиск и обновление выполняются за O(1).
+
+    Один экземпляр фильтра может быть установлен на несколько обработчиков одного логгера: решение по записи
+    принимается один раз и повторно используется остальными обработчиками в том же потоке.
+    """
+    def __init__(
+            self,
+            rate: float = 10.0,
+            burst: Optional[float] = None,
+            summary_interval: float = 60.0,
+            max_keys: int = 10000,
+            clock: Callable[[], float] = monotonic,
+    ):
+        """
+        :param rate: Максимальная частота одинаковых записей, записей в секунду
+        :param burst: Допустимый всплеск одинаковых записей (по умолчанию - `rate`, но не меньше 1)
+        :param summary_interval: Интервал между сводками подавленных записей, сек.
+        :param max_keys: Максимальное количество отслеживаемых записей
+        :param clock: Источник времени, сек.
+        """
+        super().__init__()
+        if max_keys < 1:
+            raise ValueError('Количество отслеживаемых записей должно быть положительным')
+
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.max_keys = max_keys
+        self.suppressed = 0
+        self._clock = clock
+        self._entries: 'OrderedDict[tuple, _Entry]' = OrderedDict()
+        self._lock = Lock()
+        self._flushed_at = clock()
+        # Идентификаторы выводимых записей сводки, которые фильтр пропускает
+        self._summaries = set()
+        # Слабая ссылка на последнюю запись, обработанную в потоке, и решение по ней
+        self._local = local()
+
+    def filter(self, record: LogRecord) -> bool:
+        """
+        Проверка записи
+
+        :param record: Запись журнала
+
+        :return: Признак того, что запись нужно обработать
+        """
+        last = getattr(self._local, 'last', None)
+        if last is not None and last[0]() is record:
+            return last[1]
+        if id(record) in self._summaries:
+            return True
+
+        decision, pending = self._decide(record)
+        self._local.last = (ref(record), decision)
+        if pending:
+            self._write_summaries(pending=pending)
+        return decision
+
+    def close(self) -> None:
+        """
+        Вывод сводок всех подавленных записей
+        """
+        with self._lock:
+            pending = self._collect_summaries(now=self._clock(), force=True)
+        self._write_summaries(pending=pending)
+
+    def _decide(self, record: LogRecord) -> Tuple[bool, List[Tuple[tuple, int]]]:
+        """
+        Принятие решения по записи
+
+        :return: Решение и сводки подавленных записей других ключей, интервал которых истек
+        """
+        key = (record.name, record.levelno, record.msg, record.pathname, record.lineno)
+        with self._lock:
+            now = self._clock()
+            try:
+                repeated = self._consume(key=key, now=now)
+            except TypeError:
+                # Шаблон сообщения не хешируется - запись не ограничивается
+                repeated = 0
+
+            # Сводки собираются после решения по записи: сводка ее ключа добавляется к самой записи
+            if now - self._flushed_at >= self.summary_interval:
+                self._flushed_at = now
+                pending = self._collect_summaries(now=now)
+            else:
+                pending = []
+
+        if repeated:
+            setattr(record, REPEATED_ATTR, repeated)
+        return repeated is not None, pending
+
+    def _consume(self, key: tuple, now: float) -> Optional[int]:
+        """
+        Учет записи (вызывается под блокировкой)
+
+        :param key: Ключ записи
+        :param now: Текущее время, сек.
+
+        :return: Количество подавленных записей для пропущенной записи, None - запись подавлена
+        """
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = _Entry(
+                bucket=TokenBucket(rate=self.rate, capacity=self.burst, clock=self._clock),
+                now=now
+            )
+            if len(entries) > self.max_keys:
+                entries.popitem(last=False)
+        else:
+            entries.move_to_end(key)
+
+        if entry.bucket.consume():
+            repeated = entry.suppressed
+            if not repeated:
+                return 0
+        elif entry.suppressed and now - entry.reported_at >= self.summary_interval:
+            repeated = entry.suppressed
+        else:
+            if not entry.suppressed:
+                # Интервал сводки отсчитывается от первой подавленной записи
+                entry.reported_at = now
+            entry.suppressed += 1
+            self.suppressed += 1
+            return None
+
+        entry.suppressed = 0
+        entry.reported_at = now
+        return repeated
+
+    def _collect_summaries(self, now: float, force: bool = False) -> List[Tuple[tuple, int]]:
+        """
+        Сбор сводок подавленных записей (вызывается под блокировкой)
+
+        :param now: Текущее время, сек.
+        :param force: Собрать сводки без учета интервала
+
+        :return: Список пар (ключ записи, количество подавленных записей)
+        """
+        pending = []
+        for key, entry in self._entries.items():
+            if entry.suppressed and (force or now - entry.reported_at >= self.summary_interval):
+                pending.append((key, entry.suppressed))
+                entry.suppressed = 0
+                entry.reported_at = now
+        return pending
+
+    def _write_summaries(self, pending: List[Tuple[tuple, int]]) -> None:
+        """
+        Вывод записей сводки через логгеры исходных записей
+        """
+        for (name, levelno, msg, pathname, lineno), repeated in pending:
+            record = makeLogRecord({
+                'name': name,
+                'levelno': levelno,
+                'levelname': getLevelName(levelno),
+                'msg': msg,
+                'pathname': pathname,
+                'filename': basename(pathname),
+                'module': splitext(basename(pathname))[0],
+                'lineno': lineno,
+                REPEATED_ATTR: repeated,
+            })
+            self._summaries.add(id(record))
+            try:
+                getLogger(name).handle(record)
+            finally:
+                self._summaries.discard(id(record))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики фильтра:
+         * keys - количество отслеживаемых записей;
+         * suppressed - количество отброшенных записей.
+
+        :return: Справочник счетчиков
+        """
+        return {
+            'keys': len(self._entries),
+            'suppressed': self.suppressed,
+        }
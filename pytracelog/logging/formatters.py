@@ -0,0 +1,218 @@
+"""
+:mod:`formatters` -- Форматирование записей журнала
+=================================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from json import JSONEncoder
+from json.encoder import (
+    encode_basestring,
+    encode_basestring_ascii,
+)
+from logging import (
+    Formatter,
+    LogRecord,
+)
+from time import (
+    gmtime,
+    strftime,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+)
+
+from pytracelog.logging.attributes import STANDARD_RECORD_ATTRS
+from pytracelog.logging.filters import REPEATED_ATTR
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+__all__ = (
+    'JsonFormatter',
+    'RepeatedFormatter',
+    'make_json_dumps',
+)
+
+
+# Атрибуты записи с идентификаторами трассировки (см. `SpanCorrelation`, `LoggingInstrumentor`)
+TRACE_ID_ATTR = 'otelTraceID'
+SPAN_ID_ATTR = 'otelSpanID'
+SERVICE_NAME_ATTR = 'otelServiceName'
+
+# Значение идентификатора при отсутствии текущего SPAN
+INVALID_ID = '0'
+
+
+def make_json_dumps(ensure_ascii: bool = True, use_orjson: bool = True) -> Callable[[Any], bytes]:
+    """
+    Функция сериализации значения в JSON. Значения, не поддерживаемые JSON, преобразуются в строку.
+
+    :param ensure_ascii: Экранировать символы не из ASCII (не применяется при сериализации `orjson`)
+    :param use_orjson: Использовать `orjson`, если он установлен
+
+    :return: Функция сериализации
+    """
+    encode = JSONEncoder(ensure_ascii=ensure_ascii, separators=(',', ':'), default=str).encode
+    encode_str = encode_basestring_ascii if ensure_ascii else encode_basestring
+    constants_json = {None: b'null', True: b'true', False: b'false'}
+
+    def json_dumps(value: Any) -> bytes:
+        # Для строк и целых чисел JSONEncoder.encode каждый раз создает кодировщик, поэтому кодируем сами
+        value_type = type(value)
+        if value_type is str:
+            return encode_str(value).encode('utf-8')
+        if value_type is int:
+            return int.__repr__(value).encode('ascii')
+        if value is None or value_type is bool:
+            return constants_json[value]
+        return encode(value).encode('utf-8')
+
+    if not use_orjson or orjson is None:
+        return json_dumps
+
+    orjson_dumps = orjson.dumps
+
+    def fast_dumps(value: Any) -> bytes:
+        try:
+            return orjson_dumps(value, default=str)
+        # Целые числа больше 64 бит
+        except TypeError:
+            return json_dumps(value)
+
+    return fast_dumps
+
+
+class RepeatedFormatter(Formatter):
+    """
+    Текстовое форматирование записи с количеством подавленных повторов (атрибут `repeated`, см. `RateLimitFilter`):
+    к сообщению добавляется суффикс "(message repeated N times)". Сообщение записи не изменяется.
+    """
+    def formatMessage(self, record: LogRecord) -> str:
+        """
+        Форматирование записи без исключения и стека вызовов
+
+        :param record: Запись журнала
+
+        :return: Строка записи
+        """
+        text = super().formatMessage(record)
+        repeated = getattr(record, REPEATED_ATTR, 0)
+        if repeated:
+            return f'{text} (message repeated {repeated} times)'
+        return text
+
+
+class JsonFormatter(Formatter):
+    """
+    Форматирование записи журнала в одну строку JSON (JSON lines) для сбора вывода контейнера агентом.
+
+    Поля записи: время (UTC), уровень, логгер, сообщение, идентификаторы трассировки (если запись создана
+    внутри SPAN) и наименование сервиса, дополнительные атрибуты записи (`extra`,
+    `PyTraceLog.extend_log_record`, `PyTraceLog.log_context`), исключение и стек вызовов.
+
+    Строка собирается из заранее сериализованных наименований полей, справочник записи не копируется.
+    """
+    # Максимальный размер кэша сериализованных значений
+    cache_size = 4096
+
+    def __init__(
+            self,
+            exclude: Iterable[str] = (),
+            ensure_ascii: bool = False,
+            use_orjson: bool = True,
+    ):
+        """
+        :param exclude: Дополнительные атрибуты записи, которые не выводятся
+        :param ensure_ascii: Экранировать символы не из ASCII (не применяется при сериализации `orjson`)
+        :param use_orjson: Использовать `orjson`, если он установлен
+        """
+        super().__init__()
+        self._dumps = make_json_dumps(ensure_ascii=ensure_ascii, use_orjson=use_orjson)
+        self._skip = STANDARD_RECORD_ATTRS | {TRACE_ID_ATTR, SPAN_ID_ATTR, SERVICE_NAME_ATTR} | frozenset(exclude)
+        self._timestamp = (None, b'')
+        self._keys: Dict[str, bytes] = dict()
+        self._values: Dict[Any, bytes] = dict()
+
+    def _cached(self, value: str) -> bytes:
+        """
+        Сериализованное значение из кэша (уровни, логгеры)
+        """
+        values = self._values
+        encoded = values.get(value)
+        if encoded is None:
+            if len(values) >= self.cache_size:
+                values.clear()
+            encoded = values[value] = self._dumps(value)
+        return encoded
+
+    def _key(self, key: str) -> bytes:
+        """
+        Сериализованное наименование поля с разделителями
+        """
+        encoded = self._keys.get(key)
+        if encoded is None:
+            if len(self._keys) >= self.cache_size:
+                self._keys.clear()
+            encoded = self._keys[key] = b',' + self._dumps(key) + b':'
+        return encoded
+
+    def _format_timestamp(self, created: float) -> bytes:
+        """
+        Время записи в формате ISO 8601 (UTC, миллисекунды); часть до секунд кэшируется
+        """
+        second = int(created)
+        cached_second, prefix = self._timestamp
+        if second != cached_second:
+            prefix = strftime('%Y-%m-%dT%H:%M:%S', gmtime(second)).encode('ascii')
+            self._timestamp = (second, prefix)
+        return b'%s.%03dZ' % (prefix, (created - second) * 1000)
+
+    def format(self, record: LogRecord) -> str:
+        """
+        Форматирование записи
+
+        :param record: Запись лога
+
+        :return: Строка JSON
+        """
+        dumps = self._dumps
+        record_dict = record.__dict__
+        parts = [
+            b'{"timestamp":"', self._format_timestamp(record.created),
+            b'","level":', self._cached(record.levelname),
+            b',"logger":', self._cached(record.name),
+            b',"message":', dumps(record.getMessage()),
+        ]
+
+        trace_id = record_dict.get(TRACE_ID_ATTR)
+        if trace_id and trace_id != INVALID_ID:
+            parts.append(b',"trace_id":"%s","span_id":"%s"' % (
+                str(trace_id).encode('ascii'), str(record_dict.get(SPAN_ID_ATTR)).encode('ascii')
+            ))
+        service = record_dict.get(SERVICE_NAME_ATTR)
+        if service:
+            parts.append(b',"service":')
+            parts.append(self._cached(service))
+
+        key = self._key
+        for name in record_dict.keys() - self._skip:
+            parts.append(key(name))
+            parts.append(dumps(record_dict[name]))
+
+        if record.exc_info and not record.exc_text:
+            # Кэшируем текст исключения в записи, как `logging.Formatter`
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            parts.append(b',"exception":')
+            parts.append(dumps(record.exc_text))
+        if record.stack_info:
+            parts.append(b',"stack_info":')
+            parts.append(dumps(self.formatStack(record.stack_info)))
+
+        parts.append(b'}')
+        return b''.join(parts).decode('utf-8')
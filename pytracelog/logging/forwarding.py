@@ -0,0 +1,226 @@
+"""
+:mod:`forwarding` -- Передача записей журнала из дочерних процессов в родительский
+=================================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+import pickle
+import struct
+from logging import (
+    Formatter,
+    Handler,
+    LogRecord,
+    makeLogRecord,
+)
+from logging.handlers import SocketHandler
+from os import (
+    chmod,
+    geteuid,
+    path as os_path,
+    rmdir,
+    unlink,
+)
+from socket import (
+    SHUT_RDWR,
+    SOL_SOCKET,
+)
+from socketserver import (
+    StreamRequestHandler,
+    ThreadingUnixStreamServer,
+)
+from tempfile import mkdtemp
+from threading import (
+    Lock,
+    Thread,
+)
+from typing import (
+    Iterable,
+    List,
+    Optional,
+)
+
+try:
+    from socket import SO_PEERCRED
+except ImportError:
+    # Учетные данные процесса на другом конце соединения недоступны (не Linux)
+    SO_PEERCRED = None
+
+
+__all__ = (
+    'ForwardingHandler',
+    'RecordReceiver',
+)
+
+
+# Заголовок сообщения: длина сериализованной записи (формат `logging.handlers.SocketHandler`)
+_HEADER = struct.Struct('>L')
+
+# Учетные данные процесса на другом конце соединения: pid, uid, gid
+_PEERCRED = struct.Struct('3i')
+
+# Форматирование исключения, если форматтер обработчика не задан
+_formatter = Formatter()
+
+
+class ForwardingHandler(SocketHandler):
+    """
+    Передача записей журнала в родительский процесс (см. `RecordReceiver`) через Unix socket.
+
+    Используется в дочерних процессах pre-fork серверов вместо обработчиков, которые держат собственное
+    соединение и буфер (Logstash): отправку выполняет один обработчик в родительском процессе. Сообщение и текст
+    исключения формируются в дочернем процессе, запись передается в формате `SocketHandler`.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: Путь к Unix socket родительского процесса
+        """
+        super().__init__(host=path, port=None)
+
+    def makePickle(self, record: LogRecord) -> bytes:
+        """
+        Сериализация записи (как `SocketHandler.makePickle`, но последней версией протокола pickle)
+
+        :param record: Запись лога
+
+        :return: Длина и сериализованная запись
+        """
+        if record.exc_info and not record.exc_text:
+            record.exc_text = (self.formatter or _formatter).formatException(record.exc_info)
+        record_dict = dict(record.__dict__)
+        record_dict['msg'] = record.getMessage()
+        record_dict['args'] = None
+        record_dict['exc_info'] = None
+        record_dict.pop('message', None)
+        data = pickle.dumps(record_dict, pickle.HIGHEST_PROTOCOL)
+        return _HEADER.pack(len(data)) + data
+
+    def reinit_after_fork(self) -> None:
+        """
+        Закрытие соединения, унаследованного от родительского процесса: дочерний процесс открывает собственное
+        соединение при отправке первой записи
+        """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.retryTime = None
+
+
+class _RecordStreamHandler(StreamRequestHandler):
+    """
+    Прием записей из одного соединения дочернего процесса
+    """
+    server: '_RecordServer'
+
+    def handle(self) -> None:
+        receiver = self.server.receiver
+        receiver.add_connection(self.connection)
+        try:
+            read = self.rfile.read
+            while True:
+                header = read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                data = read(_HEADER.unpack(header)[0])
+                receiver.dispatch(makeLogRecord(pickle.loads(data)))
+        finally:
+            receiver.remove_connection(self.connection)
+
+
+class _RecordServer(ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, receiver: 'RecordReceiver'):
+        self.receiver = receiver
+        super().__init__(path, _RecordStreamHandler)
+
+    def server_bind(self) -> None:
+        super().server_bind()
+        # Права на сокет не зависят от umask процесса: подключаться может только владелец
+        chmod(self.server_address, 0o600)
+
+    def verify_request(self, request, client_address) -> bool:
+        """
+        Прием соединений только от процессов того же пользователя (записи десериализуются pickle)
+        """
+        if SO_PEERCRED is None:
+            return True
+        _, uid, _ = _PEERCRED.unpack(request.getsockopt(SOL_SOCKET, SO_PEERCRED, _PEERCRED.size))
+        return uid == geteuid()
+
+
+class RecordReceiver:
+    """
+    Прием записей журнала от дочерних процессов (см. `ForwardingHandler`) и передача их обработчикам
+    родительского процесса.
+
+    Записи сериализуются pickle, поэтому принимаются только от процессов того же пользователя: Unix socket
+    (по умолчанию - во временном каталоге, доступном только владельцу) создается с правами 0600, а в Linux
+    дополнительно проверяется пользователь процесса на другом конце соединения (`SO_PEERCRED`). Каждое
+    соединение обслуживается отдельным потоком.
+    """
+    def __init__(self, handlers: Iterable[Handler], path: Optional[str] = None):
+        """
+        :param handlers: Обработчики, которым передаются принятые записи
+        :param path: Путь к Unix socket (по умолчанию - во временном каталоге)
+        """
+        self.handlers: List[Handler] = list(handlers)
+        self._tmp_dir = None
+        if path is None:
+            self._tmp_dir = mkdtemp(prefix='pytracelog-')
+            path = os_path.join(self._tmp_dir, 'records.sock')
+        self.path = path
+
+        self._connections = set()
+        self._connections_lock = Lock()
+        self._server = _RecordServer(path=path, receiver=self)
+        self._thread = Thread(target=self._server.serve_forever, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def dispatch(self, record: LogRecord) -> None:
+        """
+        Передача принятой записи обработчикам (уровень логгера проверен в дочернем процессе)
+
+        :param record: Запись лога
+        """
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def add_connection(self, connection) -> None:
+        with self._connections_lock:
+            self._connections.add(connection)
+
+    def remove_connection(self, connection) -> None:
+        with self._connections_lock:
+            self._connections.discard(connection)
+
+    def detach_after_fork(self) -> None:
+        """
+        Закрытие сокетов, унаследованных дочерним процессом (сокет и файл остаются у родительского процесса)
+        """
+        self._server.socket.close()
+        for connection in list(self._connections):
+            connection.close()
+        self._connections = set()
+        self._connections_lock = Lock()
+
+    def close(self) -> None:
+        """
+        Остановка приема записей и удаление Unix socket
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5.0)
+
+        # Потоки приема завершаются, получив конец потока
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(SHUT_RDWR)
+            except OSError:
+                pass
+
+        try:
+            unlink(self.path)
+        except FileNotFoundError:
+            pass
+        if self._tmp_dir is not None:
+            rmdir(self._tmp_dir)
@@ -3,42 +3,138 @@
 =================================================
 .. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
 """
+from bisect import bisect_right
+from functools import lru_cache
 from logging import (
     Handler,
     StreamHandler,
     LogRecord,
     ERROR,
+    NOTSET,
+    WARNING,
+    _checkLevel,
 )
+from random import random
 from sys import (
     stdout,
     stderr
 )
+from time import monotonic
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+from weakref import WeakKeyDictionary
 
+from opentelemetry import trace as trace_api
 from opentelemetry.trace import (
     get_current_span,
-    INVALID_SPAN,
+    Span,
     Status,
     StatusCode,
 )
 
+from pytracelog.logging.attributes import (
+    DEFAULT_EXCLUDED_ATTRS,
+    RecordAttrsExtractor,
+)
+from pytracelog.logging.formatters import JsonFormatter
+from pytracelog.logging.tracebacks import (
+    TracebackCache,
+    TracebackEntry,
+)
+from pytracelog.utils import TokenBucket
+
 
 __all__ = (
+    'BatchStreamHandler',
     'StdoutHandler',
     'StderrHandler',
-    'TracerHandler'
+    'LevelRouterHandler',
+    'TracerHandler',
+    'DROPPED_EVENTS_ATTR',
+    'MESSAGE_ATTR',
+    'EXCEPTION_FINGERPRINT_ATTR',
+    'EVENT_NAME_TEMPLATE',
+    'EVENT_NAME_MESSAGE',
+    'EVENT_NAMES',
 )
 
 
-class StdoutHandler(StreamHandler):
+# Атрибут SPAN с количеством событий, отброшенных TracerHandler
+DROPPED_EVENTS_ATTR = 'log.events.dropped'
+# Атрибут события с сообщением записи (если наименование события - шаблон сообщения)
+MESSAGE_ATTR = 'log.message'
+# Атрибут события исключения с отпечатком исключения (тип и места вызовов, см. `TracebackCache`)
+EXCEPTION_FINGERPRINT_ATTR = 'exception.fingerprint'
+
+# Наименование события TracerHandler: шаблон сообщения (`record.msg`) или сформированное сообщение
+EVENT_NAME_TEMPLATE = 'template'
+EVENT_NAME_MESSAGE = 'message'
+EVENT_NAMES = (
+    EVENT_NAME_TEMPLATE,
+    EVENT_NAME_MESSAGE,
+)
+
+
+class BatchStreamHandler(StreamHandler):
+    """
+    Потоковый обработчик с поддержкой пакетного вывода записей журнала
+    """
+    def emit_batch(self, records: Iterable[LogRecord]) -> None:
+        """
+        Вывод пакета записей одним вызовом `write()`. Уровень и фильтры обработчика применяются к каждой записи.
+
+        :param records: Пакет записей лога
+        """
+        chunks = []
+        # Первая запись пакета: сообщается при ошибке вывода пакета
+        first = None
+        for record in records:
+            if record.levelno < self.level or not self.filter(record):
+                continue
+            try:
+                chunks.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+                continue
+            if first is None:
+                first = record
+
+        if not chunks:
+            return
+
+        self.acquire()
+        try:
+            self.stream.write(''.join(chunks))
+            self.flush()
+        except Exception:
+            self.handleError(first)
+        finally:
+            self.release()
+
+
+class StdoutHandler(BatchStreamHandler):
     """
     Вывод записей журнала с уровнем < ERROR в stdout
     """
-    def __init__(self, stream=None):
+    def __init__(self, stream=None, json_lines: bool = False):
         """
         Переопределение конструктора: потока вывода по-умолчанию - stdout, установка фильтра записей
+
+        :param stream: Поток вывода
+        :param json_lines: Выводить записи в формате JSON (одна запись в строке, см. `JsonFormatter`)
         """
         super().__init__(stream=stdout if stream is None else stream)
         self.addFilter(self.error_record_filter)
+        if json_lines:
+            self.setFormatter(JsonFormatter())
 
     @staticmethod
     def error_record_filter(record: LogRecord) -> bool:
@@ -50,16 +146,21 @@ class StdoutHandler(StreamHandler):
         return True
 
 
-class StderrHandler(StreamHandler):
+class StderrHandler(BatchStreamHandler):
     """
     Вывод записей журнала с уровнем >= ERROR в stderr
     """
-    def __init__(self, stream=None):
+    def __init__(self, stream=None, json_lines: bool = False):
         """
         Переопределение конструктора: установка фильтра записей
+
+        :param stream: Поток вывода
+        :param json_lines: Выводить записи в формате JSON (одна запись в строке, см. `JsonFormatter`)
         """
         super().__init__(stream=stderr if stream is None else stream)
         self.addFilter(self.error_record_filter)
+        if json_lines:
+            self.setFormatter(JsonFormatter())
 
     @staticmethod
     def error_record_filter(record: LogRecord) -> bool:
@@ -71,44 +172,456 @@ class StderrHandler(StreamHandler):
         return True
 
 
+class LevelRouterHandler(Handler):
+    """
+    Маршрутизация записей журнала по уровню: запись выводится ровно в один приемник - с наибольшим порогом,
+    не превышающим уровень записи. Записи с уровнем ниже минимального порога отбрасываются.
+
+    Приемником может быть поток вывода (запись выполняется самим маршрутизатором одним вызовом `write()`, без
+    блокировки обработчика) или обработчик (запись передается ему через `handle`, блокировку берет приемник).
+    Фильтры маршрутизатора проверяются, только если они заданы. При закрытии маршрутизатора закрываются
+    приемники-обработчики; потоки вывода не закрываются.
+
+    По умолчанию повторяет пару `StdoutHandler`/`StderrHandler`: записи с уровнем < ERROR выводятся в stdout,
+    остальные - в stderr.
+    """
+    terminator = '\n'
+
+    def __init__(
+            self,
+            routes: Optional[Sequence[Tuple[Union[str, int], Union[TextIO, Handler]]]] = None,
+    ):
+        """
+        :param routes: Список пар (минимальный уровень, приемник)
+        """
+        super().__init__()
+
+        if routes is None:
+            routes = ((NOTSET, stdout), (ERROR, stderr))
+
+        routes = sorted(
+            ((_checkLevel(level.upper() if isinstance(level, str) else level), sink) for level, sink in routes),
+            key=lambda route: route[0]
+        )
+        self._levels: List[int] = [level for level, _ in routes]
+        self._sinks: List[Union[TextIO, Handler]] = [sink for _, sink in routes]
+        self._sink_is_handler: List[bool] = [isinstance(sink, Handler) for sink in self._sinks]
+
+    @property
+    def routes(self) -> List[Tuple[int, Union[TextIO, Handler]]]:
+        """
+        Список пар (минимальный уровень, приемник), упорядоченный по уровню
+        """
+        return list(zip(self._levels, self._sinks))
+
+    def get_sink(self, levelno: int) -> Optional[Union[TextIO, Handler]]:
+        """
+        Выбор приемника для уровня записи
+
+        :param levelno: Уровень записи
+
+        :return: Приемник или None, если уровень записи ниже минимального порога
+        """
+        index = bisect_right(self._levels, levelno) - 1
+        if index < 0:
+            return None
+        return self._sinks[index]
+
+    def handle(self, record: LogRecord) -> bool:
+        """
+        Обработка записи без блокировки маршрутизатора (в отличие от `Handler.handle`)
+
+        :param record: Запись лога
+
+        :return: Признак того, что запись пропущена фильтрами
+        """
+        if self.filters and not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: LogRecord) -> None:
+        """
+        Вывод записи в приемник, соответствующий ее уровню
+
+        :param record: Запись лога
+        """
+        levelno = record.levelno
+        index = bisect_right(self._levels, levelno) - 1
+        if index < 0:
+            return
+
+        sink = self._sinks[index]
+        if self._sink_is_handler[index]:
+            if levelno >= sink.level:
+                sink.handle(record)
+            return
+
+        try:
+            sink.write(self.format(record) + self.terminator)
+            sink.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def emit_batch(self, records: Iterable[LogRecord]) -> None:
+        """
+        Вывод пакета записей: по одному вызову `write()` на каждый поток вывода
+
+        :param records: Пакет записей лога
+        """
+        chunks: Dict[int, List[str]] = dict()
+        streams: Dict[int, Tuple[TextIO, LogRecord]] = dict()
+
+        for record in records:
+            if record.levelno < self.level or not self.filter(record):
+                continue
+
+            index = bisect_right(self._levels, record.levelno) - 1
+            if index < 0:
+                continue
+
+            sink = self._sinks[index]
+            if self._sink_is_handler[index]:
+                if record.levelno >= sink.level:
+                    sink.handle(record)
+                continue
+
+            try:
+                chunk = self.format(record) + self.terminator
+            except Exception:
+                self.handleError(record)
+                continue
+            key = id(sink)
+            if key not in chunks:
+                chunks[key] = []
+                # Первая запись пакета потока: сообщается при ошибке вывода пакета
+                streams[key] = (sink, record)
+            chunks[key].append(chunk)
+
+        if not chunks:
+            return
+
+        self.acquire()
+        try:
+            for key, stream_chunks in chunks.items():
+                stream, first = streams[key]
+                try:
+                    stream.write(''.join(stream_chunks))
+                    stream.flush()
+                except Exception:
+                    self.handleError(first)
+        finally:
+            self.release()
+
+    def flush(self) -> None:
+        """
+        Сброс буферов всех приемников
+        """
+        self.acquire()
+        try:
+            for sink in self._sinks:
+                if hasattr(sink, 'flush'):
+                    sink.flush()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        """
+        Закрытие маршрутизатора и приемников-обработчиков
+        """
+        for sink, is_handler in zip(self._sinks, self._sink_is_handler):
+            if is_handler:
+                sink.close()
+        super().close()
+
+
 class TracerHandler(Handler):
     """
     Отправка записей журнала в систему трассировки
     """
+    def __init__(
+            self,
+            level: int = NOTSET,
+            exclude_attrs: Iterable[str] = DEFAULT_EXCLUDED_ATTRS,
+            extra_attrs: Optional[Iterable[str]] = None,
+            message_attr_name: str = 'original.message',
+            event_level: Union[str, int] = NOTSET,
+            max_events_per_span: Optional[int] = None,
+            sample_level: Union[str, int] = WARNING,
+            sample_ratio: float = 1.0,
+            rate_limit: Optional[float] = None,
+            wait_for_provider: bool = False,
+            event_name: str = EVENT_NAME_TEMPLATE,
+            max_stacktrace_frames: Optional[int] = None,
+            max_stacktrace_length: Optional[int] = None,
+            exception_repeat_window: Optional[float] = None,
+            traceback_cache: Optional[TracebackCache] = None,
+    ):
+        """
+        :param level: Уровень логирования обработчика
+        :param exclude_attrs: Атрибуты записи, которые не передаются в систему трассировки
+        :param extra_attrs: Разрешенные дополнительные (нестандартные) атрибуты записи; None - разрешены все
+        :param message_attr_name: Наименование атрибута для сообщения записи при регистрации исключения
+        :param event_level: Минимальный уровень записи для создания события
+        :param max_events_per_span: Максимальное количество событий в одном SPAN
+        :param sample_level: Записи с уровнем ниже указанного подлежат выборке (`sample_ratio`, `rate_limit`)
+        :param sample_ratio: Доля записей уровня ниже `sample_level`, для которых создаются события
+        :param rate_limit: Максимальное количество событий в секунду для записей уровня ниже `sample_level`
+        :param wait_for_provider: Не обрабатывать записи, пока не установлен глобальный провайдер трассировки
+        :param event_name: Наименование события (см. `EVENT_NAMES`): шаблон сообщения (сообщение с подставленными
+            аргументами добавляется в атрибут `MESSAGE_ATTR`; наименования событий не зависят от аргументов)
+            или сформированное сообщение
+        :param max_stacktrace_frames: Максимальное количество кадров стека вызовов исключения (последние кадры)
+        :param max_stacktrace_length: Максимальная длина стека вызовов исключения, символов (конец стека)
+        :param exception_repeat_window: Регистрация повторов исключений ссылкой на отпечаток: повторы в том же SPAN
+            и в течение указанного времени (сек.) после полной регистрации исключения с тем же отпечатком
+            регистрируются без стека вызовов и атрибутов записи; None - все исключения регистрируются полностью
+        :param traceback_cache: Кэш стеков вызовов (по умолчанию - кэш обработчика с ограничениями
+            `max_stacktrace_frames` и `max_stacktrace_length`)
+        """
+        if event_name not in EVENT_NAMES:
+            raise ValueError(f'Неизвестное наименование события: {event_name}')
+
+        super().__init__(level=level)
+        self.wait_for_provider = wait_for_provider
+        self.event_name = event_name
+        # Экстракторы с одинаковыми настройками общие для всех обработчиков: атрибуты записи формируются один раз
+        exclude_attrs = frozenset(exclude_attrs)
+        extra_attrs = frozenset(extra_attrs) if extra_attrs is not None else None
+        self._event_attrs = _get_attrs_extractor(
+            exclude=exclude_attrs,
+            extra_attrs=extra_attrs,
+            remove_msg=True,
+            message_attr_name=message_attr_name
+        )
+        self._exception_attrs = _get_attrs_extractor(
+            exclude=exclude_attrs,
+            extra_attrs=extra_attrs,
+            remove_msg=False,
+            message_attr_name=message_attr_name
+        )
+
+        self.event_level = _checkLevel(event_level.upper() if isinstance(event_level, str) else event_level)
+        self.sample_level = _checkLevel(sample_level.upper() if isinstance(sample_level, str) else sample_level)
+        self.max_events_per_span = max_events_per_span
+        self.sample_ratio = sample_ratio
+        self._rate_limiter = TokenBucket(rate=rate_limit) if rate_limit is not None else None
+
+        if traceback_cache is None:
+            traceback_cache = TracebackCache(max_frames=max_stacktrace_frames, max_length=max_stacktrace_length)
+        self.traceback_cache = traceback_cache
+        self.exception_repeat_window = exception_repeat_window
+        # Отпечатки исключений, полностью зарегистрированных в SPAN. Записи удаляются вместе с SPAN.
+        self._span_exceptions: Optional[WeakKeyDictionary] = None
+        if exception_repeat_window is not None:
+            self._span_exceptions = WeakKeyDictionary()
+        self.repeated_exceptions = 0
+
+        # Счетчики событий по SPAN: [создано, отброшено]. Записи удаляются вместе с SPAN.
+        self._span_events: Optional[WeakKeyDictionary] = None
+        if max_events_per_span is not None or sample_ratio < 1.0 or rate_limit is not None:
+            self._span_events = WeakKeyDictionary()
+        self.dropped_events = 0
+
+    def handle(self, record: LogRecord) -> bool:
+        """
+        Обработка записи только при наличии записываемого SPAN, попавшего в выборку: если трассировка
+        не инициализирована или SPAN не попал в выборку (в том числе записываемый SPAN с решением RECORD_ONLY,
+        который не экспортируется), фильтрация, блокировка обработчика и формирование атрибутов не выполняются.
+
+        :param record: Запись лога
+
+        :return: Признак обработки записи
+        """
+        if self.wait_for_provider:
+            if not _tracer_provider_is_set():
+                return False
+            self.wait_for_provider = False
+
+        span = get_current_span()
+        if not span.is_recording() or not span.get_span_context().trace_flags.sampled:
+            return False
+        return super().handle(record)
+
     def emit(self, record: LogRecord) -> None:
         """
         Создание события для текущего SPAN на основании записи журнала:
-         * Наименование - сообщение журнала;
+         * Наименование - шаблон сообщения или сообщение журнала (см. `event_name`);
          * Дата создания - дата создания записи журнала;
          * Все остальные атрибуты () - атрибуте события.
 
         Кроме этого анализируется текущий уровень записи, и в случае, если он равен или выше уровня ERROR, то для
         SPAN устанавливается статус ERROR
 
+        События для записей уровня ниже ERROR создаются с учетом ограничений обработчика (минимальный уровень,
+        выборка, количество событий в SPAN), записи уровня ERROR и выше регистрируются всегда.
+
         :param record: Запись лога
         """
         span = get_current_span()
-        if span != INVALID_SPAN:
+        if span.is_recording():
             if record.levelno >= ERROR:
                 span.set_status(
                     status=Status(
                         status_code=StatusCode.ERROR
                     )
                 )
+                self._count_event(span=span)
 
                 # Добавляем в SPAN исключение, если оно есть
-                if record.exc_info is not None:
-                    span.record_exception(
-                        attributes=self.get_record_attrs(record=record, remove_msg=False),
-                        exception=record.exc_info[1]
-                    )
+                if record.exc_info is not None and record.exc_info[1] is not None:
+                    self._record_exception(span=span, record=record)
                     return
 
+            elif not self._event_allowed(span=span, levelno=record.levelno):
+                return
+
+            attrs = self._event_attrs(record)
+            if self.event_name == EVENT_NAME_MESSAGE:
+                name = record.getMessage()
+            else:
+                name = record.msg
+                if record.args:
+                    # Справочник атрибутов кэшируется в записи и не изменяется
+                    attrs = {**attrs, MESSAGE_ATTR: record.getMessage()}
+
             span.add_event(
-                name=record.msg,
-                attributes=self.get_record_attrs(record=record)
+                name=name,
+                attributes=attrs
             )
 
+    def _record_exception(self, span: Span, record: LogRecord) -> None:
+        """
+        Регистрация исключения записи в SPAN: событие "exception" с теми же атрибутами, что и
+        `Span.record_exception`, и отпечатком исключения (`EXCEPTION_FINGERPRINT_ATTR`). Регистрируется исключение
+        записи, а не обрабатываемое в момент вызова.
+
+        Стек вызовов формируется из кэша по отпечатку исключения (см. `TracebackCache`); если стек не сокращается
+        по количеству кадров и уже сформирован форматтером другого обработчика (`exc_text`), используется он.
+        `exc_text` записи не изменяется. Повтор исключения (см. `exception_repeat_window`) регистрируется без стека
+        вызовов и атрибутов записи.
+
+        :param span: Текущий SPAN
+        :param record: Запись лога
+        """
+        exc_type, exception, tb = record.exc_info
+        tracebacks = self.traceback_cache
+        entry = tracebacks.get(exc_type, exception, tb)
+
+        attrs = {
+            'exception.type': exc_type.__name__,
+            'exception.message': str(exception),
+            'exception.escaped': 'False',
+            EXCEPTION_FINGERPRINT_ATTR: entry.fingerprint,
+        }
+        if self._span_exceptions is not None and self._is_repeated_exception(span=span, entry=entry):
+            self.repeated_exceptions += 1
+            span.add_event(name='exception', attributes=attrs)
+            return
+
+        if tracebacks.max_frames is None and record.exc_text:
+            stacktrace = record.exc_text
+        else:
+            stacktrace = tracebacks.format(entry, exc_type, exception)
+        attrs['exception.stacktrace'] = tracebacks.truncate(stacktrace)
+        attrs.update(self._exception_attrs(record))
+        span.add_event(name='exception', attributes=attrs)
+
+    def _is_repeated_exception(self, span: Span, entry: TracebackEntry) -> bool:
+        """
+        Проверка повтора исключения: исключение с тем же отпечатком уже полностью зарегистрировано в SPAN
+        или в течение `exception_repeat_window` сек. Иначе исключение учитывается как полностью зарегистрированное.
+        """
+        fingerprints = self._span_exceptions.get(span)
+        if fingerprints is None:
+            fingerprints = self._span_exceptions[span] = set()
+        elif entry.fingerprint in fingerprints:
+            return True
+
+        now = monotonic()
+        recorded_at = entry.recorded_at
+        if recorded_at is not None and now - recorded_at < self.exception_repeat_window:
+            return True
+
+        fingerprints.add(entry.fingerprint)
+        entry.recorded_at = now
+        return False
+
+    def _event_allowed(self, span: Span, levelno: int) -> bool:
+        """
+        Проверка ограничений на создание события для записи уровня ниже ERROR.
+        Отброшенные события учитываются в атрибуте SPAN `DROPPED_EVENTS_ATTR`.
+
+        :param span: Текущий SPAN
+        :param levelno: Уровень записи
+
+        :return: Признак того, что событие может быть создано
+        """
+        if levelno < self.event_level:
+            return False
+
+        if self._span_events is None:
+            return True
+
+        if levelno < self.sample_level:
+            if self.sample_ratio < 1.0 and random() >= self.sample_ratio:
+                return self._drop_event(span=span)
+            if self._rate_limiter is not None and not self._rate_limiter.consume():
+                return self._drop_event(span=span)
+
+        if self.max_events_per_span is not None:
+            counters = self._span_events.get(span)
+            if counters is not None and counters[0] >= self.max_events_per_span:
+                return self._drop_event(span=span)
+
+        self._count_event(span=span)
+        return True
+
+    def _count_event(self, span: Span) -> None:
+        """
+        Учет созданного события
+        """
+        if self._span_events is None:
+            return
+
+        counters = self._span_events.get(span)
+        if counters is None:
+            self._span_events[span] = [1, 0]
+        else:
+            counters[0] += 1
+
+    def _drop_event(self, span: Span) -> bool:
+        """
+        Учет отброшенного события: обновление атрибута SPAN с количеством отброшенных событий
+
+        :return: Всегда False
+        """
+        counters = self._span_events.get(span)
+        if counters is None:
+            counters = self._span_events[span] = [0, 0]
+        counters[1] += 1
+        self.dropped_events += 1
+
+        span.set_attribute(DROPPED_EVENTS_ATTR, counters[1])
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики обработчика
+
+        :return: Справочник: количество отброшенных событий (см. `DROPPED_EVENTS_ATTR`), повторов исключений,
+            зарегистрированных без стека вызовов, и счетчики кэша стеков вызовов (см. `TracebackCache.stats`)
+        """
+        stats = {
+            'dropped_events': self.dropped_events,
+            'repeated_exceptions': self.repeated_exceptions,
+        }
+        for key, value in self.traceback_cache.stats().items():
+            stats[f'traceback_cache_{key}'] = value
+        return stats
+
     @staticmethod
     def get_record_attrs(
             record: LogRecord,
@@ -128,27 +641,31 @@ class TracerHandler(Handler):
 
         :return: Справочник атрибутов
         """
-        attrs = record.__dict__.copy()
+        return _get_attrs_extractor(remove_msg=remove_msg, message_attr_name=message_attr_name)(record)
 
-        # Удаляем пустые атрибуты (чтобы в лог не сыпало предупреждениями)
-        for k, v in record.__dict__.items():
-            if not v:
-                attrs.pop(k)
 
-        attrs.pop('name', None)
-        attrs.pop('exc_info', None)
-        attrs.pop('exc_text', None)
-        attrs.pop('msecs', None)
-        attrs.pop('relativeCreated', None)
-        attrs.pop('otelSpanID', None)
-        attrs.pop('otelTraceID', None)
-        attrs.pop('otelServiceName', None)
+def _tracer_provider_is_set() -> bool:
+    """
+    Проверка установки глобального провайдера трассировки.
+    `get_tracer_provider()` при отсутствии провайдера каждый раз проверяет переменные окружения, поэтому для
+    проверки на каждой записи используется атрибут модуля `opentelemetry.trace`.
+    """
+    return getattr(trace_api, '_TRACER_PROVIDER', None) is not None
 
-        if remove_msg:
-            attrs.pop('msg', None)
-        else:
-            msg = attrs.pop('msg', None)
-            if msg:
-                attrs[message_attr_name] = msg
 
-        return attrs
+@lru_cache(maxsize=32)
+def _get_attrs_extractor(
+        remove_msg: bool,
+        message_attr_name: str,
+        exclude: frozenset = DEFAULT_EXCLUDED_ATTRS,
+        extra_attrs: Optional[frozenset] = None,
+) -> RecordAttrsExtractor:
+    """
+    Общий экстрактор атрибутов для заданных настроек (для `TracerHandler` и `TracerHandler.get_record_attrs`)
+    """
+    return RecordAttrsExtractor(
+        exclude=exclude,
+        extra_attrs=extra_attrs,
+        remove_msg=remove_msg,
+        message_attr_name=message_attr_name
+    )
@@ -0,0 +1,672 @@
+"""
+:mod:`logstash` -- Отправка записей журнала в Logstash
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from datetime import datetime
+from logging import (
+    LogRecord,
+    getLogRecordFactory,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Union,
+)
+
+import logstash_async
+from logstash_async.constants import constants
+from logstash_async.formatter import LogstashFormatter
+from logstash_async.database import DatabaseCache
+from logstash_async.handler import AsynchronousLogstashHandler
+from logstash_async.memory_cache import MemoryCache
+from logstash_async.utils import import_string
+from logstash_async.worker import LogProcessingWorker
+
+from pytracelog.logging.formatters import (
+    make_json_dumps,
+    orjson,
+)
+from pytracelog.logging.queues import (
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_DROP_NEWEST,
+)
+from pytracelog.logging.records import RecordFactory
+
+
+# Сокращенные наименования транспортов `logstash_async`
+TRANSPORTS = {
+    'tcp': 'logstash_async.transport.TcpTransport',
+    'udp': 'logstash_async.transport.UdpTransport',
+    'beats': 'logstash_async.transport.BeatsTransport',
+    'http': 'logstash_async.transport.HttpTransport',
+}
+
+__all__ = (
+    'LogstashHandler',
+    'LogstashJsonFormatter',
+    'SpoolDatabaseCache',
+    'BoundedMemoryCache',
+    'EVICTION_POLICIES',
+    'TRANSPORTS',
+)
+
+
+# Поведение при заполнении буфера событий
+EVICTION_POLICIES = (
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_DROP_NEWEST,
+)
+
+
+class SpoolDatabaseCache(DatabaseCache):
+    """
+    Буфер событий в файле SQLite с ограничением количества событий.
+
+    Количество событий подсчитывается один раз при открытии буфера и далее поддерживается счетчиком, поэтому
+    ограничение не требует дополнительного запроса при добавлении каждого события. Файл буфера должен
+    использоваться одним процессом.
+
+    События, которые были выбраны для отправки, но не подтверждены до остановки процесса, при открытии буфера
+    возвращаются в очередь и отправляются повторно.
+    """
+    def __init__(
+            self,
+            path: str,
+            event_ttl: Optional[int] = None,
+            max_events: Optional[int] = None,
+            eviction_policy: str = OVERFLOW_DROP_OLDEST,
+            batch_size: Optional[int] = None,
+    ):
+        """
+        :param path: Путь к файлу буфера
+        :param event_ttl: Время хранения события, сек. (None - без ограничения)
+        :param max_events: Максимальное количество событий в буфере (None - без ограничения)
+        :param eviction_policy: Поведение при заполнении буфера (см. `EVICTION_POLICIES`)
+        :param batch_size: Максимальное количество событий, выбираемых для отправки одним пакетом
+            (None - `logstash_async.constants`)
+        """
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f'Неизвестное поведение при заполнении буфера: {eviction_policy}')
+
+        super().__init__(path=path, event_ttl=event_ttl)
+        self.max_events = max_events
+        self.eviction_policy = eviction_policy
+        self.batch_size = batch_size
+        self.event_count = 0
+        self.evicted = 0
+
+    def open_spool(self) -> int:
+        """
+        Подготовка буфера к работе: возврат в очередь неподтвержденных событий и подсчет количества событий
+
+        :return: Количество событий, ожидающих отправки
+        """
+        with self._connect() as connection:
+            connection.execute('UPDATE `event` SET `pending_delete`=0 WHERE `pending_delete`=1;')
+            self.event_count = connection.execute('SELECT COUNT(*) FROM `event`;').fetchone()[0]
+
+        return self.event_count
+
+    def add_event(self, event: str) -> None:
+        if self.max_events and self.event_count >= self.max_events:
+            if self.eviction_policy == OVERFLOW_DROP_NEWEST:
+                self.evicted += 1
+                return
+            self._evict(self.event_count - self.max_events + 1)
+
+        super().add_event(event)
+        self.event_count += 1
+
+    def get_queued_events(self) -> list:
+        query_fetch = 'SELECT `event_id`, `event_text` FROM `event` WHERE `pending_delete` = 0 LIMIT ?;'
+        query_update_base = 'UPDATE `event` SET `pending_delete`=1 WHERE `event_id` IN (%s);'
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query_fetch, (self.batch_size or constants.QUEUED_EVENTS_BATCH_SIZE,))
+            events = cursor.fetchall()
+            self._bulk_update_events(cursor, events, query_update_base)
+
+        return events
+
+    def _evict(self, count: int) -> None:
+        """
+        Удаление самых старых событий, не выбранных для отправки
+
+        :param count: Количество удаляемых событий
+        """
+        query = '''
+            DELETE FROM `event` WHERE `event_id` IN (
+                SELECT `event_id` FROM `event` WHERE `pending_delete`=0 ORDER BY `event_id` LIMIT ?);'''
+        with self._connect() as connection:
+            deleted = connection.execute(query, (count,)).rowcount
+
+        self.event_count -= deleted
+        self.evicted += deleted
+
+    def delete_queued_events(self) -> None:
+        with self._connect() as connection:
+            deleted = connection.execute('DELETE FROM `event` WHERE `pending_delete`=1;').rowcount
+
+        self.event_count -= deleted
+
+    def expire_events(self) -> None:
+        if self._event_ttl is None:
+            return
+
+        query = "DELETE FROM `event` WHERE `entry_date` < datetime('now', ?);"
+        with self._connect() as connection:
+            deleted = connection.execute(query, (f'-{int(self._event_ttl)} seconds',)).rowcount
+
+        self.event_count -= deleted
+
+
+class BoundedMemoryCache(MemoryCache):
+    """
+    Буфер событий в памяти с ограничением количества событий
+    """
+    def __init__(
+            self,
+            cache: dict,
+            event_ttl: Optional[int] = None,
+            max_events: Optional[int] = None,
+            eviction_policy: str = OVERFLOW_DROP_OLDEST,
+            batch_size: Optional[int] = None,
+    ):
+        """
+        :param cache: Справочник событий
+        :param event_ttl: Время хранения события, сек. (None - без ограничения)
+        :param max_events: Максимальное количество событий в буфере (None - без ограничения)
+        :param eviction_policy: Поведение при заполнении буфера (см. `EVICTION_POLICIES`)
+        :param batch_size: Максимальное количество событий, выбираемых для отправки одним пакетом
+            (None - `logstash_async.constants`)
+        """
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f'Неизвестное поведение при заполнении буфера: {eviction_policy}')
+
+        super().__init__(cache=cache, event_ttl=event_ttl)
+        self.max_events = max_events
+        self.eviction_policy = eviction_policy
+        self.batch_size = batch_size
+        self.evicted = 0
+
+    def add_event(self, event: str) -> None:
+        cache = self._cache
+        if self.max_events and len(cache) >= self.max_events:
+            if self.eviction_policy == OVERFLOW_DROP_NEWEST:
+                self.evicted += 1
+                return
+
+            # Справочник сохраняет порядок добавления: удаляем самые старые события, не выбранные для отправки
+            excess = len(cache) - self.max_events + 1
+            evicted = list()
+            for event_id, item in cache.items():
+                if not item['pending_delete']:
+                    evicted.append(event_id)
+                    if len(evicted) >= excess:
+                        break
+
+            for event_id in evicted:
+                del cache[event_id]
+            self.evicted += len(evicted)
+
+        super().add_event(event)
+
+    def get_queued_events(self) -> list:
+        batch_size = self.batch_size or constants.QUEUED_EVENTS_BATCH_SIZE
+        events = list()
+        for event in self._cache.values():
+            if not event['pending_delete']:
+                event['pending_delete'] = True
+                events.append(event)
+                if len(events) >= batch_size:
+                    break
+        return events
+
+
+class SpoolLogProcessingWorker(LogProcessingWorker):
+    """
+    Фоновый поток отправки событий с ограниченным буфером. При запуске отправляет события, оставшиеся
+    в файле буфера после предыдущего запуска процесса.
+
+    Параметры отправки пакетами задаются атрибутами потока; не заданные параметры берутся из
+    `logstash_async.constants`.
+    """
+    def __init__(self, *args, **kwargs):
+        self._max_events = kwargs.pop('max_events')
+        self._eviction_policy = kwargs.pop('eviction_policy')
+        self._batch_size: Optional[int] = kwargs.pop('batch_size', None)
+        self._flush_count: Optional[int] = kwargs.pop('flush_count', None)
+        self._flush_interval: Optional[float] = kwargs.pop('flush_interval', None)
+        super().__init__(*args, **kwargs)
+        # Имя потока используется как имя логгера: сохраняем имя, для которого может быть настроено логирование
+        self.name = LogProcessingWorker.__name__
+
+    def _setup_database(self) -> None:
+        if self._database_path:
+            self._database = SpoolDatabaseCache(
+                path=self._database_path,
+                event_ttl=self._event_ttl,
+                max_events=self._max_events,
+                eviction_policy=self._eviction_policy,
+                batch_size=self._batch_size
+            )
+            try:
+                pending = self._database.open_spool()
+            except Exception as exc:
+                self._safe_log('exception', 'Error opening spool: %s', exc, exc=exc)
+                return
+
+            # Отправляем события, оставшиеся от предыдущего запуска, не дожидаясь интервала отправки
+            if pending:
+                self.force_flush_queued_events()
+        else:
+            self._database = BoundedMemoryCache(
+                cache=self._memory_cache,
+                event_ttl=self._event_ttl,
+                max_events=self._max_events,
+                eviction_policy=self._eviction_policy,
+                batch_size=self._batch_size
+            )
+
+    def _delay_processing(self) -> None:
+        interval = constants.QUEUE_CHECK_INTERVAL
+        if self._flush_interval is not None:
+            # Очередь проверяется не реже интервала отправки
+            interval = min(interval, self._flush_interval)
+        self._shutdown_event.wait(interval)
+
+    def _queued_event_interval_reached(self) -> bool:
+        flush_interval = self._flush_interval
+        if flush_interval is None:
+            flush_interval = constants.QUEUED_EVENTS_FLUSH_INTERVAL
+        return (datetime.now() - self._last_event_flush_date).total_seconds() > flush_interval
+
+    def _queued_event_count_reached(self) -> bool:
+        flush_count = self._flush_count
+        if flush_count is None:
+            flush_count = constants.QUEUED_EVENTS_FLUSH_COUNT
+        return self._non_flushed_event_count > flush_count
+
+
+class LogstashHandler(AsynchronousLogstashHandler):
+    """
+    Асинхронная отправка записей журнала в Logstash с ограниченным буфером событий в памяти или в файле.
+
+    Параметры отправки пакетами (`batch_size`, `flush_count`, `flush_interval`) передаются фоновому потоку
+    отправки, таймаут сокета - транспорту обработчика; `logstash_async.constants` не изменяются. Фоновый поток
+    отправки в `logstash_async` один на процесс, поэтому параметры отправки пакетами действуют по настройкам
+    обработчика, запустившего поток.
+
+    Если задан файл буфера, фоновый поток запускается при создании обработчика и сразу отправляет события,
+    которые не удалось отправить до остановки процесса.
+    """
+    def __init__(
+            self,
+            host: str,
+            port: int,
+            database_path: Optional[str] = None,
+            max_events: Optional[int] = None,
+            eviction_policy: str = OVERFLOW_DROP_OLDEST,
+            batch_size: Optional[int] = None,
+            flush_count: Optional[int] = None,
+            flush_interval: Optional[float] = None,
+            socket_timeout: Optional[float] = None,
+            transport: Union[str, Any] = 'tcp',
+            **kwargs
+    ):
+        """
+        :param host: Хост Logstash
+        :param port: Порт Logstash
+        :param database_path: Путь к файлу буфера (None - буфер в памяти)
+        :param max_events: Максимальное количество событий в буфере (None - без ограничения)
+        :param eviction_policy: Поведение при заполнении буфера (см. `EVICTION_POLICIES`)
+        :param batch_size: Максимальное количество событий, отправляемых одним пакетом
+        :param flush_count: Количество накопленных событий, при котором выполняется отправка
+            (по умолчанию - `batch_size`)
+        :param flush_interval: Интервал отправки событий, сек.
+        :param socket_timeout: Таймаут сокета, сек.
+        :param transport: Транспорт: tcp, udp, beats, http (см. `TRANSPORTS`), путь к классу транспорта или
+            его экземпляр
+        :param kwargs: Параметры `AsynchronousLogstashHandler` и транспорта (ssl_enable, ssl_verify, keyfile,
+            certfile, ca_certs, username, password и др.)
+        """
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f'Неизвестное поведение при заполнении буфера: {eviction_policy}')
+
+        self.batch_size = int(batch_size) if batch_size is not None else None
+        if flush_count is None:
+            flush_count = batch_size
+        self.flush_count = int(flush_count) if flush_count is not None else None
+        self.flush_interval = float(flush_interval) if flush_interval is not None else None
+
+        if isinstance(transport, str):
+            transport = TRANSPORTS.get(transport.lower(), transport)
+        # Таймаут передается транспорту при создании обработчика
+        if socket_timeout is not None and not hasattr(transport, 'send'):
+            transport = _with_timeout(transport, float(socket_timeout))
+
+        super().__init__(host=host, port=port, database_path=database_path, transport=transport, **kwargs)
+        self.max_events = max_events
+        self.eviction_policy = eviction_policy
+
+        if database_path and self._enable:
+            self._start_worker_thread()
+
+    def reinit_after_fork(self) -> None:
+        """
+        Сброс состояния в дочернем процессе после fork: фоновый поток отправки и транспорт создаются заново при
+        отправке первой записи. События, оставшиеся в буфере родительского процесса, отправляет родительский
+        процесс. Файл буфера используется одним процессом, поэтому в дочернем процессе события буферизуются
+        в памяти. Транспорт создается с параметрами, переданными при создании обработчика (см. `_setup_transport`).
+        """
+        AsynchronousLogstashHandler._worker_thread = None
+        logstash_async.EVENT_CACHE.clear()
+        self._transport = None
+        self._database_path = None
+
+    def _setup_transport(self, **kwargs) -> None:
+        """
+        Создание транспорта. Параметры транспорта (username, password и др.) передаются только при создании
+        обработчика, поэтому сохраняются и используются при повторном создании транспорта после fork.
+        """
+        if not hasattr(self, '_transport_kwargs'):
+            self._transport_kwargs = kwargs
+        super()._setup_transport(**self._transport_kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики фонового потока отправки (общего для всех обработчиков):
+         * queued - количество событий в очереди фонового потока;
+         * buffered - количество событий в буфере, ожидающих отправки;
+         * evicted - количество событий, вытесненных из заполненного буфера.
+
+        :return: Справочник счетчиков; пустой, если фоновый поток не запущен
+        """
+        worker = AsynchronousLogstashHandler._worker_thread
+        database = getattr(worker, '_database', None)
+        if worker is None or database is None:
+            return dict()
+
+        if isinstance(database, SpoolDatabaseCache):
+            buffered = database.event_count
+        else:
+            buffered = len(logstash_async.EVENT_CACHE)
+        return {
+            'queued': worker._queue.qsize(),
+            'buffered': buffered,
+            'evicted': getattr(database, 'evicted', 0),
+        }
+
+    def _start_worker_thread(self) -> None:
+        if self._worker_thread_is_running():
+            return
+
+        AsynchronousLogstashHandler._worker_thread = SpoolLogProcessingWorker(
+            host=self._host,
+            port=self._port,
+            transport=self._transport,
+            ssl_enable=self._ssl_enable,
+            ssl_verify=self._ssl_verify,
+            keyfile=self._keyfile,
+            certfile=self._certfile,
+            ca_certs=self._ca_certs,
+            database_path=self._database_path,
+            cache=logstash_async.EVENT_CACHE,
+            event_ttl=self._event_ttl,
+            max_events=self.max_events,
+            eviction_policy=self.eviction_policy,
+            batch_size=self.batch_size,
+            flush_count=self.flush_count,
+            flush_interval=self.flush_interval
+        )
+        AsynchronousLogstashHandler._worker_thread.start()
+
+
+def _with_timeout(transport: Union[str, Callable[..., Any]], timeout: float) -> Callable[..., Any]:
+    """
+    Фабрика транспорта с заданным таймаутом сокета (вместо `logstash_async.constants.SOCKET_TIMEOUT`)
+
+    :param transport: Путь к классу транспорта или фабрика транспорта
+    :param timeout: Таймаут сокета, сек.
+
+    :return: Фабрика транспорта
+    """
+    if isinstance(transport, str):
+        transport = import_string(transport)
+
+    def factory(**kwargs):
+        kwargs['timeout'] = timeout
+        return transport(**kwargs)
+    return factory
+
+
+class LogstashJsonFormatter(LogstashFormatter):
+    """
+    Формирование события Logstash сразу в виде компактного JSON (bytes).
+
+    Формирует тот же документ, что и `LogstashFormatter` с `extra_prefix=None`, но без построения
+    промежуточного справочника:
+     * постоянные поля (тип сообщения, метаданные, хост, версии интерпретатора и т.д.) сериализуются один раз
+       при создании;
+     * статические атрибуты фабрики записей PyTraceLog (см. `PyTraceLog.extend_log_record`) сериализуются
+       один раз при каждом изменении набора атрибутов;
+     * сериализованные наименования атрибутов, уровней, логгеров и путей кэшируются;
+     * если установлен `orjson`, значения сериализуются им.
+
+    Если дополнительный атрибут записи совпадает с полем верхнего уровня события или переопределяет
+    статический атрибут фабрики записей, запись формируется `LogstashFormatter`.
+    """
+    # Максимальный размер кэша сериализованных значений
+    cache_size = 4096
+
+    def __init__(
+            self,
+            message_type: str = 'python-logstash',
+            tags: Optional[Iterable[str]] = None,
+            fqdn: bool = False,
+            extra: Optional[Dict[str, Any]] = None,
+            ensure_ascii: bool = True,
+            metadata: Optional[Dict[str, Any]] = None,
+            fields: Optional[Iterable[str]] = None,
+            use_orjson: bool = True,
+    ):
+        """
+        :param message_type: Тип сообщения
+        :param tags: Список тегов
+        :param fqdn: Использовать полное доменное имя хоста
+        :param extra: Постоянные дополнительные поля
+        :param ensure_ascii: Экранировать символы не из ASCII (не применяется при сериализации `orjson`)
+        :param metadata: Метаданные события (`@metadata`)
+        :param fields: Разрешенные дополнительные атрибуты записи (None - разрешены все)
+        :param use_orjson: Использовать `orjson`, если он установлен
+        """
+        super().__init__(
+            message_type=message_type,
+            tags=list(tags) if tags is not None else None,
+            fqdn=fqdn,
+            extra_prefix=None,
+            extra=extra,
+            ensure_ascii=ensure_ascii,
+            metadata=metadata
+        )
+        self.fields = frozenset(fields) if fields is not None else None
+        self._dumps = make_json_dumps(ensure_ascii=ensure_ascii, use_orjson=use_orjson)
+
+        # Поля верхнего уровня: атрибут записи с таким наименованием заменяет поле события
+        self._reserved = frozenset(constants.FORMATTER_LOGSTASH_MESSAGE_FIELD_LIST)
+        # Атрибуты записи, которые не передаются в событие или заменяются дополнительными полями
+        extra_field_names = self._get_extra_fields(LogRecord('', 0, '', 0, '', None, None)).keys()
+        self._skip = frozenset(constants.FORMATTER_RECORD_FIELD_SKIP_LIST) | {'message'} | extra_field_names
+
+        dumps = self._dumps
+        static = {
+            '@version': '1',
+            'host': self._host,
+            'logsource': self._logsource,
+            'program': self._program_name,
+            'type': self._message_type,
+        }
+        if self._metadata:
+            static['@metadata'] = self._metadata
+        if self._tags:
+            static['tags'] = self._tags
+        static.update({
+            'interpreter': self._interpreter,
+            'interpreter_version': self._interpreter_version,
+            'logstash_async_version': logstash_async.__version__,
+        })
+        if self._extra:
+            static.update(self._extra)
+        self._static_fragment = b''.join(
+            b',' + dumps(k) + b':' + dumps(self._value_repr(v)) for k, v in static.items()
+        )
+
+        self._timestamp = (None, None, b'')
+        self._factory_attrs = (None, None, b'')
+        self._keys: Dict[str, bytes] = dict()
+        self._values: Dict[Any, bytes] = dict()
+
+    def _cached(self, value: Any) -> bytes:
+        """
+        Сериализованное значение из кэша (для значений с небольшим количеством вариантов: уровни, логгеры,
+        пути, потоки)
+        """
+        values = self._values
+        encoded = values.get(value)
+        if encoded is None:
+            if len(values) >= self.cache_size:
+                values.clear()
+            encoded = values[value] = self._dumps(value)
+        return encoded
+
+    def _key(self, key: str) -> bytes:
+        """
+        Сериализованное наименование атрибута с разделителями
+        """
+        encoded = self._keys.get(key)
+        if encoded is None:
+            if len(self._keys) >= self.cache_size:
+                self._keys.clear()
+            encoded = self._keys[key] = b',' + self._dumps(key) + b':'
+        return encoded
+
+    def _format_timestamp_bytes(self, created: float) -> bytes:
+        """
+        Время записи в формате `LogstashFormatter`; часть до секунд кэшируется
+        """
+        timestamp = datetime.utcfromtimestamp(created)
+        second = int(created)
+        cached_second, cached_datetime_second, prefix = self._timestamp
+        # Округление до микросекунд может перенести время на следующую секунду, поэтому сверяем и секунду даты
+        if second != cached_second or timestamp.second != cached_datetime_second:
+            prefix = timestamp.strftime('%Y-%m-%dT%H:%M:%S').encode('ascii')
+            self._timestamp = (second, timestamp.second, prefix)
+        return b'%s.%03dZ' % (prefix, timestamp.microsecond // 1000)
+
+    def _get_factory_attrs(self) -> tuple:
+        """
+        Статические атрибуты фабрики записей PyTraceLog и их сериализованное представление
+
+        :return: Справочник атрибутов, сериализованное представление, признак совпадения атрибута с полем
+            верхнего уровня события
+        """
+        factory = getLogRecordFactory()
+        if not isinstance(factory, RecordFactory):
+            return None, b'', False
+
+        attrs = factory.static_attrs
+        cached_attrs, fragment, reserved = self._factory_attrs
+        # Фабрика заменяет справочник целиком при каждом изменении
+        if attrs is not cached_attrs:
+            fields = self.fields
+            skip = self._skip
+            fragment = b''.join(
+                self._key(k) + self._dumps(self._value_repr(v))
+                for k, v in attrs.items()
+                if k not in skip and k not in self._reserved and (fields is None or k in fields)
+            )
+            reserved_names = self._reserved & attrs.keys()
+            reserved = bool(reserved_names if fields is None else reserved_names & fields)
+            self._factory_attrs = (attrs, fragment, reserved)
+        return attrs, fragment, reserved
+
+    def _get_record_fields(self, record: LogRecord) -> dict:
+        fields = self.fields
+        if fields is None:
+            return super()._get_record_fields(record)
+        return {k: self._value_repr(v) for k, v in record.__dict__.items() if k in fields}
+
+    def format(self, record: LogRecord) -> Union[bytes, str]:
+        """
+        Формирование события
+
+        :param record: Запись лога
+
+        :return: Событие в формате JSON (str, если событие сформировано `LogstashFormatter`)
+        """
+        factory_attrs, factory_fragment, reserved = self._get_factory_attrs()
+        if reserved:
+            return super().format(record)
+
+        record_dict = record.__dict__
+        if self.fields is None:
+            names = record_dict.keys() - self._skip
+        else:
+            names = record_dict.keys() & self.fields
+            names -= self._skip
+
+        dumps = self._dumps
+        value_repr = self._value_repr
+        key = self._key
+        extra_parts = list()
+        for name in names:
+            value = record_dict[name]
+            if factory_attrs and name in factory_attrs:
+                if value is factory_attrs[name]:
+                    continue
+                # Статический атрибут переопределен (например, атрибутом контекста)
+                return super().format(record)
+            if name in self._reserved:
+                return super().format(record)
+
+            extra_parts.append(key(name))
+            value_type = type(value)
+            if value_type is str or value_type is int or value_type is bool or value is None:
+                extra_parts.append(dumps(value))
+            else:
+                extra_parts.append(dumps(value_repr(value)))
+
+        cached = self._cached
+        parts = [
+            b'{"@timestamp":"',
+            self._format_timestamp_bytes(record.created),
+            b'"',
+            self._static_fragment,
+            b',"level":', cached(record.levelname),
+            b',"message":', dumps(record.getMessage()),
+            b',"pid":', cached(record.process),
+            b',"func_name":', cached(record.funcName),
+            b',"line":', cached(record.lineno),
+            b',"logger_name":', cached(record.name),
+            b',"path":', cached(record.pathname),
+            b',"process_name":', cached(record.processName),
+            b',"thread_name":', cached(record.threadName),
+        ]
+        if record.exc_info:
+            parts.append(b',"stack_trace":')
+            if isinstance(record.exc_info, tuple):
+                # Текст исключения формируется один раз для всех обработчиков записи (`exc_text`);
+                # `LogstashFormatter` добавляет в конец стека перевод строки, который `formatException` удаляет
+                if not record.exc_text:
+                    record.exc_text = self.formatException(record.exc_info)
+                parts.append(dumps(record.exc_text + '\n'))
+            else:
+                parts.append(dumps(self._format_exception(record.exc_info)))
+        parts.append(factory_fragment)
+        parts.extend(extra_parts)
+        parts.append(b'}')
+        return b''.join(parts)
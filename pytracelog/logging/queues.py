@@ -0,0 +1,288 @@
+"""
+:mod:`queues` -- Буферизация записей журнала
+=================================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from collections import deque
+from logging import (
+    Formatter,
+    Handler,
+    LogRecord,
+    ERROR,
+)
+from threading import (
+    Condition,
+    Event,
+    Thread,
+)
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+
+__all__ = (
+    'BufferedQueueHandler',
+    'OVERFLOW_BLOCK',
+    'OVERFLOW_DROP_OLDEST',
+    'OVERFLOW_DROP_NEWEST',
+    'OVERFLOW_SAMPLE',
+    'OVERFLOW_POLICIES',
+)
+
+
+# Ожидание освобождения места в очереди
+OVERFLOW_BLOCK = 'block'
+# Вытеснение самой старой записи из очереди
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+# Отбрасывание новой записи
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+# Сохранение записей >= ERROR и каждой N-й записи остальных уровней (с вытеснением самой старой)
+OVERFLOW_SAMPLE = 'sample'
+
+OVERFLOW_POLICIES = (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_SAMPLE,
+)
+
+
+class BufferedQueueHandler(Handler):
+    """
+    Неблокирующий фронтенд для обработчиков записей журнала: запись помещается в ограниченную очередь в памяти,
+    а вывод выполняется фоновым потоком, который объединяет накопленные записи в пакеты.
+
+    Если целевой обработчик реализует метод `emit_batch`, пакет передается ему целиком (для потоковых
+    обработчиков это один вызов `write()` на пакет), иначе записи передаются по одной через `handle`.
+
+    Записи форматируются в фоновом потоке, поэтому аргументы сообщения не должны изменяться после вызова логгера.
+    """
+    def __init__(
+            self,
+            handlers: Iterable[Handler],
+            queue_size: int = 10000,
+            overflow_policy: str = OVERFLOW_BLOCK,
+            batch_size: int = 512,
+            sample_rate: int = 10,
+    ):
+        """
+        :param handlers: Целевые обработчики
+        :param queue_size: Максимальное количество записей в очереди
+        :param overflow_policy: Поведение при заполнении очереди (см. `OVERFLOW_POLICIES`)
+        :param batch_size: Максимальное количество записей в одном пакете
+        :param sample_rate: Для политики `OVERFLOW_SAMPLE`: сохраняется каждая N-я запись уровня < ERROR
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Неизвестная политика переполнения очереди: {overflow_policy}')
+        if queue_size < 1:
+            raise ValueError('Размер очереди должен быть больше нуля')
+
+        super().__init__()
+        self.handlers: List[Handler] = list(handlers)
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.batch_size = max(batch_size, 1)
+        self.sample_rate = max(sample_rate, 1)
+
+        self._start()
+
+    def _start(self) -> None:
+        """
+        Создание очереди, счетчиков и запуск фонового потока
+        """
+        self._queue = deque()
+        self._wakeup = Event()
+        self._not_full = Condition()
+        self._idle = Condition()
+        self._busy = False
+        self._stopped = False
+        self._overflow_count = 0
+
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+
+        self._thread = Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def reinit_after_fork(self) -> None:
+        """
+        Перезапуск обработчика в дочернем процессе после fork: фоновый поток в дочернем процессе не существует,
+        а очередь и условия могли быть захвачены им в момент fork. Записи, находившиеся в очереди, выводятся
+        родительским процессом и в дочернем процессе отбрасываются.
+        """
+        self._start()
+
+    def setFormatter(self, fmt: Optional[Formatter]) -> None:
+        """
+        Установка форматтера обработчика и целевых обработчиков, для которых форматтер не задан
+        (например, при инициализации через `basicConfig`)
+
+        :param fmt: Форматтер
+        """
+        super().setFormatter(fmt)
+        for handler in self.handlers:
+            if handler.formatter is None:
+                handler.setFormatter(fmt)
+
+    def emit(self, record: LogRecord) -> None:
+        """
+        Помещение записи в очередь. Вызывается под блокировкой обработчика, поэтому счетчики не требуют
+        дополнительной синхронизации.
+
+        :param record: Запись лога
+        """
+        queue = self._queue
+        if len(queue) >= self.queue_size and not self._make_room(record=record):
+            self.dropped += 1
+            return
+
+        queue.append(record)
+        self.queued += 1
+
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _make_room(self, record: LogRecord) -> bool:
+        """
+        Освобождение места в заполненной очереди в соответствии с политикой переполнения
+
+        :param record: Новая запись лога
+
+        :return: Признак того, что запись может быть помещена в очередь
+        """
+        policy = self.overflow_policy
+
+        if policy == OVERFLOW_BLOCK:
+            with self._not_full:
+                while len(self._queue) >= self.queue_size and not self._stopped:
+                    self._wakeup.set()
+                    self._not_full.wait(timeout=0.1)
+            return not self._stopped
+
+        if policy == OVERFLOW_DROP_NEWEST:
+            return False
+
+        if policy == OVERFLOW_SAMPLE:
+            self._overflow_count += 1
+            if record.levelno < ERROR and self._overflow_count % self.sample_rate:
+                return False
+
+        # Вытесняем самую старую запись (OVERFLOW_DROP_OLDEST и отобранные записи OVERFLOW_SAMPLE)
+        try:
+            self._queue.popleft()
+        except IndexError:
+            pass
+        else:
+            self.dropped += 1
+        return True
+
+    def _run(self) -> None:
+        """
+        Цикл фонового потока: ожидание записей и их вывод пакетами
+        """
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self._drain()
+
+            if self._stopped:
+                self._drain()
+                return
+
+    def _drain(self) -> None:
+        """
+        Вывод всех записей, накопленных в очереди
+        """
+        queue = self._queue
+        batch_size = self.batch_size
+
+        with self._idle:
+            self._busy = True
+
+        try:
+            while queue:
+                batch = []
+                try:
+                    while len(batch) < batch_size:
+                        batch.append(queue.popleft())
+                except IndexError:
+                    pass
+
+                if self.overflow_policy == OVERFLOW_BLOCK:
+                    with self._not_full:
+                        self._not_full.notify_all()
+
+                self._write_batch(records=batch)
+        finally:
+            with self._idle:
+                self._busy = False
+                self._idle.notify_all()
+
+    def _write_batch(self, records: List[LogRecord]) -> None:
+        """
+        Передача пакета записей целевым обработчикам
+
+        :param records: Пакет записей лога
+        """
+        for handler in self.handlers:
+            emit_batch = getattr(handler, 'emit_batch', None)
+            if emit_batch is not None:
+                emit_batch(records)
+            else:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+        self.written += len(records)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Ожидание вывода всех записей, находящихся в очереди, и сброс буферов целевых обработчиков
+
+        :param timeout: Максимальное время ожидания, сек.
+        """
+        if self._thread.is_alive():
+            with self._idle:
+                self._wakeup.set()
+                self._idle.wait_for(lambda: not self._queue and not self._busy, timeout=timeout)
+
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self) -> None:
+        """
+        Остановка фонового потока с выводом оставшихся записей и закрытие целевых обработчиков
+        """
+        if not self._stopped:
+            self._stopped = True
+            self._wakeup.set()
+            with self._not_full:
+                self._not_full.notify_all()
+            self._thread.join(timeout=5.0)
+
+        for handler in self.handlers:
+            handler.flush()
+            handler.close()
+
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики обработчика:
+         * queued - количество записей, помещенных в очередь;
+         * dropped - количество отброшенных записей;
+         * written - количество выведенных записей;
+         * pending - текущая длина очереди.
+
+        :return: Справочник счетчиков
+        """
+        return {
+            'queued': self.queued,
+            'dropped': self.dropped,
+            'written': self.written,
+            'pending': len(self._queue),
+        }
@@ -0,0 +1,231 @@
+"""
+:mod:`records` -- Расширение записей журнала
+=================================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from contextvars import (
+    ContextVar,
+    Token,
+)
+from functools import (
+    partial,
+    wraps,
+)
+from inspect import iscoroutinefunction
+from logging import LogRecord
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+
+__all__ = (
+    'CachedLogRecord',
+    'RecordFactory',
+    'LogContext',
+    'bind_log_context',
+    'reset_log_context',
+    'get_log_context',
+)
+
+
+# Атрибуты записей, привязанные к текущему контексту (запросу, задаче asyncio).
+# Справочник не изменяется после установки: при добавлении атрибутов создается новый.
+_log_context: ContextVar[Mapping[str, Any]] = ContextVar('pytracelog_log_context', default={})
+
+
+def get_log_context() -> Mapping[str, Any]:
+    """
+    Атрибуты записей, привязанные к текущему контексту
+    """
+    return _log_context.get()
+
+
+def bind_log_context(**attrs) -> Token:
+    """
+    Привязка атрибутов записей к текущему контексту (в дополнение к уже привязанным).
+    Используется, когда привязка и сброс выполняются в разных вызовах (например, в middleware).
+
+    :param attrs: Список атрибутов со значениями
+
+    :return: Маркер для восстановления предыдущего состояния (см. `reset_log_context`)
+    """
+    return _log_context.set({**_log_context.get(), **attrs})
+
+
+def reset_log_context(token: Token) -> None:
+    """
+    Восстановление атрибутов записей, привязанных к контексту до вызова `bind_log_context`
+
+    :param token: Маркер, полученный от `bind_log_context`
+    """
+    _log_context.reset(token)
+
+
+class LogContext:
+    """
+    Контекстный менеджер и декоратор для привязки атрибутов записей к контексту запроса или задачи.
+    Атрибуты объединяются один раз при входе в контекст, при создании записи выполняется одно обращение
+    к `ContextVar`. Поддерживаются синхронные функции и корутины.
+
+    Пример::
+
+        with LogContext(request_id=request_id, tenant=tenant):
+            logger.info('Обработка запроса')
+
+        @LogContext(task='cleanup')
+        async def cleanup():
+            ...
+    """
+    def __init__(self, **attrs):
+        """
+        :param attrs: Список атрибутов со значениями
+        """
+        self.attrs = attrs
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> 'LogContext':
+        self._token = bind_log_context(**self.attrs)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        reset_log_context(self._token)
+        self._token = None
+
+    def __call__(self, func: Callable) -> Callable:
+        """
+        Использование в качестве декоратора: для каждого вызова создается отдельный контекст
+        """
+        attrs = self.attrs
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with LogContext(**attrs):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with LogContext(**attrs):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class CachedLogRecord(LogRecord):
+    """
+    Запись журнала, которая формирует сообщение один раз: результат `getMessage` кэшируется, и все обработчики
+    и форматтеры (в том числе стандартные) используют одно сообщение. Кроме сообщения, в записи кэшируются
+    атрибуты, сформированные `RecordAttrsExtractor`.
+
+    Кэши хранятся в слотах, а не в справочнике записи, поэтому не попадают в дополнительные атрибуты форматтеров
+    и в события SPAN, а при копировании и сериализации pickle (`QueueHandler.prepare`, передача записи в другой
+    процесс) не переносятся: кэш сообщения ссылается на исходные `args`, которые могут не сериализоваться.
+    Кэш сообщения действителен, пока не заменены `msg` и `args`, кэш атрибутов - пока, кроме того, в запись
+    не добавлены атрибуты; при изменении значений других атрибутов записи после формирования атрибутов кэш
+    сбрасывается `reset_cache`. Текст исключения кэшируется в стандартном атрибуте `exc_text`.
+    """
+    __slots__ = ('_message', '_attrs')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._message = None
+        self._attrs = None
+
+    def getMessage(self) -> str:
+        cached = self._message
+        if cached is not None and cached[0] is self.msg and cached[1] is self.args:
+            return cached[2]
+
+        message = LogRecord.getMessage(self)
+        self._message = (self.msg, self.args, message)
+        return message
+
+    def __getstate__(self) -> dict:
+        return self.__dict__
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._message = None
+        self._attrs = None
+
+    def reset_cache(self) -> None:
+        """
+        Сброс кэшированных сообщения и атрибутов
+        """
+        self._message = None
+        self._attrs = None
+
+
+class RecordFactory:
+    """
+    Фабрика записей журнала, добавляющая к записи дополнительные атрибуты.
+
+    Все расширения хранятся в одной фабрике, поэтому глубина цепочки фабрик не зависит от количества вызовов
+    `extend`:
+     * статические атрибуты хранятся в одном справочнике и добавляются в запись одной операцией;
+     * динамические атрибуты (вызываемые объекты и `ContextVar`) вычисляются при создании каждой записи;
+     * атрибуты, привязанные к контексту (см. `LogContext`), добавляются в запись одной операцией;
+     * атрибуты связи с трассировкой добавляет `correlation` (см. `SpanCorrelation`), если задан.
+
+    Если исходная фабрика - `LogRecord`, создаются записи `CachedLogRecord`.
+    """
+    def __init__(self, base_factory: Callable[..., LogRecord]):
+        """
+        :param base_factory: Исходная фабрика записей
+        """
+        self.base_factory = base_factory
+        self._create = CachedLogRecord if base_factory is LogRecord else base_factory
+        self.static_attrs: Dict[str, Any] = dict()
+        self.dynamic_attrs: Tuple[Tuple[str, Callable[[], Any]], ...] = tuple()
+        self.correlation: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    def extend(self, **attrs) -> None:
+        """
+        Добавление атрибутов записи. Значение `ContextVar` берется из текущего контекста (None, если не задано),
+        вызываемый объект вызывается без аргументов при создании каждой записи, остальные значения статические.
+
+        :param attrs: Список атрибутов со значениями
+        """
+        static_attrs = dict(self.static_attrs)
+        dynamic_attrs = dict(self.dynamic_attrs)
+
+        for name, value in attrs.items():
+            if isinstance(value, ContextVar):
+                dynamic_attrs[name] = partial(value.get, None)
+                static_attrs.pop(name, None)
+            elif callable(value):
+                dynamic_attrs[name] = value
+                static_attrs.pop(name, None)
+            else:
+                static_attrs[name] = value
+                dynamic_attrs.pop(name, None)
+
+        # Заменяем коллекции целиком, чтобы не изменять их во время создания записей в других потоках
+        self.static_attrs = static_attrs
+        self.dynamic_attrs = tuple(dynamic_attrs.items())
+
+    def __call__(self, *args, **kwargs) -> LogRecord:
+        """
+        Создание записи журнала
+        """
+        record = self._create(*args, **kwargs)
+        record_dict = record.__dict__
+        record_dict.update(self.static_attrs)
+
+        for name, getter in self.dynamic_attrs:
+            record_dict[name] = getter()
+
+        correlation = self.correlation
+        if correlation is not None:
+            correlation(record_dict)
+
+        context_attrs = _log_context.get()
+        if context_attrs:
+            record_dict.update(context_attrs)
+
+        return record
@@ -0,0 +1,284 @@
+"""
+:mod:`tracebacks` -- Кэш форматированных стеков вызовов исключений
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from traceback import (
+    extract_tb,
+    format_exception_only,
+)
+from types import TracebackType
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+from weakref import WeakSet
+
+try:
+    from os import register_at_fork
+except ImportError:
+    # fork не поддерживается (Windows)
+    register_at_fork = None
+
+
+__all__ = (
+    'TracebackCache',
+    'TracebackEntry',
+    'TRUNCATED_MARKER',
+)
+
+
+# Начало стека вызовов, сокращенного до `max_length` (сохраняется конец стека - место и текст исключения)
+TRUNCATED_MARKER = '...\n'
+
+# Заголовок стека вызовов и разделители цепочки исключений (как в `traceback.format_exception`)
+_TRACEBACK_HEADER = 'Traceback (most recent call last):\n'
+_CAUSE_MESSAGE = '\nThe above exception was the direct cause of the following exception:\n\n'
+_CONTEXT_MESSAGE = '\nDuring handling of the above exception, another exception occurred:\n\n'
+
+# Кэши, блокировки которых пересоздаются в дочернем процессе
+_caches = WeakSet()
+
+
+class TracebackEntry:
+    """
+    Форматированный стек вызовов исключения
+    """
+    __slots__ = ('fingerprint', 'stacks', 'size', 'recorded_at')
+
+    def __init__(self, fingerprint: str, stacks: Tuple[str, ...]):
+        # Отпечаток: тип исключения и места вызовов (с цепочкой исключений), не зависит от текста исключения
+        self.fingerprint = fingerprint
+        # Кадры стека каждого исключения цепочки (начиная с последнего исключения) без типа и текста исключения,
+        # которые формируются для каждого исключения
+        self.stacks = stacks
+        self.size = sum(len(stack) for stack in stacks)
+        # Время последней полной регистрации исключения (см. `TracerHandler`)
+        self.recorded_at: Optional[float] = None
+
+
+class TracebackCache:
+    """
+    LRU кэш форматированных стеков вызовов исключений по отпечатку: типу исключения и местам вызовов (код
+    и строка каждого кадра) всей цепочки исключений.
+
+    Формирование кадров стека (чтение строк исходного кода, форматирование кадров) выполняется один раз для
+    каждого отпечатка; для повторного исключения формируются только типы и тексты исключений цепочки
+    (`__cause__`, `__context__`). Кэш ограничен количеством записей `max_entries` и суммарной длиной стеков
+    `max_size` (символов): при превышении вытесняются давно не использованные записи, стек длиннее `max_size`
+    не кэшируется.
+    """
+    def __init__(
+            self,
+            max_frames: Optional[int] = None,
+            max_length: Optional[int] = None,
+            max_entries: int = 1024,
+            max_size: int = 1 << 20,
+    ):
+        """
+        :param max_frames: Максимальное количество кадров стека каждого исключения цепочки (сохраняются
+            последние кадры - ближайшие к месту исключения); None - без ограничения
+        :param max_length: Максимальная длина стека вызовов, символов (сохраняется конец стека); None - без
+            ограничения
+        :param max_entries: Максимальное количество записей кэша
+        :param max_size: Максимальная суммарная длина стеков вызовов в кэше, символов
+        """
+        if max_frames is not None and max_frames < 1:
+            raise ValueError('Количество кадров стека должно быть положительным')
+        if max_length is not None and max_length <= len(TRUNCATED_MARKER):
+            raise ValueError(f'Длина стека вызовов должна быть больше {len(TRUNCATED_MARKER)}')
+
+        self.max_frames = max_frames
+        self.max_length = max_length
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._entries: Dict[tuple, TracebackEntry] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def get(
+            self,
+            exc_type: Type[BaseException],
+            exc: BaseException,
+            tb: Optional[TracebackType],
+    ) -> TracebackEntry:
+        """
+        Получение записи кэша для исключения (формирование стека вызовов, если исключения с таким отпечатком
+        нет в кэше)
+
+        :param exc_type: Тип исключения
+        :param exc: Исключение
+        :param tb: Стек вызовов
+
+        :return: Запись кэша
+        """
+        chain = _walk_chain(exc_type, exc, tb)
+        key = tuple(
+            (item_type, tuple(_walk_frames(item_tb))) for item_type, _, item_tb, _ in chain
+        )
+        entries = self._entries
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Стек формируется без блокировки: при одновременном исключении в нескольких потоках формируется
+        # несколько раз, в кэше остается один
+        entry = TracebackEntry(
+            fingerprint=_fingerprint(key), stacks=tuple(self._format_stack(item_tb) for _, _, item_tb, _ in chain)
+        )
+        size = entry.size
+        if size > self.max_size:
+            return entry
+
+        with self._lock:
+            current = entries.get(key)
+            if current is not None:
+                return current
+
+            entries[key] = entry
+            self._size += size
+            while len(entries) > self.max_entries or self._size > self.max_size:
+                _, evicted = entries.popitem(last=False)
+                self._size -= evicted.size
+        return entry
+
+    def format(self, entry: TracebackEntry, exc_type: Type[BaseException], exc: BaseException) -> str:
+        """
+        Формирование стека вызовов исключения из записи кэша
+
+        :param entry: Запись кэша
+        :param exc_type: Тип исключения
+        :param exc: Исключение
+
+        :return: Стек вызовов (без перевода строки в конце, как `Formatter.formatException`)
+        """
+        chain = _walk_chain(exc_type, exc, exc.__traceback__ if exc is not None else None)
+        if not chain:
+            parts = format_exception_only(exc_type, exc)
+        else:
+            parts = list()
+            for index in range(len(chain) - 1, -1, -1):
+                item_type, item, _, link = chain[index]
+                parts.append(entry.stacks[index])
+                parts.extend(format_exception_only(item_type, item))
+                if link is not None:
+                    parts.append(link)
+
+        text = ''.join(parts)
+        if text[-1:] == '\n':
+            text = text[:-1]
+        return text
+
+    def truncate(self, text: str) -> str:
+        """
+        Ограничение длины стека вызовов (`max_length`): сохраняется конец стека - место и текст исключения
+
+        :param text: Стек вызовов
+
+        :return: Стек вызовов
+        """
+        max_length = self.max_length
+        if max_length is not None and len(text) > max_length:
+            text = TRUNCATED_MARKER + text[len(text) - max_length + len(TRUNCATED_MARKER):]
+        return text
+
+    def _format_stack(self, tb: Optional[TracebackType]) -> str:
+        """
+        Формирование кадров стека одного исключения цепочки (с заголовком, без типа и текста исключения)
+        """
+        stack = extract_tb(tb, limit=-self.max_frames if self.max_frames is not None else None)
+        if not stack:
+            return ''
+        return _TRACEBACK_HEADER + ''.join(stack.format())
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики кэша:
+         * entries - количество записей;
+         * size - суммарная длина стеков вызовов, символов;
+         * hits, misses - количество обращений, для которых запись найдена и не найдена.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def _walk_chain(
+        exc_type: Type[BaseException],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+) -> List[Tuple[Type[BaseException], BaseException, Optional[TracebackType], Optional[str]]]:
+    """
+    Цепочка исключений, начиная с последнего: исключение и предшествующие исключения (`__cause__`,
+    `__context__`, если он не подавлен), как в `traceback.format_exception`
+
+    :return: Список (тип исключения, исключение, стек вызовов, разделитель после текста исключения)
+    """
+    chain = list()
+    seen = set()
+    link = None
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        chain.append((exc_type, exc, tb, link))
+
+        if exc.__cause__ is not None:
+            exc, link = exc.__cause__, _CAUSE_MESSAGE
+        elif exc.__context__ is not None and not exc.__suppress_context__:
+            exc, link = exc.__context__, _CONTEXT_MESSAGE
+        else:
+            break
+        exc_type = type(exc)
+        tb = exc.__traceback__
+    return chain
+
+
+def _walk_frames(tb: Optional[TracebackType]) -> List[tuple]:
+    """
+    Места вызовов стека (объект кода и строка) - часть ключа кэша
+    """
+    frames = list()
+    while tb is not None:
+        frames.append((tb.tb_frame.f_code, tb.tb_lineno))
+        tb = tb.tb_next
+    return frames
+
+
+def _fingerprint(key: Tuple[tuple, ...]) -> str:
+    """
+    Отпечаток исключения: хеш типов исключений и мест вызовов (файл, строка, функция), одинаковый в разных
+    процессах
+    """
+    parts = list()
+    for exc_type, frames in key:
+        parts.append(f'{exc_type.__module__}.{exc_type.__qualname__}')
+        parts.extend(f'{code.co_filename}:{lineno}:{code.co_name}' for code, lineno in frames)
+    return blake2b('\n'.join(parts).encode('utf-8', 'backslashreplace'), digest_size=8).hexdigest()
+
+
+def _reinit_caches_after_fork() -> None:
+    """
+    Пересоздание блокировок кэшей в дочернем процессе
+    """
+    for cache in list(_caches):
+        cache._lock = Lock()
+
+
+if register_at_fork is not None:
+    register_at_fork(after_in_child=_reinit_caches_after_fork)
@@ -0,0 +1,329 @@
+"""
+:mod:`metrics` -- Метрики подсистем логирования и трассировки
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from logging import (
+    Handler,
+    LogRecord,
+)
+from threading import (
+    RLock,
+    Thread,
+    local,
+)
+from time import perf_counter_ns
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+from weakref import (
+    finalize,
+    ref,
+)
+
+
+__all__ = (
+    'HandlerMetrics',
+    'MetricsServer',
+    'render_prometheus',
+    'LATENCY_BUCKETS',
+    'PROMETHEUS_CONTENT_TYPE',
+)
+
+
+# Гистограмма времени обработки записи: интервалы с границами - степенями двойки от 2^10 нс (~1 мкс)
+# до 2^30 нс (~1 с), интервал определяется длиной двоичного представления времени без поиска по границам
+_LATENCY_SHIFT = 10
+_LATENCY_INTERVALS = 21
+# Верхние границы интервалов гистограммы, нс
+LATENCY_BUCKETS = tuple(1 << (_LATENCY_SHIFT + index) for index in range(_LATENCY_INTERVALS))
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Позиции счетчиков в ячейке потока: вызовы, обработанные записи, суммарное время; далее - интервалы гистограммы
+_CALLS = 0
+_HANDLED = 1
+_TIME = 2
+_BUCKETS = 3
+
+
+class HandlerMetrics:
+    """
+    Счетчики и гистограмма времени обработки записей обработчиком (метод `handle`: фильтрация, блокировка
+    и вывод записи).
+
+    Устанавливается вместо метода `handle` экземпляра обработчика (см. `install`). Каждый поток обновляет
+    собственную ячейку счетчиков без блокировок; блокировка захватывается только при первом обращении потока,
+    значения всех ячеек суммируются при формировании снимка (`snapshot`). При завершении потока его ячейка
+    добавляется к общим счетчикам завершенных потоков и удаляется.
+
+    Записи, которые `BufferedQueueHandler` передает целевым обработчикам пакетом (`emit_batch`), не учитываются:
+    для них действуют счетчики очереди.
+    """
+    def __init__(self, handler: Handler):
+        """
+        :param handler: Обработчик
+        """
+        self.handler = handler
+        self._handle: Callable[[LogRecord], Any] = handler.handle
+        self._cell_size = _BUCKETS + len(LATENCY_BUCKETS) + 1
+        # Ячейки работающих потоков по идентификатору ячейки и счетчики завершенных потоков
+        self._cells: Dict[int, List[int]] = dict()
+        self._retired = [0] * self._cell_size
+        self._local = local()
+        # Блокировка повторно входимая: финализатор ячейки может быть вызван сборщиком мусора в потоке,
+        # который удерживает блокировку
+        self._lock = RLock()
+
+    def install(self) -> None:
+        """
+        Замена метода `handle` обработчика функцией, которая измеряет время обработки записи
+        """
+        self.handler.handle = self._make_handle()
+
+    def uninstall(self) -> None:
+        """
+        Восстановление метода `handle` обработчика
+        """
+        handle = self.handler.__dict__.get('handle')
+        if handle is not None and getattr(handle, '__self__', None) is self:
+            del self.handler.handle
+
+    def _make_handle(self) -> Callable[[LogRecord], Any]:
+        """
+        Формирование функции обработки записи. Используется замыкание, а не метод `__call__`: вызов функции
+        и обращение к ее локальным переменным дешевле обращения к атрибутам экземпляра.
+        """
+        handle = self._handle
+        new_cell = self._new_cell
+        metrics = self
+
+        def measured_handle(record: LogRecord) -> Any:
+            start = perf_counter_ns()
+            rv = handle(record)
+            elapsed = perf_counter_ns() - start
+
+            try:
+                cell = metrics._local.cell
+            except AttributeError:
+                cell = new_cell()
+
+            cell[_CALLS] += 1
+            if rv:
+                cell[_HANDLED] += 1
+            cell[_TIME] += elapsed
+            index = (elapsed >> _LATENCY_SHIFT).bit_length()
+            if index > _LATENCY_INTERVALS:
+                index = _LATENCY_INTERVALS
+            cell[_BUCKETS + index] += 1
+            return rv
+
+        measured_handle.__self__ = self
+        return measured_handle
+
+    def _new_cell(self) -> List[int]:
+        """
+        Создание ячейки счетчиков текущего потока
+        """
+        cell = [0] * self._cell_size
+        cells = self._cells
+        with self._lock:
+            cells[id(cell)] = cell
+
+        # Данные потока в `local` удаляются при завершении потока, вместе с ними - маркер ячейки
+        marker = _CellMarker()
+        finalizer = finalize(marker, _retire_cell, ref(self), cells, cell)
+        finalizer.atexit = False
+        self._local.cell = cell
+        self._local.marker = marker
+        return cell
+
+    def _retire(self, cells: Dict[int, List[int]], cell: List[int]) -> None:
+        """
+        Перенос ячейки завершенного потока в общие счетчики
+
+        :param cells: Ячейки, в которых зарегистрирована ячейка потока
+        :param cell: Ячейка потока
+        """
+        # Ячейки, созданные до fork, уже сброшены (см. `reinit_after_fork`)
+        if cells is not self._cells:
+            return
+
+        retired = self._retired
+        with self._lock:
+            if cells.pop(id(cell), None) is None:
+                return
+            for index, value in enumerate(cell):
+                retired[index] += value
+
+    def reinit_after_fork(self) -> None:
+        """
+        Сброс счетчиков в дочернем процессе после fork: метрики дочернего процесса учитываются отдельно
+        """
+        self._lock = RLock()
+        self._cells = dict()
+        self._retired = [0] * self._cell_size
+        self._local = local()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Снимок счетчиков:
+         * calls - количество записей, переданных обработчику;
+         * handled - количество записей, прошедших фильтры обработчика;
+         * time_ns - суммарное время обработки, нс;
+         * latency_ns - гистограмма времени обработки: количество записей, обработанных быстрее границы
+           интервала (нс, см. `LATENCY_BUCKETS`; последний интервал - без ограничения, None).
+
+        :return: Справочник счетчиков
+        """
+        with self._lock:
+            cells = list(self._cells.values())
+            totals = list(self._retired)
+
+        for cell in cells:
+            for index, value in enumerate(cell):
+                totals[index] += value
+
+        latency = dict()
+        count = 0
+        for bound, value in zip(LATENCY_BUCKETS + (None,), totals[_BUCKETS:]):
+            count += value
+            latency[bound] = count
+
+        return {
+            'calls': totals[_CALLS],
+            'handled': totals[_HANDLED],
+            'time_ns': totals[_TIME],
+            'latency_ns': latency,
+        }
+
+
+class _CellMarker:
+    """
+    Маркер ячейки счетчиков в данных потока: отслеживает завершение потока
+    """
+    __slots__ = ('__weakref__',)
+
+
+def _retire_cell(metrics_ref: 'ref[HandlerMetrics]', cells: Dict[int, List[int]], cell: List[int]) -> None:
+    """
+    Перенос ячейки завершенного потока в общие счетчики, если метрики не удалены
+    """
+    metrics = metrics_ref()
+    if metrics is not None:
+        metrics._retire(cells=cells, cell=cell)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(stats: Dict[str, Any], prefix: str = 'pytracelog') -> str:
+    """
+    Формирование метрик в текстовом формате Prometheus из снимка `PyTraceLog.stats()`:
+     * счетчики обработчиков - `<prefix>_handler_<счетчик>{handler="<имя>"}`;
+     * гистограмма времени обработки записи - `<prefix>_handler_seconds` (сек.);
+     * остальные разделы снимка - `<prefix>_<раздел>_<счетчик>`.
+
+    :param stats: Снимок счетчиков
+    :param prefix: Префикс наименований метрик
+
+    :return: Текст метрик
+    """
+    families: Dict[str, List[Tuple[str, Any]]] = dict()
+
+    def add(name, labels, value):
+        families.setdefault(name, list()).append((labels, value))
+
+    for handler_name, handler_stats in stats.get('handlers', dict()).items():
+        label = f'handler="{_escape_label(handler_name)}"'
+        for key, value in handler_stats.items():
+            if key == 'latency_ns':
+                for bound, count in value.items():
+                    le = '+Inf' if bound is None else repr(bound / 1e9)
+                    add(f'{prefix}_handler_seconds_bucket', f'{label},le="{le}"', count)
+            elif key == 'time_ns':
+                add(f'{prefix}_handler_seconds_sum', label, value / 1e9)
+            elif key == 'calls' and 'latency_ns' in handler_stats:
+                add(f'{prefix}_handler_seconds_count', label, value)
+                add(f'{prefix}_handler_{key}', label, value)
+            elif isinstance(value, (int, float)):
+                add(f'{prefix}_handler_{key}', label, value)
+
+    for section, section_stats in stats.items():
+        if section == 'handlers' or not isinstance(section_stats, dict):
+            continue
+        for key, value in section_stats.items():
+            if isinstance(value, (int, float)):
+                add(f'{prefix}_{section}_{key}', '', value)
+
+    lines = list()
+    histogram = f'{prefix}_handler_seconds'
+    typed = set()
+    for name, samples in families.items():
+        family = histogram if name.startswith(histogram + '_') else name
+        if family not in typed:
+            typed.add(family)
+            lines.append(f'# TYPE {family} {"histogram" if family == histogram else "untyped"}')
+        for labels, value in samples:
+            lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP запросов сервера метрик
+    """
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = render_prometheus(self.server.get_stats()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Запросы не логируются: сервер работает в процессе, логирование которого измеряется
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    HTTP сервер метрик в текстовом формате Prometheus (`/metrics`), работающий в фоновом потоке
+    """
+    daemon_threads = True
+
+    def __init__(self, get_stats: Callable[[], Dict[str, Any]], port: int, addr: str = ''):
+        """
+        :param get_stats: Функция получения снимка счетчиков (см. `PyTraceLog.stats`)
+        :param port: Порт (0 - свободный порт)
+        :param addr: Адрес
+        """
+        super().__init__((addr, port), _MetricsRequestHandler)
+        self.get_stats = get_stats
+        self._thread = Thread(target=self.serve_forever, name='pytracelog-metrics', daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def close(self) -> None:
+        """
+        Остановка сервера
+        """
+        self.shutdown()
+        self.server_close()
+        self._thread.join(timeout=5.0)
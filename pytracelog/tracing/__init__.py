@@ -0,0 +1,5 @@
+"""
+:mod:`tracing` -- Расширения для OpenTelemetry SDK
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
@@ -0,0 +1,138 @@
+"""
+:mod:`correlation` -- Связь записей журнала с трассировкой
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Tuple,
+)
+
+from opentelemetry import context as context_api
+from opentelemetry.context.contextvars_context import ContextVarsRuntimeContext
+from opentelemetry.trace import SpanContext
+from opentelemetry.trace.propagation import _SPAN_KEY
+
+from pytracelog.logging.formatters import (
+    INVALID_ID,
+    SERVICE_NAME_ATTR,
+    SPAN_ID_ATTR,
+    TRACE_ID_ATTR,
+)
+
+
+__all__ = (
+    'SpanCorrelation',
+    'TraceId',
+    'SpanId',
+)
+
+
+class _HexId(str):
+    """
+    Идентификатор SPAN или трассировки в виде шестнадцатеричной строки. Является `str`, поэтому сериализуется
+    в JSON и форматируется как строка. При сериализации pickle (передача записи в другой процесс)
+    идентификатор заменяется строкой.
+    """
+    __slots__ = ()
+
+    # Атрибут `SpanContext` и формат идентификатора
+    _attr = ''
+    _format = ''
+
+    def __new__(cls, span_context: SpanContext):
+        """
+        :param span_context: Контекст SPAN, в котором создана запись
+        """
+        return super().__new__(cls, format(getattr(span_context, cls._attr), cls._format))
+
+    def __reduce__(self):
+        return str, (str(self),)
+
+
+class TraceId(_HexId):
+    """
+    Идентификатор трассировки (32 шестнадцатеричных символа)
+    """
+    __slots__ = ()
+    _attr = 'trace_id'
+    _format = '032x'
+
+
+class SpanId(_HexId):
+    """
+    Идентификатор SPAN (16 шестнадцатеричных символов)
+    """
+    __slots__ = ()
+    _attr = 'span_id'
+    _format = '016x'
+
+
+def _context_getter() -> Callable[[], Any]:
+    """
+    Функция получения текущего контекста OpenTelemetry. Для стандартного контекста на `ContextVar` возвращается
+    метод `ContextVar.get`, минуя обертку `get_current` с проверкой загрузки реализации контекста.
+    """
+    # Загрузка реализации контекста
+    context_api.get_current()
+    runtime_context = getattr(context_api, '_RUNTIME_CONTEXT', None)
+    if isinstance(runtime_context, ContextVarsRuntimeContext):
+        return runtime_context._current_context.get
+    return context_api.get_current
+
+
+class SpanCorrelation:
+    """
+    Добавление к записи журнала идентификаторов трассировки и SPAN и наименования сервиса в атрибутах
+    `LoggingInstrumentor` (otelTraceID, otelSpanID, otelServiceName) - совместимо с форматами записей и
+    событиями Logstash, которые используют эти атрибуты.
+
+    В отличие от `LoggingInstrumentor`, идентификаторы форматируются один раз для SPAN: строки кэшируются по
+    идентификатору SPAN (не более `cache_size` SPAN, при переполнении кэш очищается), поэтому записи
+    одновременно выполняющихся SPAN также получают готовые строки (см. `TraceId`, `SpanId`). Вне SPAN атрибуты
+    имеют значение "0", как у `LoggingInstrumentor`.
+    Вызывается фабрикой записей PyTraceLog (см. `RecordFactory.correlation`).
+    """
+    # Максимальное количество SPAN в кэше идентификаторов
+    cache_size = 1024
+
+    def __init__(self, service_name: str = ''):
+        """
+        :param service_name: Наименование сервиса
+        """
+        self.service_name = service_name
+        self._get_context = _context_getter()
+        self._invalid_attrs: Dict[str, str] = {
+            TRACE_ID_ATTR: INVALID_ID,
+            SPAN_ID_ATTR: INVALID_ID,
+            SERVICE_NAME_ATTR: service_name,
+        }
+        # Идентификатор SPAN -> (контекст SPAN, идентификатор трассировки, идентификатор SPAN)
+        self._ids: Dict[int, Tuple[SpanContext, TraceId, SpanId]] = dict()
+
+    def __call__(self, record_dict: Dict[str, Any]) -> None:
+        """
+        Добавление атрибутов в справочник записи
+
+        :param record_dict: Справочник атрибутов записи
+        """
+        # Текущий SPAN читается из контекста напрямую: `get_current_span` дополнительно проверяет тип SPAN,
+        # а `SpanContext.is_valid` сравнивает оба идентификатора
+        span = self._get_context().get(_SPAN_KEY)
+        if span is not None:
+            span_context = span.get_span_context()
+            span_id = span_context.span_id
+            if span_id:
+                ids = self._ids
+                cached = ids.get(span_id)
+                if cached is None or cached[0] is not span_context:
+                    if len(ids) >= self.cache_size:
+                        ids.clear()
+                    cached = ids[span_id] = (span_context, TraceId(span_context), SpanId(span_context))
+                _, record_dict[TRACE_ID_ATTR], record_dict[SPAN_ID_ATTR] = cached
+                record_dict[SERVICE_NAME_ATTR] = self.service_name
+                return
+
+        record_dict.update(self._invalid_attrs)
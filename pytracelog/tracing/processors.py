@@ -0,0 +1,362 @@
+"""
+:mod:`processors` -- Обработчики SPAN
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+import logging
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+from weakref import WeakMethod
+
+from opentelemetry.context import (
+    _SUPPRESS_INSTRUMENTATION_KEY,
+    attach,
+    detach,
+    set_value,
+)
+from opentelemetry.sdk.trace import (
+    ReadableSpan,
+    SpanProcessor,
+)
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExportResult,
+)
+from opentelemetry.trace import StatusCode
+
+try:
+    from os import register_at_fork
+except ImportError:
+    # fork не поддерживается (Windows)
+    register_at_fork = None
+
+
+__all__ = (
+    'CountingBatchSpanProcessor',
+    'TailSamplingSpanProcessor',
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class CountingBatchSpanProcessor(BatchSpanProcessor):
+    """
+    `BatchSpanProcessor` со счетчиками SPAN: отброшенных из-за переполнения очереди (или после остановки),
+    экспортированных и не экспортированных из-за ошибки экспорта.
+
+    `BatchSpanProcessor` при заполнении очереди молча вытесняет самые старые SPAN, поэтому переполнение
+    видно только по счетчику `dropped`. Счетчики экспорта изменяются только фоновым потоком экспорта,
+    счетчик отброшенных SPAN - под блокировкой и только при заполненной очереди.
+    """
+    def __init__(self, *args, **kwargs):
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self.batches = 0
+        self._dropped_lock = Lock()
+        super().__init__(*args, **kwargs)
+
+    def _at_fork_reinit(self) -> None:
+        """
+        Перезапуск потока экспорта в дочернем процессе после fork (вызывается `BatchSpanProcessor`): очередь
+        очищается, счетчики ведутся для каждого процесса отдельно
+        """
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self.batches = 0
+        self._dropped_lock = Lock()
+        super()._at_fork_reinit()
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context.trace_flags.sampled and (self.done or len(self.queue) == self.max_queue_size):
+            with self._dropped_lock:
+                self.dropped += 1
+        super().on_end(span)
+
+    def _export_batch(self) -> int:
+        """
+        Экспорт не более `max_export_batch_size` SPAN с учетом результата экспорта
+
+        :return: Количество SPAN, переданных на экспорт
+        """
+        idx = 0
+        # Очередь разбирает только поток экспорта
+        while idx < self.max_export_batch_size and self.queue:
+            self.spans_list[idx] = self.queue.pop()
+            idx += 1
+
+        token = attach(set_value(_SUPPRESS_INSTRUMENTATION_KEY, True))
+        try:
+            result = self.span_exporter.export(self.spans_list[:idx])
+        except Exception:
+            logger.exception('Exception while exporting Span batch.')
+            result = SpanExportResult.FAILURE
+        detach(token)
+
+        self.batches += 1
+        if result is SpanExportResult.FAILURE:
+            self.failed += idx
+        else:
+            self.exported += idx
+
+        for index in range(idx):
+            self.spans_list[index] = None
+        return idx
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики обработчика
+
+        :return: Справочник: размер очереди, количество отброшенных, экспортированных и не экспортированных SPAN,
+            количество пакетов экспорта
+        """
+        return {
+            'queued': len(self.queue),
+            'dropped': self.dropped,
+            'exported': self.exported,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+
+class _TraceBuffer:
+    """
+    SPAN трассировки, ожидающие решения о выборке
+    """
+    __slots__ = ('spans', 'created', 'keep')
+
+    def __init__(self, created: float):
+        self.spans: List[ReadableSpan] = list()
+        self.created = created
+        # Трассировка подлежит сохранению: содержит ошибку или медленный SPAN
+        self.keep = False
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Выборка трассировок по завершении ("tail sampling"): завершенные SPAN накапливаются по трассировкам,
+    и решение о передаче трассировки обработчику `span_processor` (например, `CountingBatchSpanProcessor`
+    с экспортом в Jaeger) принимается при завершении корневого SPAN (SPAN без родителя или с удаленным
+    родителем). Трассировка сохраняется, если:
+     * хотя бы один SPAN завершен со статусом ERROR (в том числе установленным `TracerHandler`);
+     * длительность хотя бы одного SPAN не меньше `latency_threshold_millis`;
+     * трассировка попала в выборку доли `sample_ratio` остальных трассировок (по идентификатору трассировки,
+       как `TraceIdRatioBased`: решение одинаково во всех сервисах с той же долей).
+
+    Память ограничена: в буфере не более `max_spans` SPAN, трассировка хранится не дольше `trace_ttl_millis`.
+    При превышении ограничений самые старые трассировки вытесняются, и решение принимается по уже полученным
+    SPAN. Решения по последним `max_decisions` трассировкам запоминаются, и SPAN, завершенные после корневого,
+    обрабатываются в соответствии с решением.
+
+    Обрабатываются только SPAN, попавшие в выборку при создании: при выборке по завершении выборка при создании
+    обычно отключается (например, `parentbased_always_on`).
+    """
+    def __init__(
+            self,
+            span_processor: SpanProcessor,
+            latency_threshold_millis: Optional[float] = 1000.0,
+            sample_ratio: float = 0.01,
+            max_spans: int = 100000,
+            trace_ttl_millis: float = 30000.0,
+            max_decisions: int = 10000,
+            clock: Callable[[], float] = monotonic,
+    ):
+        """
+        :param span_processor: Обработчик SPAN сохраненных трассировок
+        :param latency_threshold_millis: Длительность SPAN, при которой трассировка сохраняется, мс
+            (None - без учета длительности)
+        :param sample_ratio: Доля сохраняемых трассировок без ошибок и медленных SPAN
+        :param max_spans: Максимальное количество SPAN в буфере
+        :param trace_ttl_millis: Максимальное время ожидания корневого SPAN трассировки, мс
+        :param max_decisions: Количество запоминаемых решений
+        :param clock: Источник времени, сек.
+        """
+        if not 0.0 <= sample_ratio <= 1.0:
+            raise ValueError('Доля трассировок должна быть в диапазоне [0.0, 1.0]')
+
+        self.span_processor = span_processor
+        self.latency_threshold = (
+            int(latency_threshold_millis * 1e6) if latency_threshold_millis is not None else None
+        )
+        self.sample_ratio = sample_ratio
+        self.max_spans = max_spans
+        self.trace_ttl = trace_ttl_millis / 1000.0
+        self.max_decisions = max_decisions
+        self._clock = clock
+        # Граница младших 64 бит идентификатора трассировки для выборки доли трассировок
+        self._ratio_bound = round(sample_ratio * (1 << 64))
+
+        self._traces: 'OrderedDict[int, _TraceBuffer]' = OrderedDict()
+        self._decisions: 'OrderedDict[int, bool]' = OrderedDict()
+        self._span_count = 0
+        self._lock = Lock()
+        self._reset_counters()
+
+        if register_at_fork is not None:
+            weak_reinit = WeakMethod(self._at_fork_reinit)
+            register_at_fork(after_in_child=lambda: weak_reinit() and weak_reinit()())
+
+    def _reset_counters(self) -> None:
+        self.kept_traces = 0
+        self.dropped_traces = 0
+        self.evicted_traces = 0
+        self.late_spans = 0
+
+    def _at_fork_reinit(self) -> None:
+        """
+        Сброс буфера в дочернем процессе после fork: трассировки родительского процесса обрабатывает
+        родительский процесс
+        """
+        self._traces = OrderedDict()
+        self._decisions = OrderedDict()
+        self._span_count = 0
+        self._lock = Lock()
+        self._reset_counters()
+
+    def on_start(self, span, parent_context=None) -> None:
+        self.span_processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        context = span.context
+        if not context.trace_flags.sampled:
+            return
+
+        trace_id = context.trace_id
+        parent = span.parent
+        is_root = parent is None or parent.is_remote
+        decided = list()
+
+        with self._lock:
+            now = self._clock()
+            decision = self._decisions.get(trace_id)
+            if decision is not None:
+                # SPAN завершен после принятия решения по трассировке
+                self.late_spans += 1
+                spans = [span] if decision else None
+            else:
+                buffer = self._traces.get(trace_id)
+                if buffer is None:
+                    buffer = self._traces[trace_id] = _TraceBuffer(created=now)
+                buffer.spans.append(span)
+                self._span_count += 1
+                if not buffer.keep:
+                    buffer.keep = self._must_keep(span)
+
+                spans = None
+                if is_root:
+                    del self._traces[trace_id]
+                    spans = self._decide(trace_id, buffer)
+                self._evict(now, decided)
+
+        if spans:
+            self._export(spans)
+        for evicted_spans in decided:
+            self._export(evicted_spans)
+
+    def _must_keep(self, span: ReadableSpan) -> bool:
+        """
+        Проверка SPAN на ошибку и длительность
+        """
+        if span.status.status_code is StatusCode.ERROR:
+            return True
+        threshold = self.latency_threshold
+        return (
+            threshold is not None and span.end_time is not None and span.start_time is not None
+            and span.end_time - span.start_time >= threshold
+        )
+
+    def _decide(self, trace_id: int, buffer: _TraceBuffer) -> Optional[List[ReadableSpan]]:
+        """
+        Принятие решения по трассировке, удаленной из буфера (вызывается под блокировкой)
+
+        :return: SPAN сохраняемой трассировки; None, если трассировка отброшена
+        """
+        self._span_count -= len(buffer.spans)
+        keep = buffer.keep or (trace_id & 0xFFFFFFFFFFFFFFFF) < self._ratio_bound
+
+        decisions = self._decisions
+        decisions[trace_id] = keep
+        if len(decisions) > self.max_decisions:
+            decisions.popitem(last=False)
+
+        if keep:
+            self.kept_traces += 1
+            return buffer.spans
+        self.dropped_traces += 1
+        return None
+
+    def _evict(self, now: float, decided: List[List[ReadableSpan]]) -> None:
+        """
+        Вытеснение самых старых трассировок при превышении количества SPAN и по времени ожидания
+        (вызывается под блокировкой)
+
+        :param now: Текущее время
+        :param decided: Список для SPAN вытесненных сохраняемых трассировок
+        """
+        traces = self._traces
+        expire_before = now - self.trace_ttl
+        while traces:
+            trace_id, buffer = next(iter(traces.items()))
+            if self._span_count <= self.max_spans and buffer.created > expire_before:
+                return
+            del traces[trace_id]
+            self.evicted_traces += 1
+            spans = self._decide(trace_id, buffer)
+            if spans:
+                decided.append(spans)
+
+    def _export(self, spans: List[ReadableSpan]) -> None:
+        """
+        Передача SPAN сохраненной трассировки обработчику
+        """
+        on_end = self.span_processor.on_end
+        for span in spans:
+            on_end(span)
+
+    def shutdown(self) -> None:
+        """
+        Принятие решения по трассировкам, оставшимся в буфере, и остановка обработчика
+        """
+        decided = list()
+        with self._lock:
+            while self._traces:
+                trace_id, buffer = self._traces.popitem(last=False)
+                spans = self._decide(trace_id, buffer)
+                if spans:
+                    decided.append(spans)
+
+        for spans in decided:
+            self._export(spans)
+        self.span_processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.span_processor.force_flush(timeout_millis)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики обработчика и обработчика сохраненных трассировок (если он их предоставляет)
+
+        :return: Справочник: количество SPAN в буфере, сохраненных, отброшенных и вытесненных трассировок,
+            SPAN, завершенных после решения по трассировке
+        """
+        stats = dict()
+        get_stats = getattr(self.span_processor, 'stats', None)
+        if get_stats is not None:
+            stats.update(get_stats())
+        stats.update({
+            'tail_buffered': self._span_count,
+            'tail_kept': self.kept_traces,
+            'tail_dropped': self.dropped_traces,
+            'tail_evicted': self.evicted_traces,
+            'tail_late': self.late_spans,
+        })
+        return stats
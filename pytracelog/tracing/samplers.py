@@ -0,0 +1,271 @@
+"""
+:mod:`samplers` -- Выборка трассировок
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+import logging
+import re
+from fnmatch import translate
+from os import environ
+from time import monotonic
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from opentelemetry.sdk.environment_variables import (
+    OTEL_TRACES_SAMPLER,
+    OTEL_TRACES_SAMPLER_ARG,
+)
+from opentelemetry.sdk.trace.sampling import (
+    ALWAYS_OFF,
+    ALWAYS_ON,
+    DEFAULT_OFF,
+    DEFAULT_ON,
+    Decision,
+    ParentBased,
+    ParentBasedTraceIdRatio,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import get_current_span
+
+from pytracelog.utils import TokenBucket
+
+
+__all__ = (
+    'RateLimitingSampler',
+    'RuleBasedSampler',
+    'get_sampler',
+    'parse_rules',
+    'ROUTE_ATTRS',
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Атрибуты SPAN, с которыми сопоставляются правила выборки (помимо наименования SPAN)
+ROUTE_ATTRS = ('http.route', 'http.target')
+
+# Значение OTEL_TRACES_SAMPLER по умолчанию
+DEFAULT_SAMPLER = 'parentbased_always_on'
+
+# Частота выборки по умолчанию для `RateLimitingSampler`, трассировок в секунду
+DEFAULT_RATE_LIMIT = 100.0
+
+
+def _get_parent_trace_state(parent_context):
+    """
+    Состояние трассировки родительского SPAN (передается в новый SPAN без изменений)
+    """
+    span_context = get_current_span(parent_context).get_span_context()
+    if span_context is None or not span_context.is_valid:
+        return None
+    return span_context.trace_state
+
+
+class RateLimitingSampler(Sampler):
+    """
+    Выборка не более `rate` трассировок в секунду (алгоритм "token bucket", см. `TokenBucket`).
+
+    Для выборки дочерних SPAN в соответствии с решением для корневого SPAN используется вместе с `ParentBased`.
+    """
+    def __init__(
+            self,
+            rate: float,
+            capacity: Optional[float] = None,
+            clock: Callable[[], float] = monotonic,
+    ):
+        """
+        :param rate: Максимальное количество трассировок в секунду
+        :param capacity: Допустимый всплеск; по умолчанию - `rate`, но не меньше 1
+        :param clock: Источник времени, сек.
+        """
+        self._bucket = TokenBucket(rate=rate, capacity=capacity, clock=clock)
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def should_sample(
+            self,
+            parent_context,
+            trace_id,
+            name,
+            kind=None,
+            attributes=None,
+            links=None,
+            trace_state=None,
+    ) -> SamplingResult:
+        if self._bucket.consume():
+            return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, _get_parent_trace_state(parent_context))
+        return SamplingResult(Decision.DROP, None, _get_parent_trace_state(parent_context))
+
+    def get_description(self) -> str:
+        return f'RateLimitingSampler{{{self.rate}}}'
+
+
+class RuleBasedSampler(Sampler):
+    """
+    Выборка по правилам: решение принимает выборка первого правила, шаблон которого (в синтаксисе `fnmatch`)
+    соответствует наименованию SPAN или маршруту запроса (см. `ROUTE_ATTRS`); если ни одно правило не подошло -
+    выборка по умолчанию.
+
+    Номер подходящего правила кэшируется по наименованию SPAN и маршруту.
+    """
+    # Максимальный размер кэша правил
+    cache_size = 4096
+
+    def __init__(
+            self,
+            rules: Sequence[Tuple[str, Sampler]],
+            default: Sampler = ALWAYS_ON,
+    ):
+        """
+        :param rules: Список пар (шаблон, выборка)
+        :param default: Выборка, если ни одно правило не подошло
+        """
+        self.rules = tuple(rules)
+        self.default = default
+        self._patterns = tuple(re.compile(translate(pattern)).match for pattern, _ in self.rules)
+        self._samplers = tuple(sampler for _, sampler in self.rules) + (default,)
+        self._cache: Dict[tuple, int] = dict()
+
+    def _match(self, name: str, routes: tuple) -> int:
+        """
+        Номер первого подходящего правила (или номер выборки по умолчанию)
+        """
+        for index, match in enumerate(self._patterns):
+            if match(name) or any(match(route) for route in routes if route):
+                return index
+        return len(self._patterns)
+
+    def should_sample(
+            self,
+            parent_context,
+            trace_id,
+            name,
+            kind=None,
+            attributes=None,
+            links=None,
+            trace_state=None,
+    ) -> SamplingResult:
+        routes = tuple(str(attributes.get(attr, '')) for attr in ROUTE_ATTRS) if attributes else ()
+        key = (name, routes)
+        index = self._cache.get(key)
+        if index is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            index = self._cache[key] = self._match(name=name, routes=routes)
+
+        return self._samplers[index].should_sample(
+            parent_context, trace_id, name, kind, attributes, links, trace_state
+        )
+
+    def get_description(self) -> str:
+        rules = ','.join(f'{pattern}:{sampler.get_description()}' for pattern, sampler in self.rules)
+        return f'RuleBasedSampler{{rules:[{rules}],default:{self.default.get_description()}}}'
+
+
+def _parse_sampler_spec(spec: str) -> Sampler:
+    """
+    Выборка по описанию: always_on, always_off, доля трассировок (0.1) или частота (10/s)
+    """
+    spec = spec.strip().lower()
+    if spec == 'always_on':
+        return ALWAYS_ON
+    if spec == 'always_off':
+        return ALWAYS_OFF
+    if spec.endswith('/s'):
+        return RateLimitingSampler(rate=float(spec[:-2]))
+    return TraceIdRatioBased(rate=float(spec))
+
+
+def parse_rules(rules: str) -> Tuple[List[Tuple[str, Sampler]], Sampler]:
+    """
+    Разбор правил выборки вида `шаблон=выборка;...`. Выборка: always_on, always_off, доля трассировок (0.1)
+    или частота (10/s). Правило с шаблоном `*` задает выборку по умолчанию.
+
+    Пример: ``/health*=always_off;/api/orders*=10/s;*=0.1``
+
+    :param rules: Описание правил
+
+    :return: Список пар (шаблон, выборка) и выборка по умолчанию
+    """
+    parsed = list()
+    default = ALWAYS_ON
+    for rule in rules.split(';'):
+        if not rule.strip():
+            continue
+        pattern, _, spec = rule.rpartition('=')
+        pattern = pattern.strip()
+        if not pattern:
+            raise ValueError(f'Некорректное правило выборки: {rule}')
+
+        sampler = _parse_sampler_spec(spec)
+        if pattern == '*':
+            default = sampler
+        else:
+            parsed.append((pattern, sampler))
+    return parsed, default
+
+
+def _rate_limiting(arg: Optional[str]) -> Sampler:
+    return RateLimitingSampler(rate=float(arg) if arg else DEFAULT_RATE_LIMIT)
+
+
+def _rules(arg: Optional[str]) -> Sampler:
+    rules, default = parse_rules(arg or '')
+    return RuleBasedSampler(rules=rules, default=default)
+
+
+def _ratio(arg: Optional[str]) -> float:
+    return float(arg) if arg else 1.0
+
+
+# Выборки по значению OTEL_TRACES_SAMPLER: стандартные и выборки pytracelog
+_SAMPLERS: Dict[str, Callable[[Optional[str]], Sampler]] = {
+    'always_on': lambda arg: ALWAYS_ON,
+    'always_off': lambda arg: ALWAYS_OFF,
+    'parentbased_always_on': lambda arg: DEFAULT_ON,
+    'parentbased_always_off': lambda arg: DEFAULT_OFF,
+    'traceidratio': lambda arg: TraceIdRatioBased(rate=_ratio(arg)),
+    'parentbased_traceidratio': lambda arg: ParentBasedTraceIdRatio(rate=_ratio(arg)),
+    'ratelimiting': _rate_limiting,
+    'parentbased_ratelimiting': lambda arg: ParentBased(root=_rate_limiting(arg)),
+    'rules': _rules,
+    'parentbased_rules': lambda arg: ParentBased(root=_rules(arg)),
+}
+
+
+def get_sampler(name: Optional[str] = None, arg: Optional[str] = None) -> Sampler:
+    """
+    Создание выборки по наименованию и аргументу (по умолчанию - из переменных окружения OTEL_TRACES_SAMPLER и
+    OTEL_TRACES_SAMPLER_ARG).
+
+    Кроме стандартных выборок OpenTelemetry поддерживаются:
+     * ratelimiting, parentbased_ratelimiting - не более N трассировок в секунду (аргумент - N);
+     * rules, parentbased_rules - выборка по правилам для наименований SPAN и маршрутов (аргумент - правила,
+       см. `parse_rules`).
+
+    :param name: Наименование выборки
+    :param arg: Аргумент выборки
+
+    :return: Выборка
+    """
+    if name is None:
+        name = environ.get(OTEL_TRACES_SAMPLER, DEFAULT_SAMPLER)
+        if arg is None:
+            arg = environ.get(OTEL_TRACES_SAMPLER_ARG)
+
+    factory = _SAMPLERS.get(name.strip().lower())
+    if factory is None:
+        logger.warning('Неизвестная выборка трассировок %s, используется %s', name, DEFAULT_SAMPLER)
+        factory = _SAMPLERS[DEFAULT_SAMPLER]
+
+    return factory(arg)
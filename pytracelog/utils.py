@@ -0,0 +1,130 @@
+"""
+:mod:`utils` -- Вспомогательные классы
+===================================
+.. moduleauthor:: Aleksey Guzhin <a-guzhin@it-serv.ru>
+"""
+from threading import Lock
+from time import monotonic
+from typing import (
+    Callable,
+    Iterable,
+    Optional,
+)
+from weakref import WeakSet
+
+try:
+    from os import register_at_fork
+except ImportError:
+    # fork не поддерживается (Windows)
+    register_at_fork = None
+
+
+__all__ = (
+    'TokenBucket',
+    'PathMatcher',
+)
+
+
+# Корзины, блокировки которых пересоздаются в дочернем процессе (блокировка могла быть захвачена другим потоком
+# в момент fork, и в дочернем процессе ее некому освободить)
+_buckets = WeakSet()
+
+
+class TokenBucket:
+    """
+    Ограничение частоты событий по алгоритму "token bucket": корзина вмещает `capacity` маркеров и пополняется
+    со скоростью `rate` маркеров в секунду, каждое событие расходует один маркер.
+    """
+    def __init__(
+            self,
+            rate: float,
+            capacity: Optional[float] = None,
+            clock: Callable[[], float] = monotonic,
+    ):
+        """
+        :param rate: Скорость пополнения, маркеров в секунду
+        :param capacity: Емкость корзины (допустимый всплеск); по умолчанию - `rate`, но не меньше 1
+        :param clock: Источник времени, сек.
+        """
+        if rate < 0:
+            raise ValueError('Скорость пополнения не может быть отрицательной')
+
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = Lock()
+        _buckets.add(self)
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        """
+        Расход маркеров
+
+        :param tokens: Количество маркеров
+
+        :return: Признак того, что маркеров достаточно (событие разрешено)
+        """
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._updated
+            self._updated = now
+
+            if elapsed > 0:
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+
+class PathMatcher:
+    """
+    Проверка пути запроса по списку исключаемых путей без регулярных выражений: путь, оканчивающийся на `*`,
+    задает префикс, остальные пути сравниваются целиком. Пути сравниваются без завершающего `/`.
+
+    Пути разбираются один раз при создании: проверка - поиск во множестве и один вызов `str.startswith`
+    с кортежем префиксов.
+    """
+    def __init__(self, paths: Iterable[str] = ()):
+        """
+        :param paths: Пути (например, ``/health``, ``/static/*``)
+        """
+        exact = set()
+        prefixes = list()
+        for path in paths:
+            if path.endswith('*'):
+                prefixes.append(path[:-1])
+            else:
+                exact.add(path.rstrip('/') or '/')
+
+        self._exact = frozenset(exact)
+        self._prefixes = tuple(prefixes)
+
+    def __bool__(self) -> bool:
+        return bool(self._exact or self._prefixes)
+
+    def __call__(self, path: str) -> bool:
+        """
+        :param path: Путь запроса
+
+        :return: Признак совпадения пути с одним из путей списка
+        """
+        if path in self._exact:
+            return True
+        if path[-1:] == '/' and (path.rstrip('/') or '/') in self._exact:
+            return True
+        return bool(self._prefixes) and path.startswith(self._prefixes)
+
+
+def _reinit_buckets_after_fork() -> None:
+    """
+    Пересоздание блокировок корзин в дочернем процессе
+    """
+    for bucket in list(_buckets):
+        bucket._lock = Lock()
+
+
+if register_at_fork is not None:
+    register_at_fork(after_in_child=_reinit_buckets_after_fork)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import sys
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from opentelemetry.sdk.trace import TracerProvider
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.handlers import (
+    StdoutHandler,
+    TracerHandler,
+)
+from pytracelog.logging.logstash import LogstashHandler
+from pytracelog.logging.queues import (
+    BufferedQueueHandler,
+    OVERFLOW_BLOCK,
+)
+from tests.test_queues import GatedStream
+
+
+class TestAsyncLogging(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+    def init_stdout(self, stream, **kwargs):
+        PyTraceLog.init_root_logger(level='INFO')
+        stdout_handler = next(h for h in PyTraceLog._handlers if isinstance(h, StdoutHandler))
+        stdout_handler.setStream(stream)
+        self.addCleanup(stdout_handler.setStream, sys.stdout)
+        PyTraceLog.init_async_logging(**kwargs)
+        return PyTraceLog._async_handler
+
+    def test_non_blocking(self):
+        """
+        Проверка того, что вызов логгера в корутине не ожидает вывода записи.
+        """
+        stream = GatedStream()
+        self.addCleanup(stream.gate.set)
+        async_handler = self.init_stdout(stream, queue_size=10)
+        self.assertEqual(
+            [h for h in logging.root.handlers if h in PyTraceLog._handlers], [async_handler],
+            'Обработчики перенесены за очередь'
+        )
+
+        async def log():
+            for i in range(100):
+                logging.info('record-%s', i)
+
+        asyncio.run(asyncio.wait_for(log(), timeout=5))
+        self.assertTrue(stream.entered.wait(timeout=5))
+
+        stream.gate.set()
+        async_handler.flush()
+        self.assertIn('record-99', stream.getvalue())
+        self.assertGreater(async_handler.stats()['dropped'], 0, 'Записи вытесняются, а не блокируют цикл событий')
+
+    def test_tracer_handler(self):
+        """
+        Проверка добавления событий в SPAN, в котором вызван логгер.
+        """
+        provider = TracerProvider()
+        tracer = provider.get_tracer(__name__)
+        stream = GatedStream()
+        stream.gate.set()
+        self.init_stdout(stream)
+        PyTraceLog.init_tracer_logger(level='INFO')
+
+        tracer_handlers = [h for h in logging.root.handlers if isinstance(h, TracerHandler)]
+        self.assertEqual(len(tracer_handlers), 1, 'TracerHandler вызывается в потоке логгера')
+
+        async def request(name):
+            with tracer.start_as_current_span(name) as span:
+                await asyncio.sleep(0)
+                logging.warning(name)
+                return span
+
+        async def main():
+            return await asyncio.gather(*(request(f'request-{i}') for i in range(3)))
+
+        with patch('opentelemetry.trace._TRACER_PROVIDER', provider):
+            spans = asyncio.run(main())
+        for span in spans:
+            self.assertEqual([event.name for event in span.events], [span.name])
+
+    @patch.dict('pytracelog.base.environ', {'LOGSTASH_HOST': '127.0.0.1', 'LOGSTASH_PORT': '1'})
+    def test_handlers_added_later(self):
+        """
+        Проверка добавления за очередь обработчиков, инициализированных после включения асинхронного режима.
+        """
+        async_handler = self.init_stdout(GatedStream())
+        handlers = async_handler.handlers
+        PyTraceLog.init_logstash_logger()
+
+        logstash_handler = next(h for h in PyTraceLog._handlers if isinstance(h, LogstashHandler))
+        self.assertIn(logstash_handler, async_handler.handlers)
+        self.assertNotIn(logstash_handler, handlers, 'Список обработчиков заменяется, а не изменяется')
+        self.assertNotIn(logstash_handler, logging.root.handlers)
+
+    def test_root_logger_later(self):
+        """
+        Проверка вывода в stdout и stderr, инициализированного после включения асинхронного режима.
+        """
+        PyTraceLog.init_async_logging()
+        PyTraceLog.init_root_logger(level='INFO')
+        async_handler = PyTraceLog._async_handler
+        self.assertEqual(logging.root.level, logging.INFO)
+        self.assertEqual([h for h in logging.root.handlers if h in PyTraceLog._handlers], [async_handler])
+
+        stdout_handler = next(h for h in async_handler.handlers if isinstance(h, StdoutHandler))
+        stream = StringIO()
+        stdout_handler.setStream(stream)
+        self.addCleanup(stdout_handler.setStream, sys.stdout)
+        logging.getLogger('test.async').info('Запись')
+        async_handler.flush()
+        self.assertEqual(stream.getvalue(), 'INFO:test.async:Запись\n')
+
+        PyTraceLog.init_root_logger()
+        self.assertEqual(len(async_handler.handlers), 2, 'Повторный вызов не добавляет обработчики')
+
+    def test_block_policy(self):
+        with self.assertRaises(ValueError):
+            PyTraceLog.init_async_logging(overflow_policy=OVERFLOW_BLOCK)
+        self.assertIsNone(PyTraceLog._async_handler)
+        self.assertFalse(any(isinstance(h, BufferedQueueHandler) for h in logging.root.handlers))
+
+
+if __name__ == '__main__':
+    unittest.main()
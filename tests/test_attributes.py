@@ -0,0 +1,89 @@
+import logging
+import unittest
+
+from pytracelog.logging.attributes import (
+    DEFAULT_EXCLUDED_ATTRS,
+    RecordAttrsExtractor,
+    coerce_attr_value,
+)
+from pytracelog.logging.handlers import TracerHandler
+
+
+class TestCoerceAttrValue(unittest.TestCase):
+    def test_primitives(self):
+        """
+        Проверка передачи допустимых значений без преобразования.
+        """
+        for value in ('text', True, 1, 1.5):
+            self.assertIs(coerce_attr_value(value), value)
+
+    def test_sequences(self):
+        """
+        Проверка приведения последовательностей.
+        """
+        self.assertEqual(coerce_attr_value([1, 2]), (1, 2))
+        self.assertEqual(coerce_attr_value(('a', 1)), ('a', '1'), 'Разнородная последовательность - строки')
+        self.assertEqual(coerce_attr_value([{'a': 1}]), ("{'a': 1}",))
+
+    def test_objects(self):
+        """
+        Проверка приведения произвольных объектов к строке.
+        """
+        self.assertEqual(coerce_attr_value({'a': 1}), "{'a': 1}")
+        self.assertEqual(coerce_attr_value(None), 'None')
+
+
+class TestRecordAttrsExtractor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.record = logging.makeLogRecord(
+            dict(
+                msg='Test logging message',
+                levelno=logging.ERROR,
+                user={'id': 1},
+                tenant='tenant',
+                empty='',
+            )
+        )
+
+    def test_exclusions(self):
+        """
+        Проверка исключения атрибутов и пустых значений.
+        """
+        attrs = RecordAttrsExtractor()(self.record)
+
+        for attr in DEFAULT_EXCLUDED_ATTRS | {'msg', 'empty'}:
+            self.assertNotIn(attr, attrs)
+        self.assertTrue(all(attrs.values()))
+        self.assertEqual(attrs['tenant'], 'tenant')
+        self.assertEqual(attrs['user'], "{'id': 1}", 'Значение должно быть приведено к строке')
+
+    def test_extra_attrs(self):
+        """
+        Проверка списка разрешенных дополнительных атрибутов.
+        """
+        attrs = RecordAttrsExtractor(extra_attrs=('tenant',))(self.record)
+
+        self.assertIn('tenant', attrs)
+        self.assertNotIn('user', attrs)
+        self.assertIn('levelno', attrs, 'Стандартные атрибуты разрешены всегда')
+
+    def test_message(self):
+        """
+        Проверка переименования атрибута сообщения.
+        """
+        attrs = RecordAttrsExtractor(remove_msg=False, message_attr_name='message.text')(self.record)
+        self.assertEqual(attrs['message.text'], 'Test logging message')
+
+    def test_tracer_handler_config(self):
+        """
+        Проверка настройки атрибутов TracerHandler.
+        """
+        handler = TracerHandler(exclude_attrs=DEFAULT_EXCLUDED_ATTRS | {'tenant'})
+        attrs = handler._event_attrs(self.record)
+
+        self.assertNotIn('tenant', attrs)
+        self.assertIn('user', attrs)
+
+
+if __name__ == '__main__':
+    unittest.main()
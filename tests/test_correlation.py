@@ -0,0 +1,101 @@
+import json
+import logging
+import pickle
+import unittest
+from unittest.mock import patch
+
+from logstash_async.formatter import LogstashFormatter
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import use_span
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.formatters import JsonFormatter
+from pytracelog.logging.logstash import LogstashJsonFormatter
+from pytracelog.tracing.correlation import (
+    SpanCorrelation,
+    SpanId,
+    TraceId,
+)
+
+
+class TestSpanCorrelation(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+        PyTraceLog._install_record_factory().correlation = SpanCorrelation(service_name='service')
+        self.tracer = TracerProvider().get_tracer(__name__)
+
+    def make_record(self):
+        return logging.getLogRecordFactory()('test.logger', logging.INFO, __file__, 10, 'Сообщение', (), None)
+
+    def make_span_record(self):
+        with use_span(self.tracer.start_span('test'), end_on_exit=True) as span:
+            record = self.make_record()
+        context = span.get_span_context()
+        return record, format(context.trace_id, '032x'), format(context.span_id, '016x')
+
+    def test_ids(self):
+        """
+        Проверка идентификаторов: строки, которые форматируются один раз для SPAN.
+        """
+        record, trace_id, span_id = self.make_span_record()
+        self.assertIsInstance(record.otelTraceID, TraceId)
+        self.assertIsInstance(record.otelSpanID, SpanId)
+        self.assertEqual(record.otelServiceName, 'service')
+
+        spans = [self.tracer.start_span('first'), self.tracer.start_span('second')]
+        records = list()
+        for _ in range(2):
+            for span in spans:
+                with use_span(span):
+                    records.append(self.make_record())
+        self.assertIs(records[0].otelSpanID, records[2].otelSpanID, 'Идентификаторы SPAN форматируются один раз')
+        self.assertIs(records[1].otelSpanID, records[3].otelSpanID, 'Записи разных SPAN чередуются')
+        self.assertNotEqual(records[0].otelSpanID, records[1].otelSpanID)
+        self.assertNotEqual(records[0].otelSpanID, span_id)
+
+        formatter = logging.Formatter('%(otelTraceID)s %(otelSpanID)s %(otelServiceName)s %(message)s')
+        self.assertEqual(formatter.format(record), f'{trace_id} {span_id} service Сообщение')
+        self.assertEqual(f'{record.otelSpanID:>20}', f'{span_id:>20}')
+        self.assertEqual(record.otelTraceID, trace_id)
+        self.assertEqual(json.loads(json.dumps(record.__dict__))['otelTraceID'], trace_id)
+        self.assertEqual(json.loads(json.dumps({'span_id': record.otelSpanID})), {'span_id': span_id})
+        self.assertEqual(pickle.loads(pickle.dumps(record.otelSpanID)), span_id)
+        self.assertIs(type(pickle.loads(pickle.dumps(record.otelSpanID))), str)
+
+    def test_without_span(self):
+        record = self.make_record()
+        self.assertEqual((record.otelTraceID, record.otelSpanID, record.otelServiceName), ('0', '0', 'service'))
+
+    def test_formatters(self):
+        """
+        Проверка совместимости с JSON и событиями Logstash.
+        """
+        record, trace_id, span_id = self.make_span_record()
+
+        event = json.loads(JsonFormatter().format(record))
+        self.assertEqual((event['trace_id'], event['span_id']), (trace_id, span_id))
+
+        for formatter in (
+                LogstashJsonFormatter(use_orjson=False),
+                LogstashJsonFormatter(),
+                LogstashFormatter(extra_prefix=None),
+        ):
+            with self.subTest(formatter=formatter):
+                event = json.loads(formatter.format(record))
+                self.assertEqual((event['otelTraceID'], event['otelSpanID']), (trace_id, span_id))
+
+    @patch('opentelemetry.trace.set_tracer_provider')
+    @patch.dict('pytracelog.base.environ', {'OTEL_EXPORTER_JAEGER_AGENT_HOST': 'localhost'})
+    def test_init_tracer(self, set_tracer_provider):
+        PyTraceLog.reset()
+        self.addCleanup(setattr, PyTraceLog, '_span_processor', None)
+        PyTraceLog.init_tracer(service='test')
+        self.addCleanup(set_tracer_provider.call_args.kwargs['tracer_provider'].shutdown)
+
+        self.assertIsInstance(PyTraceLog._record_factory.correlation, SpanCorrelation)
+        self.assertEqual(self.make_record().otelServiceName, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import logging
+import sys
+import unittest
+from io import StringIO
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.filters import RateLimitFilter
+from pytracelog.logging.handlers import StderrHandler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_record(msg='Dependency failed: %s', lineno=10, name='test.filters', levelno=logging.ERROR):
+    return logging.makeLogRecord(dict(
+        name=name, msg=msg, args=('timeout',), levelno=levelno, pathname=__file__, lineno=lineno
+    ))
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_rate_limit(self):
+        """
+        Проверка ограничения частоты одинаковых записей и количества подавленных записей.
+        """
+        rate_filter = RateLimitFilter(rate=1, burst=2, clock=self.clock)
+        self.assertEqual([rate_filter.filter(make_record()) for _ in range(5)], [True, True, False, False, False])
+        self.assertEqual(rate_filter.stats(), {'keys': 1, 'suppressed': 3})
+
+        self.clock.now += 1.0
+        record = make_record()
+        self.assertTrue(rate_filter.filter(record))
+        self.assertEqual(record.repeated, 3)
+        self.assertEqual(record.getMessage(), 'Dependency failed: timeout', 'Сообщение не изменяется')
+
+        record = make_record()
+        self.assertFalse(rate_filter.filter(record), 'Маркеры израсходованы')
+        self.assertFalse(hasattr(record, 'repeated'))
+
+    def test_summary(self):
+        """
+        Проверка периодической сводки подавленных записей.
+        """
+        rate_filter = RateLimitFilter(rate=0, burst=1, summary_interval=10, clock=self.clock)
+        self.assertTrue(rate_filter.filter(make_record()))
+
+        self.clock.now += 100.0
+        passed = list()
+        for _ in range(30):
+            record = make_record()
+            if rate_filter.filter(record):
+                passed.append((self.clock.now, record.repeated))
+            self.clock.now += 1.0
+
+        self.assertEqual(passed, [(110.0, 10), (121.0, 10)], 'Сводка не чаще раза в summary_interval')
+
+    def test_keys(self):
+        """
+        Проверка раздельного учета записей разных мест вызова и ограничения размера кэша.
+        """
+        rate_filter = RateLimitFilter(rate=0, burst=1, max_keys=2, clock=self.clock)
+        self.assertTrue(rate_filter.filter(make_record(lineno=1)))
+        self.assertTrue(rate_filter.filter(make_record(lineno=2)))
+        self.assertFalse(rate_filter.filter(make_record(lineno=1)))
+        self.assertTrue(rate_filter.filter(make_record(lineno=1, levelno=logging.WARNING)), 'Другой уровень')
+        self.assertTrue(rate_filter.filter(make_record(lineno=1, msg='Other: %s')), 'Другой шаблон')
+        self.assertEqual(rate_filter.stats()['keys'], 2)
+
+        self.assertTrue(rate_filter.filter(make_record(lineno=2)), 'Вытесненная запись учитывается заново')
+        self.assertTrue(rate_filter.filter(make_record(msg={'unhashable': []})), 'Сообщение не хешируется')
+
+    def test_shared_handlers(self):
+        """
+        Проверка однократного учета записи фильтром, установленным на несколько обработчиков.
+        """
+        rate_filter = RateLimitFilter(rate=0, burst=2, clock=self.clock)
+        handlers = [logging.Handler(), logging.Handler()]
+        for handler in handlers:
+            handler.addFilter(rate_filter)
+
+        for _ in range(2):
+            record = make_record()
+            self.assertEqual([handler.filter(record) for handler in handlers], [True, True])
+        record = make_record()
+        self.assertEqual([handler.filter(record) for handler in handlers], [False, False])
+        self.assertEqual(rate_filter.stats()['suppressed'], 1)
+
+    def test_pending_summaries(self):
+        """
+        Проверка вывода сводки подавленных записей после прекращения повторов и при закрытии фильтра.
+        """
+        rate_filter = RateLimitFilter(rate=0, burst=1, summary_interval=10, clock=self.clock)
+        records = list()
+        handler = logging.Handler()
+        handler.emit = records.append
+        handler.addFilter(rate_filter)
+        logger = logging.getLogger('test.filters')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        for _ in range(5):
+            logger.handle(make_record(lineno=1))
+        self.assertEqual(len(records), 1)
+
+        self.clock.now += 10.0
+        logger.handle(make_record(lineno=2))
+        summary, record = records[1:]
+        self.assertEqual((summary.lineno, summary.repeated, summary.getMessage()), (1, 4, 'Dependency failed: %s'))
+        self.assertEqual(record.lineno, 2)
+
+        logger.handle(make_record(lineno=2))
+        rate_filter.close()
+        self.assertEqual((records[-1].lineno, records[-1].repeated), (2, 1))
+        rate_filter.close()
+        self.assertEqual(len(records), 4, 'Сводка выводится один раз')
+
+    def test_last_record_reference(self):
+        """
+        Проверка того, что фильтр не удерживает последнюю обработанную запись.
+        """
+        rate_filter = RateLimitFilter(clock=self.clock)
+        record = make_record()
+        self.assertTrue(rate_filter.filter(record))
+        del record
+        self.assertIsNone(rate_filter._local.last[0]())
+
+
+class TestInitRateLimit(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+    def test_init_rate_limit(self):
+        PyTraceLog.init_root_logger(level='INFO')
+        stream = StringIO()
+        stderr_handler = next(h for h in PyTraceLog._handlers if isinstance(h, StderrHandler))
+        stderr_handler.setStream(stream)
+        self.addCleanup(stderr_handler.setStream, sys.stderr)
+        PyTraceLog.init_rate_limit(rate=1, burst=3)
+
+        for _ in range(100):
+            logging.error('Dependency failed')
+        self.assertEqual(stream.getvalue().count('Dependency failed'), 3)
+        self.assertEqual(PyTraceLog._rate_limit_filter.stats()['suppressed'], 97)
+
+        PyTraceLog.init_async_logging()
+        self.assertIn(PyTraceLog._rate_limit_filter, PyTraceLog._async_handler.filters)
+        self.assertNotIn(PyTraceLog._rate_limit_filter, stderr_handler.filters)
+
+        PyTraceLog.reset()
+        self.assertIn('(message repeated 97 times)', stream.getvalue(), 'Сводка выводится через очередь')
+
+    def test_root_logger_later(self):
+        """
+        Проверка ограничения частоты для вывода в stdout и stderr, инициализированного после вызова.
+        """
+        PyTraceLog.init_rate_limit(rate=1, burst=3)
+        PyTraceLog.init_root_logger(level='INFO')
+        stream = StringIO()
+        stderr_handler = next(h for h in PyTraceLog._handlers if isinstance(h, StderrHandler))
+        stderr_handler.setStream(stream)
+        self.addCleanup(stderr_handler.setStream, sys.stderr)
+
+        for _ in range(10):
+            logging.error('Dependency failed')
+        self.assertIn(PyTraceLog._rate_limit_filter, stderr_handler.filters)
+        self.assertEqual(stream.getvalue().count('Dependency failed'), 3)
+
+        PyTraceLog.reset()
+        self.assertTrue(
+            stream.getvalue().endswith('ERROR:root:Dependency failed (message repeated 7 times)\n'),
+            'Сводка подавленных записей выводится при сбросе'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
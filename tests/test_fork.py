@@ -0,0 +1,235 @@
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+import traceback
+import unittest
+from unittest.mock import patch
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.forwarding import (
+    ForwardingHandler,
+    RecordReceiver,
+)
+from pytracelog.logging.logstash import LogstashHandler
+from pytracelog.logging.queues import BufferedQueueHandler
+from pytracelog.tracing.processors import CountingBatchSpanProcessor
+from pytracelog.utils import TokenBucket
+from tests.test_logstash import LogstashStandIn
+
+
+def run_in_child(func):
+    """
+    Выполнение функции в дочернем процессе
+
+    :return: Код завершения дочернего процесса (0 - без ошибок)
+    """
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            # Защита от зависания дочернего процесса
+            signal.alarm(10)
+            func()
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stderr.flush()
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork не поддерживается')
+class TestAfterFork(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+    def test_buffered_queue_handler(self):
+        """
+        Проверка перезапуска фонового потока вывода в дочернем процессе.
+        """
+        stream = tempfile.TemporaryFile('w+')
+        self.addCleanup(stream.close)
+        PyTraceLog.init_root_logger(level='INFO', queue_size=10)
+        handler = PyTraceLog._handlers[0]
+        self.assertIsInstance(handler, BufferedQueueHandler)
+        stdout_handler = handler.handlers[0]
+        stdout_handler.setStream(stream)
+        self.addCleanup(stdout_handler.setStream, sys.stdout)
+        logging.info('Родительский процесс')
+        handler.flush()
+
+        def child():
+            logging.info('Дочерний процесс')
+            handler.flush()
+            assert handler.stats()['written'] == 1, handler.stats()
+
+        self.assertEqual(run_in_child(child), 0)
+        stream.seek(0)
+        self.assertEqual(stream.read().splitlines(), ['INFO:root:Родительский процесс', 'INFO:root:Дочерний процесс'])
+
+    def test_span_processor(self):
+        """
+        Проверка экспорта SPAN в дочернем процессе.
+        """
+        exporter = InMemorySpanExporter()
+        processor = CountingBatchSpanProcessor(span_exporter=exporter, schedule_delay_millis=10)
+        self.addCleanup(processor.shutdown)
+        provider = TracerProvider()
+        provider.add_span_processor(processor)
+        tracer = provider.get_tracer(__name__)
+        tracer.start_span('parent').end()
+        processor.force_flush()
+
+        def child():
+            tracer.start_span('child').end()
+            assert processor.force_flush(timeout_millis=5000)
+            assert processor.stats()['exported'] == 1, processor.stats()
+            assert exporter.get_finished_spans()[-1].name == 'child'
+
+        self.assertEqual(run_in_child(child), 0)
+        self.assertEqual(processor.stats()['exported'], 1)
+
+    def test_token_bucket_lock(self):
+        """
+        Проверка того, что блокировка, захваченная в момент fork, не приводит к взаимоблокировке в дочернем
+        процессе.
+        """
+        bucket = TokenBucket(rate=10)
+        with bucket._lock:
+            self.assertEqual(run_in_child(lambda: bucket.consume()), 0)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork не поддерживается')
+class TestLogstashAfterFork(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+        self.stand_in = LogstashStandIn()
+        self.stand_in.start()
+        self.addCleanup(self.stand_in.stop)
+
+    def init_logstash_logger(self):
+        with patch.dict('pytracelog.base.environ', {
+            'LOGSTASH_HOST': '127.0.0.1',
+            'LOGSTASH_PORT': str(self.stand_in.port),
+        }):
+            PyTraceLog.init_logstash_logger(level='INFO', flush_interval=0.05)
+
+    def test_worker_restart(self):
+        """
+        Проверка отправки записей дочерним процессом: собственный фоновый поток отправки без повторной отправки
+        событий родительского процесса.
+        """
+        self.init_logstash_logger()
+        logging.info('Родительский процесс')
+        self.assertEqual(self.stand_in.wait_for(1), ['Родительский процесс'])
+
+        def child():
+            logging.info('Дочерний процесс')
+            # Остановка фонового потока с отправкой оставшихся событий
+            PyTraceLog.reset()
+
+        self.assertEqual(run_in_child(child), 0)
+        self.assertEqual(self.stand_in.wait_for(2), ['Родительский процесс', 'Дочерний процесс'])
+
+    def test_transport_kwargs(self):
+        """
+        Проверка повторного создания транспорта дочерним процессом с параметрами транспорта обработчика.
+        """
+        with patch.dict('pytracelog.base.environ', {
+            'LOGSTASH_HOST': '127.0.0.1',
+            'LOGSTASH_PORT': str(self.stand_in.port),
+            'LOGSTASH_USERNAME': 'user',
+            'LOGSTASH_PASSWORD': 'secret',
+        }):
+            PyTraceLog.init_logstash_logger(level='INFO', transport='http')
+        handler = next(h for h in PyTraceLog._handlers if isinstance(h, LogstashHandler))
+        self.assertEqual((handler._transport._username, handler._transport._password), ('user', 'secret'))
+
+        def child():
+            assert handler._transport is None
+            handler._setup_transport()
+            assert (handler._transport._username, handler._transport._password) == ('user', 'secret')
+
+        self.assertEqual(run_in_child(child), 0)
+
+    def test_forwarding(self):
+        """
+        Проверка отправки записей дочерних процессов обработчиком Logstash родительского процесса.
+        """
+        self.init_logstash_logger()
+        PyTraceLog.init_forwarding()
+        logstash_handler = PyTraceLog._record_receiver.handlers[0]
+
+        def child():
+            assert logstash_handler not in logging.root.handlers
+            forwarding_handlers = [h for h in logging.root.handlers if isinstance(h, ForwardingHandler)]
+            assert len(forwarding_handlers) == 1
+            logging.getLogger('child').info('Запись процесса %s', os.getpid())
+            logging.getLogger('child').debug('Не передается')
+
+        for _ in range(3):
+            self.assertEqual(run_in_child(child), 0)
+
+        events = self.stand_in.wait_for(3)
+        self.assertEqual(len(events), 3)
+        self.assertEqual(len(set(events)), 3, 'Записи разных дочерних процессов')
+        self.assertTrue(all(event.startswith('Запись процесса') for event in events))
+
+        time.sleep(0.2)
+        self.assertEqual(len(self.stand_in.events), 3)
+        self.assertIn(logstash_handler, logging.root.handlers, 'В родительском процессе обработчик остается')
+
+
+class TestRecordReceiver(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.records = list()
+        handler = logging.Handler()
+        handler.emit = self.records.append
+        self.receiver = RecordReceiver(handlers=[handler], path=os.path.join(tmp_dir.name, 'records.sock'))
+        self.addCleanup(self.receiver.close)
+
+    def send(self, message):
+        handler = ForwardingHandler(path=self.receiver.path)
+        try:
+            handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.INFO}))
+        finally:
+            handler.close()
+
+    def wait_for(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.records) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return [record.msg for record in self.records]
+
+    def test_access(self):
+        """
+        Проверка прав на Unix socket и приема записей только от процессов того же пользователя.
+        """
+        self.assertEqual(os.stat(self.receiver.path).st_mode & 0o777, 0o600)
+
+        self.send('first')
+        self.assertEqual(self.wait_for(1), ['first'])
+
+        with patch('pytracelog.logging.forwarding.geteuid', return_value=os.geteuid() + 1):
+            self.send('rejected')
+            time.sleep(0.2)
+        self.send('second')
+        self.assertEqual(self.wait_for(2), ['first', 'second'], 'Запись другого пользователя не принимается')
+
+
+if __name__ == '__main__':
+    unittest.main()
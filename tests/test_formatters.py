@@ -0,0 +1,139 @@
+import json
+import logging
+import sys
+import unittest
+from io import StringIO
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.formatters import (
+    JsonFormatter,
+    RepeatedFormatter,
+    make_json_dumps,
+)
+from pytracelog.logging.handlers import StdoutHandler
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+    def make_record(self, msg='Сообщение %s', args=('arg',), level=logging.INFO, **extra):
+        record = logging.getLogRecordFactory()('test.logger', level, __file__, 10, msg, args, None, func='test')
+        record.__dict__.update(extra)
+        return record
+
+    def format(self, record, **kwargs):
+        results = [
+            json.loads(JsonFormatter(use_orjson=use_orjson, **kwargs).format(record))
+            for use_orjson in (True, False)
+        ]
+        self.assertEqual(results[0], results[1], 'Результат не должен зависеть от библиотеки сериализации')
+        return results[0]
+
+    def test_fields(self):
+        """
+        Проверка основных полей записи.
+        """
+        record = self.make_record()
+        record.created = 1700000000.123456
+        self.assertEqual(
+            self.format(record),
+            {
+                'timestamp': '2023-11-14T22:13:20.123Z',
+                'level': 'INFO',
+                'logger': 'test.logger',
+                'message': 'Сообщение arg',
+            }
+        )
+
+    def test_trace_ids(self):
+        """
+        Проверка идентификаторов трассировки, добавленных LoggingInstrumentor.
+        """
+        event = self.format(self.make_record(
+            otelTraceID='0af7651916cd43dd8448eb211c80319c', otelSpanID='b7ad6b7169203331', otelServiceName='service'
+        ))
+        self.assertEqual(event['trace_id'], '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(event['span_id'], 'b7ad6b7169203331')
+        self.assertEqual(event['service'], 'service')
+
+        # Вне SPAN LoggingInstrumentor устанавливает идентификаторы "0"
+        event = self.format(self.make_record(otelTraceID='0', otelSpanID='0', otelServiceName=''))
+        self.assertNotIn('trace_id', event)
+        self.assertNotIn('service', event)
+
+    def test_extra_attrs(self):
+        """
+        Проверка атрибутов extend_log_record, контекста и extra, в том числе не поддерживаемых JSON.
+        """
+        PyTraceLog.extend_log_record(app='test')
+        with PyTraceLog.log_context(request_id='42'):
+            record = self.make_record(count=3, data={'key': [1, None]}, obj=StringIO)
+        event = self.format(record)
+        self.assertEqual(event['app'], 'test')
+        self.assertEqual(event['request_id'], '42')
+        self.assertEqual(event['count'], 3)
+        self.assertEqual(event['data'], {'key': [1, None]})
+        self.assertEqual(event['obj'], str(StringIO))
+
+        self.assertNotIn('count', self.format(record, exclude=('count',)))
+
+    def test_exception(self):
+        try:
+            raise ValueError('Ошибка')
+        except ValueError:
+            record = self.make_record(level=logging.ERROR, exc_info=sys.exc_info())
+        event = self.format(record)
+        self.assertIn('ValueError: Ошибка', event['exception'])
+        self.assertIn('Traceback', record.exc_text, 'Текст исключения кэшируется в записи')
+
+    def test_handler(self):
+        """
+        Проверка вывода одной записи в строке.
+        """
+        stream = StringIO()
+        logger = logging.Logger('test')
+        logger.addHandler(StdoutHandler(stream=stream, json_lines=True))
+        logger.info('Первая\nзапись')
+        logger.info('Вторая')
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([json.loads(line)['message'] for line in lines], ['Первая\nзапись', 'Вторая'])
+
+    def test_init_root_logger(self):
+        PyTraceLog.init_root_logger(json_lines=True)
+        self.assertTrue(all(isinstance(h.formatter, JsonFormatter) for h in logging.root.handlers))
+
+
+class TestRepeatedFormatter(unittest.TestCase):
+    def test_suffix(self):
+        """
+        Проверка суффикса с количеством подавленных повторов без изменения сообщения.
+        """
+        formatter = RepeatedFormatter(logging.BASIC_FORMAT)
+        record = logging.makeLogRecord(dict(name='test', levelname='ERROR', msg='Ошибка %s', args=('x',)))
+        self.assertEqual(formatter.format(record), 'ERROR:test:Ошибка x')
+
+        record.repeated = 5
+        self.assertEqual(formatter.format(record), 'ERROR:test:Ошибка x (message repeated 5 times)')
+        self.assertEqual(record.getMessage(), 'Ошибка x')
+
+    def test_init_root_logger(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+        PyTraceLog.init_root_logger()
+        self.assertTrue(all(isinstance(h.formatter, RepeatedFormatter) for h in logging.root.handlers))
+
+
+class TestMakeJsonDumps(unittest.TestCase):
+    def test_values(self):
+        for use_orjson in (True, False):
+            dumps = make_json_dumps(ensure_ascii=False, use_orjson=use_orjson)
+            for value in ('строка "в кавычках"', 1, 2 ** 70, 0.5, True, None, [1, 'a'], {'a': {'b': 1}}):
+                with self.subTest(value=value, use_orjson=use_orjson):
+                    self.assertEqual(json.loads(dumps(value)), value)
+
+
+if __name__ == '__main__':
+    unittest.main()
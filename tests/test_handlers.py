@@ -1,12 +1,26 @@
 import logging
+import sys
 import unittest
+from io import StringIO
 from pathlib import Path
 from unittest.mock import patch
 
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import (
+    NonRecordingSpan,
+    SpanContext,
+    use_span,
+)
+
 from pytracelog.logging.handlers import (
     StdoutHandler,
     StderrHandler,
+    LevelRouterHandler,
     TracerHandler,
+    DROPPED_EVENTS_ATTR,
+    EVENT_NAME_MESSAGE,
+    EXCEPTION_FINGERPRINT_ATTR,
+    MESSAGE_ATTR,
 )
 
 LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
@@ -134,6 +148,133 @@ class TestStderrHandler(Fixtures):
             )
 
 
+class TestLevelRouterHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        Создание логгера, не связанного с root логгером.
+        """
+        self.logger = logging.getLogger('test_level_router')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self) -> None:
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+
+    def log_all_levels(self) -> None:
+        for level in LOG_LEVELS:
+            self.logger.log(logging.getLevelName(level), level)
+
+    def test_default_routes(self):
+        """
+        Проверка совпадения вывода с парой StdoutHandler/StderrHandler.
+        """
+        stdout, stderr = StringIO(), StringIO()
+        self.logger.addHandler(StdoutHandler(stream=stdout))
+        self.logger.addHandler(StderrHandler(stream=stderr))
+        self.log_all_levels()
+        self.tearDown()
+
+        router_stdout, router_stderr = StringIO(), StringIO()
+        self.logger.addHandler(
+            LevelRouterHandler(routes=((logging.NOTSET, router_stdout), (logging.ERROR, router_stderr)))
+        )
+        self.log_all_levels()
+
+        self.assertEqual(router_stdout.getvalue(), stdout.getvalue())
+        self.assertEqual(router_stderr.getvalue(), stderr.getvalue())
+
+    def test_init(self):
+        """
+        Проверка потоков вывода по умолчанию.
+        """
+        handler = LevelRouterHandler()
+        self.assertEqual(
+            [(level, sink.name) for level, sink in handler.routes],
+            [(logging.NOTSET, '<stdout>'), (logging.ERROR, '<stderr>')]
+        )
+
+    def test_custom_routes(self):
+        """
+        Проверка маршрутизации в несколько приемников, включая обработчик.
+        """
+        debug_stream, stdout, stderr = StringIO(), StringIO(), StringIO()
+        handler = LevelRouterHandler(
+            routes=(
+                ('info', stdout),
+                (logging.ERROR, stderr),
+                ('DEBUG', logging.StreamHandler(debug_stream)),
+            )
+        )
+        self.logger.addHandler(handler)
+        self.log_all_levels()
+
+        self.assertEqual(debug_stream.getvalue(), 'DEBUG\n')
+        self.assertEqual(stdout.getvalue(), 'INFO\nWARNING\n')
+        self.assertEqual(stderr.getvalue(), 'ERROR\nCRITICAL\n')
+
+    def test_emit_batch_error(self):
+        """
+        Проверка сообщения об ошибке вывода пакета с первой записью пакета потока.
+        """
+        stdout, stderr = StringIO(), StringIO()
+        records = [
+            logging.makeLogRecord(dict(msg=level, levelno=logging.getLevelName(level)))
+            for level in LOG_LEVELS
+        ]
+        for handler in (
+                LevelRouterHandler(routes=((logging.NOTSET, stdout), (logging.ERROR, stderr))),
+                StdoutHandler(stream=stdout),
+        ):
+            with patch.object(stdout, 'write', side_effect=OSError), \
+                    patch.object(handler, 'handleError') as handle_error:
+                handler.emit_batch(records)
+            handle_error.assert_called_once_with(records[0])
+
+    def test_filters_and_close(self):
+        """
+        Проверка фильтров маршрутизатора и закрытия приемников-обработчиков.
+        """
+        stdout, sink = StringIO(), logging.StreamHandler(StringIO())
+        handler = LevelRouterHandler(routes=((logging.NOTSET, stdout), (logging.ERROR, sink)))
+        handler.addFilter(lambda record: record.levelno != logging.INFO)
+        self.logger.addHandler(handler)
+        self.log_all_levels()
+        self.assertEqual(stdout.getvalue(), 'DEBUG\nWARNING\n')
+
+        with patch.object(sink, 'close', wraps=sink.close) as sink_close:
+            handler.close()
+        sink_close.assert_called_once()
+        self.assertFalse(stdout.closed, 'Потоки вывода не закрываются')
+
+    def test_below_lowest_route(self):
+        """
+        Проверка отбрасывания записей с уровнем ниже минимального порога.
+        """
+        stdout = StringIO()
+        self.logger.addHandler(LevelRouterHandler(routes=((logging.WARNING, stdout),)))
+        self.log_all_levels()
+
+        self.assertEqual(stdout.getvalue(), 'WARNING\nERROR\nCRITICAL\n')
+
+    def test_emit_batch(self):
+        """
+        Проверка пакетного вывода: по одному вызову write() на поток.
+        """
+        stdout, stderr = StringIO(), StringIO()
+        handler = LevelRouterHandler(routes=((logging.NOTSET, stdout), (logging.ERROR, stderr)))
+        records = [
+            logging.makeLogRecord(dict(msg=level, levelno=logging.getLevelName(level)))
+            for level in LOG_LEVELS
+        ]
+        with patch.object(stdout, 'write', wraps=stdout.write) as stdout_write:
+            handler.emit_batch(records)
+
+        stdout_write.assert_called_once()
+        self.assertEqual(stdout.getvalue(), 'DEBUG\nINFO\nWARNING\n')
+        self.assertEqual(stderr.getvalue(), 'ERROR\nCRITICAL\n')
+
+
 class TestTracerHandler(unittest.TestCase):
     @patch('pytracelog.logging.handlers.get_current_span')
     def test_emit(self, span_mock):
@@ -162,6 +303,43 @@ class TestTracerHandler(unittest.TestCase):
             attributes=TracerHandler().get_record_attrs(record=record_error)
         )
 
+    def test_handle_without_recording_span(self):
+        """
+        Проверка пропуска записей при отсутствии записываемого SPAN.
+        """
+        handler = TracerHandler()
+        record = logging.makeLogRecord(dict(msg='Test logging message', levelno=logging.ERROR))
+
+        with patch.object(handler, 'emit') as emit_mock:
+            self.assertFalse(handler.handle(record))
+
+            span = NonRecordingSpan(SpanContext(trace_id=1, span_id=1, is_remote=True))
+            with use_span(span):
+                self.assertFalse(handler.handle(record))
+
+            emit_mock.assert_not_called()
+
+        with use_span(TracerProvider().get_tracer(__name__).start_span('test')) as span:
+            handler.handle(record)
+        self.assertEqual(len(span.events), 1)
+
+    def test_wait_for_provider(self):
+        """
+        Проверка пропуска записей до установки глобального провайдера трассировки.
+        """
+        provider = TracerProvider()
+        handler = TracerHandler(wait_for_provider=True)
+        record = logging.makeLogRecord(dict(msg='Test logging message', levelno=logging.WARNING))
+
+        with use_span(provider.get_tracer(__name__).start_span('test')) as span:
+            with patch('opentelemetry.trace._TRACER_PROVIDER', None):
+                self.assertFalse(handler.handle(record))
+            with patch('opentelemetry.trace._TRACER_PROVIDER', provider):
+                handler.handle(record)
+
+        self.assertFalse(handler.wait_for_provider)
+        self.assertEqual(len(span.events), 1)
+
     def test_get_record_attrs(self):
         """
         Проверка формирования справочника атрибутов записи.
@@ -211,5 +389,145 @@ class TestTracerHandler(unittest.TestCase):
         )
 
 
+    def test_event_name(self):
+        """
+        Проверка наименования события: шаблон сообщения или сформированное сообщение.
+        """
+        record = logging.LogRecord('test', logging.WARNING, __file__, 1, 'message %s', ('arg',), None)
+
+        with use_span(TracerProvider().get_tracer(__name__).start_span('test')) as span:
+            TracerHandler().emit(record)
+            TracerHandler(event_name=EVENT_NAME_MESSAGE).emit(record)
+
+        template_event, message_event = span.events
+        self.assertEqual(template_event.name, 'message %s')
+        self.assertEqual(template_event.attributes[MESSAGE_ATTR], 'message arg')
+        self.assertEqual(message_event.name, 'message arg')
+        self.assertNotIn(MESSAGE_ATTR, message_event.attributes)
+
+        with self.assertRaises(ValueError):
+            TracerHandler(event_name='unknown')
+
+    def test_exception(self):
+        """
+        Проверка регистрации исключения записи (не обрабатываемого в момент вызова) с текстом исключения записи.
+        """
+        try:
+            raise ValueError('Test exception')
+        except ValueError:
+            exc_info = sys.exc_info()
+        record = logging.LogRecord('test', logging.ERROR, __file__, 1, 'Test logging message', (), exc_info)
+
+        with use_span(TracerProvider().get_tracer(__name__).start_span('test')) as span:
+            TracerHandler().emit(record)
+
+        event, = span.events
+        self.assertEqual(event.name, 'exception')
+        self.assertEqual(event.attributes['exception.type'], 'ValueError')
+        self.assertEqual(event.attributes['exception.message'], 'Test exception')
+        self.assertEqual(event.attributes['exception.escaped'], 'False')
+        self.assertIn('ValueError: Test exception', event.attributes['exception.stacktrace'])
+        self.assertEqual(event.attributes['exception.stacktrace'], logging.Formatter().formatException(exc_info))
+        self.assertIsNone(record.exc_text, 'Текст исключения записи формируют форматтеры')
+        self.assertEqual(event.attributes['original.message'], 'Test logging message')
+        self.assertIn(EXCEPTION_FINGERPRINT_ATTR, event.attributes)
+
+    def test_repeated_exception(self):
+        """
+        Проверка регистрации повторов исключения ссылкой на отпечаток и ограничения длины стека вызовов.
+        """
+        def make_record(message):
+            try:
+                raise ValueError(message)
+            except ValueError:
+                return logging.LogRecord('test', logging.ERROR, __file__, 1, 'Request failed', (), sys.exc_info())
+
+        handler = TracerHandler(exception_repeat_window=0.0, max_stacktrace_length=40)
+        tracer = TracerProvider().get_tracer(__name__)
+        with use_span(tracer.start_span('test')) as span:
+            for i in range(3):
+                handler.emit(make_record(f'attempt {i}'))
+        with use_span(tracer.start_span('test')) as other_span:
+            handler.emit(make_record('attempt 3'))
+
+        first, *repeats = span.events
+        self.assertEqual(len(first.attributes['exception.stacktrace']), 40)
+        self.assertTrue(first.attributes['exception.stacktrace'].endswith('ValueError: attempt 0'))
+        self.assertIn('original.message', first.attributes)
+        for repeat in repeats:
+            self.assertNotIn('exception.stacktrace', repeat.attributes)
+            self.assertNotIn('original.message', repeat.attributes)
+            self.assertEqual(
+                repeat.attributes[EXCEPTION_FINGERPRINT_ATTR], first.attributes[EXCEPTION_FINGERPRINT_ATTR]
+            )
+        self.assertEqual(repeats[1].attributes['exception.message'], 'attempt 2')
+        self.assertIn('exception.stacktrace', other_span.events[0].attributes, 'Первое исключение в SPAN')
+
+        stats = handler.stats()
+        self.assertEqual(stats['repeated_exceptions'], 2)
+        self.assertEqual((stats['traceback_cache_hits'], stats['traceback_cache_misses']), (3, 1))
+
+
+class TestTracerHandlerEventPolicy(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        Создание SPAN SDK (без экспорта).
+        """
+        self.span = TracerProvider().get_tracer(__name__).start_span('test')
+
+    def emit_records(self, handler, level, count):
+        with use_span(self.span):
+            for i in range(count):
+                handler.emit(
+                    record=logging.makeLogRecord(dict(msg=f'message {i}', levelno=level))
+                )
+
+    def test_event_level(self):
+        """
+        Проверка минимального уровня записи для создания события.
+        """
+        handler = TracerHandler(event_level='WARNING')
+        self.emit_records(handler, logging.INFO, 3)
+        self.emit_records(handler, logging.WARNING, 2)
+
+        self.assertEqual(len(self.span.events), 2)
+
+    def test_max_events_per_span(self):
+        """
+        Проверка ограничения количества событий в SPAN и учета отброшенных событий.
+        """
+        handler = TracerHandler(max_events_per_span=3)
+        self.emit_records(handler, logging.INFO, 5)
+
+        self.assertEqual(len(self.span.events), 3)
+        self.assertEqual(self.span.attributes[DROPPED_EVENTS_ATTR], 2)
+
+        # Записи уровня ERROR регистрируются всегда
+        self.emit_records(handler, logging.ERROR, 2)
+        self.assertEqual(len(self.span.events), 5)
+        self.assertEqual(self.span.attributes[DROPPED_EVENTS_ATTR], 2)
+
+    def test_sample_ratio(self):
+        """
+        Проверка выборки записей низкого уровня.
+        """
+        handler = TracerHandler(sample_ratio=0.0)
+        self.emit_records(handler, logging.INFO, 5)
+        self.emit_records(handler, logging.WARNING, 1)
+
+        self.assertEqual(len(self.span.events), 1, 'Записи уровня WARNING не подлежат выборке')
+        self.assertEqual(handler.dropped_events, 5)
+
+    def test_rate_limit(self):
+        """
+        Проверка ограничения частоты событий для записей низкого уровня.
+        """
+        handler = TracerHandler(rate_limit=2)
+        self.emit_records(handler, logging.DEBUG, 10)
+
+        self.assertLess(len(self.span.events), 10)
+        self.assertEqual(len(self.span.events) + self.span.attributes[DROPPED_EVENTS_ATTR], 10)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+
+# Модули, которые должны импортироваться только при инициализации соответствующих подсистем
+HEAVY_MODULES = (
+    'http.server',
+    'logstash_async',
+    'opentelemetry.exporter',
+    'opentelemetry.sdk',
+    'opentelemetry.instrumentation',
+    'pytracelog.metrics',
+    'socketserver',
+    'thrift',
+)
+
+
+class TestImportTime(unittest.TestCase):
+    def test_lazy_backends(self):
+        """
+        Проверка того, что импорт pytracelog не загружает Logstash, Jaeger, OpenTelemetry SDK, инструментацию
+        и сервер метрик.
+        """
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import pytracelog, pytracelog.base'],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+        # Формат строк: "import time: self [us] | cumulative | imported package"
+        imported = [
+            line.rsplit('|', 1)[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith('import time:')
+        ]
+        self.assertIn('pytracelog.base', imported)
+
+        heavy = [module for module in imported if module.startswith(HEAVY_MODULES)]
+        self.assertEqual(heavy, [], 'Тяжелые зависимости должны импортироваться в методах init_*')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import logging
+import unittest
+from unittest.mock import patch
+from wsgiref.util import setup_testing_defaults
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import (
+    SpanKind,
+    StatusCode,
+    get_current_span,
+)
+
+from pytracelog.base import PyTraceLog
+from pytracelog.integrations.falcon import (
+    TracingMiddleware,
+    REQUEST_ID_ATTR,
+)
+from pytracelog.logging.records import get_log_context
+
+try:
+    import falcon
+    import falcon.testing
+except ImportError:
+    falcon = None
+
+try:
+    import celery
+except ImportError:
+    celery = None
+
+
+TRACE_ID = '0af7651916cd43dd8448eb211c80319c'
+
+
+class FakeRequest:
+    """
+    Запрос с атрибутами, которые использует `TracingMiddleware` (вместо `falcon.Request`)
+    """
+    def __init__(self, path, headers=None):
+        self.env = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+        for name, value in (headers or dict()).items():
+            self.env['HTTP_' + name.upper().replace('-', '_')] = value
+        setup_testing_defaults(self.env)
+        self.path = path
+        self.method = 'GET'
+        self.uri_template = '/items/{item_id}'
+
+    def get_header(self, name):
+        return self.env.get('HTTP_' + name.upper().replace('-', '_'))
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+def make_provider():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider, exporter
+
+
+class TestTracingMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.provider, self.exporter = make_provider()
+        self.middleware = TracingMiddleware(excluded_paths=('/health', '/static/*'), tracer_provider=self.provider)
+
+    def request(self, path, status='200 OK', headers=None):
+        req, resp = FakeRequest(path, headers=headers), FakeResponse(status)
+        self.middleware.process_request(req, resp)
+        self.middleware.process_resource(req, resp, object(), dict())
+        state = (get_current_span(), dict(get_log_context()))
+        self.middleware.process_response(req, resp, object(), True)
+        return state
+
+    def test_request(self):
+        """
+        Проверка SPAN запроса, контекста трассировки из заголовков и идентификатора запроса.
+        """
+        span, log_context = self.request(
+            '/items/1', status='503 Service Unavailable',
+            headers={'traceparent': f'00-{TRACE_ID}-b7ad6b7169203331-01', 'X-Request-ID': 'req-1'}
+        )
+        self.assertEqual(log_context, {REQUEST_ID_ATTR: 'req-1'})
+        self.assertEqual(dict(get_log_context()), {}, 'Контекст логирования сброшен после запроса')
+        self.assertFalse(get_current_span().is_recording(), 'Контекст трассировки восстановлен после запроса')
+
+        finished, = self.exporter.get_finished_spans()
+        self.assertEqual(finished.context, span.get_span_context())
+        self.assertEqual(finished.name, 'GET /items/{item_id}')
+        self.assertEqual(finished.kind, SpanKind.SERVER)
+        self.assertEqual(format(finished.context.trace_id, '032x'), TRACE_ID)
+        self.assertEqual(finished.attributes['http.status_code'], 503)
+        self.assertEqual(finished.attributes['http.route'], '/items/{item_id}')
+        self.assertEqual(finished.status.status_code, StatusCode.ERROR)
+
+        _, log_context = self.request('/items/2', status=200)
+        self.assertEqual(len(log_context[REQUEST_ID_ATTR]), 32, 'Идентификатор запроса сформирован')
+        self.assertEqual(self.exporter.get_finished_spans()[-1].status.status_code, StatusCode.UNSET)
+
+    def test_excluded_paths(self):
+        """
+        Проверка пропуска исключенных путей.
+        """
+        for path in ('/health', '/health/', '/static/app.js'):
+            _, log_context = self.request(path)
+            self.assertEqual(log_context, {})
+        self.request('/healthz')
+        self.assertEqual(len(self.exporter.get_finished_spans()), 1)
+
+    def test_without_spans(self):
+        """
+        Проверка привязки идентификатора запроса без создания SPAN.
+        """
+        self.middleware = TracingMiddleware(create_spans=False, tracer_provider=self.provider)
+        span, log_context = self.request('/items/1', headers={'X-Request-ID': 'req-1'})
+        self.assertEqual(log_context, {REQUEST_ID_ATTR: 'req-1'})
+        self.assertFalse(span.is_recording())
+        self.assertEqual(self.exporter.get_finished_spans(), ())
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class IntegrationFixtures(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+        self.provider, self.exporter = make_provider()
+        provider_patch = patch('opentelemetry.trace._TRACER_PROVIDER', self.provider)
+        provider_patch.start()
+        self.addCleanup(provider_patch.stop)
+
+        self.handler = ListHandler()
+        self.logger = logging.getLogger('tests.integrations')
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+
+class FakeApp:
+    """
+    Приложение с порядком middleware Falcon 3: `add_middleware` добавляет middleware в конец списка
+    и пересобирает цепочку
+    """
+    def __init__(self, middleware=()):
+        self._unprepared_middleware = list(middleware)
+        self.middleware = list(middleware)
+
+    def add_middleware(self, middleware):
+        if middleware:
+            self._unprepared_middleware += middleware if isinstance(middleware, list) else [middleware]
+        self.middleware = list(self._unprepared_middleware)
+
+
+class TestInitFalconMiddleware(IntegrationFixtures):
+    def test_order(self):
+        """
+        Проверка установки middleware первым, до middleware приложения.
+        """
+        app_middleware = object()
+        app = FakeApp(middleware=[app_middleware])
+        PyTraceLog.init_falcon(app)
+        PyTraceLog.init_falcon(app)
+
+        self.assertEqual(len(app.middleware), 2)
+        self.assertIsInstance(app.middleware[0], TracingMiddleware)
+        self.assertIs(app.middleware[1], app_middleware)
+        self.assertTrue(app.middleware[0].create_spans)
+
+
+@unittest.skipIf(falcon is None, 'Falcon не установлен')
+class TestInitFalcon(IntegrationFixtures):
+    def test_init_falcon(self):
+        logger = self.logger
+
+        class Resource:
+            def on_get(self, req, resp, item_id):
+                logger.info('Получение %s', item_id)
+                resp.media = {'id': item_id}
+
+        class Middleware:
+            def process_request(self, req, resp):
+                if req.path.startswith('/items/'):
+                    logger.info('Middleware приложения')
+
+        app = falcon.App(middleware=[Middleware()])
+        app.add_route('/items/{item_id}', Resource())
+        app.add_route('/health', Resource())
+        PyTraceLog.init_falcon(app, excluded_paths=('/health',))
+        PyTraceLog.init_falcon(app)
+
+        client = falcon.testing.TestClient(app)
+        self.assertEqual(client.simulate_get('/items/1', headers={'X-Request-ID': 'req-1'}).status_code, 200)
+        client.simulate_get('/health')
+
+        span, = self.exporter.get_finished_spans()
+        self.assertEqual(span.name, 'GET /items/{item_id}')
+        self.assertEqual(
+            [r.request_id for r in self.handler.records], ['req-1', 'req-1'],
+            'Middleware PyTraceLog выполняется до middleware приложения'
+        )
+
+
+@unittest.skipIf(celery is None, 'Celery не установлен')
+class TestInitCelery(IntegrationFixtures):
+    def test_init_celery(self):
+        app = celery.Celery('tests', set_as_current=False)
+        app.conf.task_always_eager = True
+        logger = self.logger
+
+        @app.task(name='tests.add')
+        def add(x, y):
+            logger.info('Сложение')
+            return x + y
+
+        PyTraceLog.init_celery(app)
+        PyTraceLog.init_celery(app)
+        self.assertFalse(app.conf.worker_hijack_root_logger)
+
+        result = add.apply_async(args=(1, 2), task_id='task-1')
+        self.assertEqual(result.get(), 3)
+
+        record, = self.handler.records
+        self.assertEqual((record.task_id, record.task_name), ('task-1', 'tests.add'))
+        self.assertEqual(dict(get_log_context()), {})
+        self.assertIn('run/tests.add', [span.name for span in self.exporter.get_finished_spans()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import logging
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from pytracelog.base import PyTraceLog
+
+
+class TestLevels(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+    def test_set_levels(self):
+        """
+        Проверка установки уровней и сброса кэша `isEnabledFor`.
+        """
+        noisy = logging.getLogger('test.levels.noisy')
+        child = logging.getLogger('test.levels.noisy.child')
+        self.assertTrue(child.isEnabledFor(logging.WARNING))
+
+        PyTraceLog.set_levels({'test.levels.noisy': 'ERROR', 'root': logging.DEBUG})
+        self.assertEqual(noisy.level, logging.ERROR)
+        self.assertEqual(logging.root.level, logging.DEBUG)
+        self.assertFalse(child.isEnabledFor(logging.WARNING), 'Кэш isEnabledFor сброшен')
+        self.assertTrue(logging.getLogger('test.levels.other').isEnabledFor(logging.DEBUG))
+
+        # Логгеры, отсутствующие в новой настройке, возвращаются к исходному уровню
+        PyTraceLog.set_levels('test.levels.other=INFO')
+        self.assertEqual(noisy.level, logging.NOTSET)
+        self.assertEqual(logging.root.level, logging.WARNING)
+        self.assertTrue(child.isEnabledFor(logging.WARNING))
+        self.assertFalse(logging.getLogger('test.levels.other').isEnabledFor(logging.DEBUG))
+
+    def test_disabled_records_not_created(self):
+        """
+        Проверка того, что для отключенных уровней фабрики записей не вызываются.
+        """
+        calls = list()
+        PyTraceLog.extend_log_record(counter=lambda: calls.append(1))
+        PyTraceLog.set_levels({'root': 'DEBUG', 'test.levels.noisy': 'WARNING'})
+
+        with self.assertLogs('test.levels', logging.DEBUG):
+            logger = logging.getLogger('test.levels.noisy')
+            for _ in range(100):
+                logger.debug('Отладка')
+            logger.warning('Предупреждение')
+        self.assertEqual(len(calls), 1)
+
+    def test_parse(self):
+        levels = PyTraceLog.set_levels('# комментарий\nroot=info, test.levels.a=DEBUG\ntest.levels.b = 40\n')
+        self.assertEqual(levels, {'root': logging.INFO, 'test.levels.a': logging.DEBUG, 'test.levels.b': 40})
+
+        for value in ('test.levels.a', '=DEBUG', 'test.levels.a=LOUD'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                PyTraceLog.set_levels(value)
+
+    @patch.dict('pytracelog.base.environ', {'LOG_LEVELS': 'test.levels.env=CRITICAL'})
+    def test_env(self):
+        PyTraceLog.init_levels()
+        self.assertEqual(logging.getLogger('test.levels.env').level, logging.CRITICAL)
+
+    @unittest.skipUnless(hasattr(signal, 'SIGHUP'), 'SIGHUP не поддерживается')
+    def test_reload_on_signal(self):
+        """
+        Проверка перечитывания файла настройки по сигналу и сохранения уровней при ошибке в настройке.
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as levels_file:
+            levels_file.write('test.levels.reload=ERROR\n')
+        self.addCleanup(os.unlink, levels_file.name)
+
+        previous_handler = signal.getsignal(signal.SIGHUP)
+        PyTraceLog.init_levels(path=levels_file.name)
+        logger = logging.getLogger('test.levels.reload')
+        self.assertEqual(logger.level, logging.ERROR)
+
+        with open(levels_file.name, 'w') as file:
+            file.write('test.levels.reload=DEBUG\n')
+        os.kill(os.getpid(), signal.SIGHUP)
+        # Файл перечитывается фоновым потоком, а не обработчиком сигнала
+        deadline = time.monotonic() + 5
+        while logger.level != logging.DEBUG and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(logger.level, logging.DEBUG)
+        self.assertTrue(logger.isEnabledFor(logging.DEBUG))
+
+        with open(levels_file.name, 'w') as file:
+            file.write('test.levels.reload\n')
+        with self.assertLogs('pytracelog.base', logging.ERROR):
+            self.assertFalse(PyTraceLog.reload_levels())
+        self.assertEqual(logger.level, logging.DEBUG)
+
+        PyTraceLog.reset()
+        self.assertEqual(logger.level, logging.NOTSET)
+        self.assertIs(signal.getsignal(signal.SIGHUP), previous_handler)
+        self.assertFalse(any(thread.name == 'PyTraceLogLevelsReloader' for thread in threading.enumerate()))
+
+
+if __name__ == '__main__':
+    unittest.main()
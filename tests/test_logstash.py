@@ -0,0 +1,350 @@
+import json
+import logging
+import socket
+import socketserver
+import sys
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import (
+    closing,
+    redirect_stderr,
+)
+from io import StringIO
+from os import path
+from threading import (
+    Lock,
+    Thread,
+)
+from unittest.mock import patch
+
+from logstash_async.constants import constants
+from logstash_async.formatter import LogstashFormatter
+from logstash_async.handler import AsynchronousLogstashHandler
+from logstash_async.transport import (
+    HttpTransport,
+    UdpTransport,
+)
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.logstash import (
+    BoundedMemoryCache,
+    LogstashHandler,
+    LogstashJsonFormatter,
+    SpoolDatabaseCache,
+)
+from pytracelog.logging.queues import (
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+)
+
+
+class LogstashStandIn:
+    """
+    Локальный TCP сервер, принимающий события вместо Logstash (по одному JSON в строке)
+    """
+    def __init__(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.events = list()
+        self._lock = Lock()
+        self._server = None
+
+    def start(self):
+        stand_in = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    with stand_in._lock:
+                        stand_in.events.append(json.loads(line)['message'])
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def wait_for(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if len(self.events) >= count:
+                    return list(self.events)
+            time.sleep(0.02)
+        return list(self.events)
+
+
+def spool_size(spool_path):
+    if not path.exists(spool_path):
+        return 0
+    with closing(sqlite3.connect(spool_path)) as connection:
+        return connection.execute('SELECT COUNT(*) FROM `event`;').fetchone()[0]
+
+
+class TestLogstashSpool(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+
+        # Ошибки отправки фонового потока не выводим
+        worker_logger = logging.getLogger('LogProcessingWorker')
+        self.addCleanup(setattr, worker_logger, 'disabled', worker_logger.disabled)
+        worker_logger.disabled = True
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.spool_path = path.join(tmp_dir.name, 'spool.db')
+
+        self.logstash = LogstashStandIn()
+        self.logstash.start()
+        self.addCleanup(lambda: self.logstash._server and self.logstash.stop())
+
+        self.logger = logging.getLogger('test_logstash')
+        self.addCleanup(PyTraceLog.reset)
+
+    def init_logger(self):
+        with patch.dict('pytracelog.base.environ', {
+            'LOGSTASH_HOST': '127.0.0.1',
+            'LOGSTASH_PORT': str(self.logstash.port),
+            'LOGSTASH_SPOOL_PATH': self.spool_path,
+            'LOGSTASH_FLUSH_INTERVAL': '0.05',
+        }):
+            PyTraceLog.init_logstash_logger(level=logging.INFO)
+
+    def test_outage(self):
+        """
+        Проверка доставки событий, записанных во время недоступности Logstash.
+        """
+        self.init_logger()
+        for i in range(3):
+            self.logger.info('before-%s', i)
+        self.assertEqual(len(self.logstash.wait_for(3)), 3, 'События не доставлены в Logstash')
+
+        self.logstash.stop()
+        for i in range(3):
+            self.logger.info('during-%s', i)
+
+        # Дожидаемся неудачной попытки отправки: события остаются в файле буфера
+        deadline = time.monotonic() + 10
+        while spool_size(self.spool_path) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(spool_size(self.spool_path), 3, 'События должны сохраняться в файле буфера')
+
+        self.logstash.start()
+        self.logger.info('after')
+        self.assertEqual(
+            self.logstash.wait_for(7),
+            ['before-0', 'before-1', 'before-2', 'during-0', 'during-1', 'during-2', 'after'],
+            'События, записанные во время недоступности Logstash, должны быть доставлены по порядку'
+        )
+
+    def test_replay_on_startup(self):
+        """
+        Проверка отправки событий, оставшихся в файле буфера от предыдущего запуска.
+        """
+        self.logstash.stop()
+        self.init_logger()
+        self.logger.info('pending-0')
+        self.logger.info('pending-1')
+        # Остановка процесса: события, которые не удалось отправить, остаются в файле буфера
+        with redirect_stderr(StringIO()):
+            PyTraceLog.reset()
+        self.assertEqual(spool_size(self.spool_path), 2)
+
+        self.logstash.start()
+        self.init_logger()
+        self.assertEqual(
+            self.logstash.wait_for(2), ['pending-0', 'pending-1'],
+            'События из файла буфера должны отправляться при запуске без новых записей'
+        )
+
+
+class TestLogstashOptions(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+        self.constants = self.get_constants()
+
+    @staticmethod
+    def get_constants():
+        return {
+            name: getattr(constants, name)
+            for name in ('QUEUE_CHECK_INTERVAL', 'QUEUED_EVENTS_FLUSH_INTERVAL', 'QUEUED_EVENTS_FLUSH_COUNT',
+                         'QUEUED_EVENTS_BATCH_SIZE', 'SOCKET_TIMEOUT')
+        }
+
+    def get_handler(self):
+        return next(h for h in PyTraceLog._handlers if isinstance(h, LogstashHandler))
+
+    @patch.dict('pytracelog.base.environ', {
+        'LOGSTASH_HOST': '127.0.0.1',
+        'LOGSTASH_TRANSPORT': 'udp',
+        'LOGSTASH_BATCH_SIZE': '500',
+        'LOGSTASH_FLUSH_INTERVAL': '0.5',
+        'LOGSTASH_SOCKET_TIMEOUT': '1.5',
+    })
+    def test_env(self):
+        """
+        Проверка настройки отправки переменными окружения.
+        """
+        PyTraceLog.init_logstash_logger()
+        self.assertIsInstance(self.get_handler()._transport, UdpTransport)
+        handler = self.get_handler()
+        self.assertEqual(handler.batch_size, 500)
+        self.assertEqual(handler.flush_count, 500, 'По умолчанию отправка по размеру пакета')
+        self.assertEqual(handler.flush_interval, 0.5)
+        self.assertEqual(handler._transport._timeout, 1.5)
+        self.assertEqual(self.get_constants(), self.constants, 'Параметры logstash_async не изменяются')
+
+        handler._start_worker_thread()
+        worker = AsynchronousLogstashHandler._worker_thread
+        self.assertEqual((worker._batch_size, worker._flush_count, worker._flush_interval), (500, 500, 0.5))
+        deadline = time.monotonic() + 10
+        while worker._database is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(worker._database.batch_size, 500)
+
+    @patch.dict('pytracelog.base.environ', {
+        'LOGSTASH_HOST': '127.0.0.1',
+        'LOGSTASH_BATCH_SIZE': '500',
+        'LOGSTASH_SSL_VERIFY': 'false',
+        'LOGSTASH_USERNAME': 'user',
+    })
+    def test_arguments(self):
+        """
+        Проверка приоритета явно заданных параметров над переменными окружения.
+        """
+        PyTraceLog.init_logstash_logger(transport='http', ssl_enable=True, batch_size=100, flush_count=10)
+        transport = self.get_handler()._transport
+        self.assertIsInstance(transport, HttpTransport)
+        self.assertTrue(transport._ssl_enable)
+        self.assertFalse(transport._ssl_verify)
+        self.assertEqual(transport._username, 'user')
+        self.assertEqual((self.get_handler().batch_size, self.get_handler().flush_count), (100, 10))
+        self.assertEqual(self.get_constants(), self.constants, 'Параметры logstash_async не изменяются')
+
+
+class TestLogstashJsonFormatter(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+        self.legacy = LogstashFormatter(message_type='python', extra_prefix=None, metadata={'beat': 'index'})
+
+    def make_formatters(self, **kwargs):
+        return [
+            LogstashJsonFormatter(message_type='python', metadata={'beat': 'index'}, use_orjson=use_orjson, **kwargs)
+            for use_orjson in (True, False)
+        ]
+
+    def make_record(self, **extra):
+        record = logging.getLogRecordFactory()(
+            'test.logger', logging.WARNING, __file__, 10, 'Сообщение %s', ('arg',), None, func='test'
+        )
+        record.__dict__.update(extra)
+        return record
+
+    def assert_same_event(self, record, **kwargs):
+        expected = json.loads(self.legacy.format(record))
+        for formatter in self.make_formatters(**kwargs):
+            with self.subTest(formatter=formatter._dumps):
+                self.assertEqual(json.loads(formatter.format(record)), expected)
+        return expected
+
+    def test_same_event(self):
+        """
+        Проверка совпадения события с событием LogstashFormatter.
+        """
+        self.assert_same_event(self.make_record())
+        self.assert_same_event(self.make_record(
+            user='user', count=10, ratio=0.5, flag=True, empty=None, items=(1, 'a'), data={'key': [1, 2]}
+        ))
+
+    def test_exception(self):
+        try:
+            raise ValueError('Ошибка')
+        except ValueError:
+            record = self.make_record(exc_info=sys.exc_info())
+        self.assertIn('ValueError', self.assert_same_event(record)['stack_trace'])
+
+    def test_record_factory_attrs(self):
+        """
+        Проверка статических атрибутов фабрики записей, в том числе переопределенных атрибутами контекста.
+        """
+        PyTraceLog.extend_log_record(service='test', version=2)
+        self.assertEqual(self.assert_same_event(self.make_record())['service'], 'test')
+
+        with PyTraceLog.log_context(service='context'):
+            self.assertEqual(self.assert_same_event(self.make_record())['service'], 'context')
+
+        PyTraceLog.extend_log_record(service='changed')
+        self.assertEqual(self.assert_same_event(self.make_record())['service'], 'changed')
+
+    def test_reserved_attrs(self):
+        """
+        Проверка атрибута записи, совпадающего с полем верхнего уровня события.
+        """
+        self.assertEqual(self.assert_same_event(self.make_record(host='other'))['host'], 'other')
+
+    def test_fields(self):
+        """
+        Проверка списка разрешенных дополнительных атрибутов.
+        """
+        record = self.make_record(user='user', secret='secret')
+        for formatter in self.make_formatters(fields=['user']):
+            event = json.loads(formatter.format(record))
+            self.assertEqual(event['user'], 'user')
+            self.assertNotIn('secret', event)
+            self.assertEqual(event['message'], 'Сообщение arg')
+
+
+class TestSpoolEviction(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.spool_path = path.join(tmp_dir.name, 'spool.db')
+
+    def queued_events(self, cache):
+        return [event['event_text'] for event in cache.get_queued_events()]
+
+    def test_database_drop_oldest(self):
+        cache = SpoolDatabaseCache(path=self.spool_path, max_events=3, eviction_policy=OVERFLOW_DROP_OLDEST)
+        cache.open_spool()
+        for i in range(5):
+            cache.add_event(f'event-{i}')
+        self.assertEqual(self.queued_events(cache), ['event-2', 'event-3', 'event-4'])
+        self.assertEqual(cache.evicted, 2)
+
+        # Счетчик восстанавливается при повторном открытии файла
+        self.assertEqual(SpoolDatabaseCache(path=self.spool_path).open_spool(), 3)
+
+    def test_database_drop_newest(self):
+        cache = SpoolDatabaseCache(path=self.spool_path, max_events=3, eviction_policy=OVERFLOW_DROP_NEWEST)
+        cache.open_spool()
+        for i in range(5):
+            cache.add_event(f'event-{i}')
+        self.assertEqual(self.queued_events(cache), ['event-0', 'event-1', 'event-2'])
+        self.assertEqual(cache.evicted, 2)
+
+        cache.delete_queued_events()
+        self.assertEqual(cache.event_count, 0)
+
+    def test_memory_drop_oldest(self):
+        cache = BoundedMemoryCache(cache=dict(), max_events=3, eviction_policy=OVERFLOW_DROP_OLDEST)
+        for i in range(5):
+            cache.add_event(f'event-{i}')
+        self.assertEqual(self.queued_events(cache), ['event-2', 'event-3', 'event-4'])
+        self.assertEqual(cache.evicted, 2)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            SpoolDatabaseCache(path=self.spool_path, eviction_policy='unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import logging
+import sys
+import unittest
+from io import StringIO
+from threading import Thread
+from urllib.request import urlopen
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.handlers import StdoutHandler
+from pytracelog.metrics import (
+    HandlerMetrics,
+    LATENCY_BUCKETS,
+    render_prometheus,
+)
+
+
+def make_record(levelno=logging.INFO):
+    return logging.makeLogRecord(dict(msg='Test logging message', levelno=levelno))
+
+
+class TestHandlerMetrics(unittest.TestCase):
+    def test_counters(self):
+        """
+        Проверка счетчиков и гистограммы, обновляемых из нескольких потоков.
+        """
+        handler = logging.StreamHandler(StringIO())
+        handler.addFilter(lambda record: record.levelno >= logging.WARNING)
+        metrics = HandlerMetrics(handler=handler)
+        metrics.install()
+
+        def log():
+            for levelno in (logging.INFO, logging.ERROR) * 50:
+                handler.handle(make_record(levelno=levelno))
+
+        threads = [Thread(target=log) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['calls'], 400)
+        self.assertEqual(snapshot['handled'], 200, 'Записи, не прошедшие фильтр, не обработаны')
+        self.assertGreater(snapshot['time_ns'], 0)
+        latency = snapshot['latency_ns']
+        self.assertEqual(list(latency), list(LATENCY_BUCKETS) + [None])
+        self.assertEqual(latency[None], 400)
+        self.assertEqual(list(latency.values()), sorted(latency.values()), 'Гистограмма накопительная')
+
+        metrics.uninstall()
+        self.assertNotIn('handle', handler.__dict__)
+        handler.handle(make_record())
+        self.assertEqual(metrics.snapshot()['calls'], 400)
+
+    def test_thread_exit(self):
+        """
+        Проверка переноса счетчиков завершенных потоков в общие счетчики.
+        """
+        handler = logging.StreamHandler(StringIO())
+        metrics = HandlerMetrics(handler=handler)
+        metrics.install()
+        self.addCleanup(metrics.uninstall)
+
+        for _ in range(10):
+            thread = Thread(target=lambda: [handler.handle(make_record()) for _ in range(5)])
+            thread.start()
+            thread.join()
+        handler.handle(make_record())
+
+        self.assertEqual(len(metrics._cells), 1, 'Ячейки завершенных потоков удаляются')
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['calls'], 51)
+        self.assertEqual(snapshot['latency_ns'][None], 51)
+
+        metrics.reinit_after_fork()
+        self.assertEqual(metrics.snapshot()['calls'], 0)
+
+    def test_render_prometheus(self):
+        text = render_prometheus({
+            'handlers': {
+                'StdoutHandler': {
+                    'calls': 3, 'handled': 2, 'time_ns': 1500, 'latency_ns': {1000: 2, None: 3}, 'pending': 1,
+                },
+            },
+            'spans': {'dropped': 4},
+        })
+        lines = text.splitlines()
+        self.assertIn('# TYPE pytracelog_handler_seconds histogram', lines)
+        self.assertIn('pytracelog_handler_seconds_bucket{handler="StdoutHandler",le="1e-06"} 2', lines)
+        self.assertIn('pytracelog_handler_seconds_bucket{handler="StdoutHandler",le="+Inf"} 3', lines)
+        self.assertIn('pytracelog_handler_seconds_count{handler="StdoutHandler"} 3', lines)
+        self.assertIn('pytracelog_handler_seconds_sum{handler="StdoutHandler"} 1.5e-06', lines)
+        self.assertIn('pytracelog_handler_pending{handler="StdoutHandler"} 1', lines)
+        self.assertIn('pytracelog_spans_dropped 4', lines)
+        self.assertEqual(lines.count('# TYPE pytracelog_handler_seconds histogram'), 1)
+
+
+class TestPyTraceLogStats(unittest.TestCase):
+    def setUp(self):
+        PyTraceLog.reset()
+        self.addCleanup(PyTraceLog.reset)
+
+    def test_stats(self):
+        PyTraceLog.init_root_logger(level='INFO', queue_size=100)
+        stdout_handler = PyTraceLog._handlers[0].handlers[0]
+        stdout_handler.setStream(StringIO())
+        self.addCleanup(stdout_handler.setStream, sys.stdout)
+        PyTraceLog.init_metrics()
+        PyTraceLog.init_tracer_logger()
+
+        for _ in range(5):
+            logging.info('Test logging message')
+        PyTraceLog._handlers[0].flush()
+
+        stats = PyTraceLog.stats()
+        self.assertEqual(list(stats['handlers']), ['BufferedQueueHandler', 'TracerHandler'])
+        queue_stats = stats['handlers']['BufferedQueueHandler']
+        self.assertEqual((queue_stats['calls'], queue_stats['queued'], queue_stats['written']), (5, 5, 5))
+        tracer_stats = stats['handlers']['TracerHandler']
+        self.assertEqual(
+            (tracer_stats['dropped_events'], tracer_stats['calls'], tracer_stats['handled']), (0, 5, 0),
+            'Трассировка не инициализирована'
+        )
+        self.assertEqual(stats['spans'], {})
+
+        PyTraceLog.reset()
+        self.assertFalse(any('handle' in h.__dict__ for h in (stdout_handler,)))
+
+    def test_duplicate_names(self):
+        PyTraceLog.init_root_logger(level='INFO')
+        PyTraceLog.init_metrics()
+        self.assertEqual(list(PyTraceLog.stats()['handlers']), ['StdoutHandler', 'StderrHandler'])
+
+        PyTraceLog._add_handler(handler=StdoutHandler(stream=StringIO()), level='INFO')
+        self.assertEqual(list(PyTraceLog.stats()['handlers']), ['StdoutHandler', 'StderrHandler', 'StdoutHandler#2'])
+
+    def test_root_logger_later(self):
+        """
+        Проверка метрик вывода в stdout и stderr, инициализированного после включения метрик.
+        """
+        PyTraceLog.init_metrics()
+        PyTraceLog.init_root_logger(level='INFO')
+        stdout_handler = PyTraceLog._handlers[0]
+        stdout_handler.setStream(StringIO())
+        self.addCleanup(stdout_handler.setStream, sys.stdout)
+
+        logging.info('Test logging message')
+        stats = PyTraceLog.stats()['handlers']
+        self.assertEqual(list(stats), ['StdoutHandler', 'StderrHandler'])
+        self.assertEqual((stats['StdoutHandler']['calls'], stats['StderrHandler']['calls']), (1, 1))
+
+    def test_prometheus_endpoint(self):
+        PyTraceLog.init_root_logger(level='INFO')
+        for handler in PyTraceLog._handlers:
+            handler.setStream(StringIO())
+        self.addCleanup(PyTraceLog._handlers[0].setStream, sys.stdout)
+        self.addCleanup(PyTraceLog._handlers[1].setStream, sys.stderr)
+        PyTraceLog.init_metrics(port=0, addr='127.0.0.1')
+
+        logging.warning('Test logging message')
+        with urlopen(f'http://127.0.0.1:{PyTraceLog._metrics_server.port}/metrics', timeout=5) as response:
+            self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+            text = response.read().decode('utf-8')
+        self.assertIn('pytracelog_handler_calls{handler="StdoutHandler"} 1', text)
+        self.assertIn('pytracelog_handler_handled{handler="StderrHandler"} 0', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
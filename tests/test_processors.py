@@ -0,0 +1,235 @@
+import unittest
+from threading import Event
+from unittest.mock import patch
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    SimpleSpanProcessor,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import (
+    Status,
+    StatusCode,
+    set_span_in_context,
+)
+
+from pytracelog.base import PyTraceLog
+from pytracelog.tracing.processors import (
+    CountingBatchSpanProcessor,
+    TailSamplingSpanProcessor,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class GatedExporter(InMemorySpanExporter):
+    """
+    Экспорт блокируется до установки события (имитация медленного коллектора)
+    """
+    def __init__(self, result=SpanExportResult.SUCCESS):
+        super().__init__()
+        self.gate = Event()
+        self.entered = Event()
+        self.result = result
+
+    def export(self, spans):
+        self.entered.set()
+        self.gate.wait(timeout=5)
+        super().export(spans)
+        return self.result
+
+
+class TestCountingBatchSpanProcessor(unittest.TestCase):
+    def make_tracer(self, exporter, **kwargs):
+        processor = CountingBatchSpanProcessor(span_exporter=exporter, **kwargs)
+        self.addCleanup(processor.shutdown)
+        provider = TracerProvider()
+        provider.add_span_processor(processor)
+        return processor, provider.get_tracer(__name__)
+
+    def test_dropped(self):
+        """
+        Проверка подсчета SPAN, вытесненных из заполненной очереди.
+        """
+        exporter = GatedExporter()
+        processor, tracer = self.make_tracer(
+            exporter, max_queue_size=4, max_export_batch_size=1, schedule_delay_millis=10
+        )
+        # Занимаем поток экспорта первым SPAN
+        tracer.start_span('first').end()
+        self.assertTrue(exporter.entered.wait(timeout=5))
+
+        with self.assertLogs('opentelemetry.sdk.trace.export', 'WARNING'):
+            for i in range(10):
+                tracer.start_span(f'span-{i}').end()
+        self.assertEqual(processor.stats()['dropped'], 6)
+
+        exporter.gate.set()
+        processor.force_flush()
+        stats = processor.stats()
+        self.assertEqual(stats['exported'], 5)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(
+            [span.name for span in exporter.get_finished_spans()],
+            ['first', 'span-6', 'span-7', 'span-8', 'span-9'],
+            'Из заполненной очереди вытесняются самые старые SPAN'
+        )
+
+    def test_failed(self):
+        """
+        Проверка подсчета SPAN, не экспортированных из-за ошибки.
+        """
+        exporter = GatedExporter(result=SpanExportResult.FAILURE)
+        exporter.gate.set()
+        processor, tracer = self.make_tracer(exporter)
+        for i in range(3):
+            tracer.start_span(f'span-{i}').end()
+        processor.force_flush()
+        self.assertEqual(processor.stats()['failed'], 3)
+        self.assertEqual(processor.stats()['exported'], 0)
+
+
+class TestTailSamplingSpanProcessor(unittest.TestCase):
+    def make_tracer(self, **kwargs):
+        self.exporter = InMemorySpanExporter()
+        self.clock = FakeClock()
+        processor = TailSamplingSpanProcessor(
+            span_processor=SimpleSpanProcessor(self.exporter),
+            latency_threshold_millis=100,
+            clock=self.clock,
+            **kwargs
+        )
+        provider = TracerProvider()
+        provider.add_span_processor(processor)
+        self.addCleanup(provider.shutdown)
+        return processor, provider.get_tracer(__name__)
+
+    def run_trace(self, tracer, name, child_millis=1, error=False, end_root=True):
+        root = tracer.start_span(name, start_time=0)
+        child = tracer.start_span(f'{name}.child', context=set_span_in_context(root), start_time=0)
+        if error:
+            child.set_status(Status(StatusCode.ERROR))
+        child.end(end_time=int(child_millis * 1e6))
+        if end_root:
+            root.end(end_time=int(child_millis * 1e6))
+        return root
+
+    def exported(self):
+        return sorted(span.name for span in self.exporter.get_finished_spans())
+
+    def test_decisions(self):
+        """
+        Проверка сохранения трассировок с ошибками и медленных трассировок.
+        """
+        processor, tracer = self.make_tracer(sample_ratio=0.0)
+        self.run_trace(tracer, 'error', error=True)
+        self.run_trace(tracer, 'fast')
+        self.run_trace(tracer, 'slow', child_millis=150)
+
+        self.assertEqual(self.exported(), ['error', 'error.child', 'slow', 'slow.child'])
+        stats = processor.stats()
+        self.assertEqual((stats['tail_kept'], stats['tail_dropped'], stats['tail_buffered']), (2, 1, 0))
+
+    def test_ratio(self):
+        processor, tracer = self.make_tracer(sample_ratio=1.0)
+        self.run_trace(tracer, 'fast')
+        self.assertEqual(self.exported(), ['fast', 'fast.child'])
+
+        with self.assertRaises(ValueError):
+            self.make_tracer(sample_ratio=1.5)
+
+    def test_late_span(self):
+        """
+        Проверка обработки SPAN, завершенного после корневого, в соответствии с решением по трассировке.
+        """
+        processor, tracer = self.make_tracer(sample_ratio=0.0)
+        for name, error in (('kept', True), ('dropped', False)):
+            root = self.run_trace(tracer, name, error=error)
+            tracer.start_span(f'{name}.late', context=set_span_in_context(root)).end()
+
+        self.assertEqual(self.exported(), ['kept', 'kept.child', 'kept.late'])
+        self.assertEqual(processor.stats()['tail_late'], 2)
+
+    def test_memory_limit(self):
+        """
+        Проверка ограничения количества SPAN в буфере: вытесненные трассировки обрабатываются по полученным SPAN.
+        """
+        processor, tracer = self.make_tracer(sample_ratio=0.0, max_spans=10)
+        for index in range(20):
+            self.run_trace(tracer, f'trace-{index:02}', error=index == 0, end_root=False)
+            self.assertLessEqual(processor.stats()['tail_buffered'], 10)
+
+        self.assertEqual(processor.stats()['tail_evicted'], 10)
+        self.assertEqual(self.exported(), ['trace-00.child'])
+
+    def test_ttl(self):
+        processor, tracer = self.make_tracer(sample_ratio=0.0, trace_ttl_millis=1000)
+        self.run_trace(tracer, 'expired', error=True, end_root=False)
+        self.clock.now += 2.0
+        self.run_trace(tracer, 'fast')
+
+        self.assertEqual(self.exported(), ['expired.child'])
+        self.assertEqual(processor.stats()['tail_evicted'], 1)
+
+    def test_shutdown(self):
+        processor, tracer = self.make_tracer(sample_ratio=0.0)
+        self.run_trace(tracer, 'pending', error=True, end_root=False)
+        processor.shutdown()
+        self.assertEqual(self.exported(), ['pending.child'])
+
+
+class TestInitTracer(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, PyTraceLog, '_span_processor', None)
+        self.addCleanup(PyTraceLog.reset)
+
+    @patch('opentelemetry.trace.set_tracer_provider')
+    @patch.dict('pytracelog.base.environ', {
+        'OTEL_EXPORTER_JAEGER_ENDPOINT': 'http://localhost:14268/api/traces',
+        'OTEL_BSP_MAX_QUEUE_SIZE': '4096',
+    })
+    def test_collector(self, set_tracer_provider):
+        """
+        Проверка экспорта через коллектор и параметров пакетной отправки.
+        """
+        PyTraceLog.init_tracer(service='test', max_export_batch_size=1024, export_timeout_millis=2500)
+        provider = set_tracer_provider.call_args.kwargs['tracer_provider']
+        self.addCleanup(provider.shutdown)
+
+        processor = PyTraceLog._span_processor
+        self.assertIsInstance(processor, CountingBatchSpanProcessor)
+        self.assertEqual(processor.max_queue_size, 4096, 'Не заданные параметры берутся из OTEL_BSP_*')
+        self.assertEqual(processor.max_export_batch_size, 1024)
+        self.assertEqual(processor.span_exporter.collector_endpoint, 'http://localhost:14268/api/traces')
+        self.assertEqual(processor.span_exporter._timeout, 3)
+        self.assertEqual(PyTraceLog.get_span_stats()['dropped'], 0)
+
+    @patch('opentelemetry.trace.set_tracer_provider')
+    @patch.dict('pytracelog.base.environ', {'OTEL_EXPORTER_JAEGER_AGENT_HOST': 'localhost'})
+    def test_tail_sampling(self, set_tracer_provider):
+        PyTraceLog.init_tracer(service='test', tail_sampling=True, tail_sample_ratio=0.5)
+        provider = set_tracer_provider.call_args.kwargs['tracer_provider']
+        self.addCleanup(provider.shutdown)
+
+        processor = PyTraceLog._span_processor
+        self.assertIsInstance(processor, TailSamplingSpanProcessor)
+        self.assertIsInstance(processor.span_processor, CountingBatchSpanProcessor)
+        self.assertEqual(processor.sample_ratio, 0.5)
+        self.assertEqual(PyTraceLog.get_span_stats()['tail_kept'], 0)
+        self.assertEqual(PyTraceLog.get_span_stats()['dropped'], 0)
+
+    @patch.dict('pytracelog.base.environ', {}, clear=True)
+    def test_disabled(self):
+        PyTraceLog.init_tracer(service='test')
+        self.assertEqual(PyTraceLog.get_span_stats(), dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
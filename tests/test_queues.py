@@ -0,0 +1,161 @@
+import logging
+import unittest
+from io import StringIO
+from threading import Event
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.handlers import StdoutHandler, StderrHandler
+from pytracelog.logging.queues import (
+    BufferedQueueHandler,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_SAMPLE,
+)
+
+
+class GatedStream(StringIO):
+    """
+    Поток, первая запись в который блокируется до установки события.
+    Позволяет детерминированно заполнить очередь, пока фоновый поток занят.
+    """
+    def __init__(self):
+        super().__init__()
+        self.gate = Event()
+        self.entered = Event()
+        self.writes = 0
+
+    def write(self, s):
+        self.entered.set()
+        self.gate.wait(timeout=5)
+        self.writes += 1
+        return super().write(s)
+
+
+def make_record(msg, level=logging.INFO):
+    return logging.makeLogRecord(dict(msg=msg, levelno=level, levelname=logging.getLevelName(level)))
+
+
+class TestBufferedQueueHandler(unittest.TestCase):
+    def make_handler(self, **kwargs):
+        self.stream = GatedStream()
+        handler = BufferedQueueHandler(handlers=[StdoutHandler(stream=self.stream)], **kwargs)
+        self.addCleanup(handler.close)
+
+        # Занимаем фоновый поток первой записью
+        handler.handle(make_record('first'))
+        self.assertTrue(self.stream.entered.wait(timeout=5), 'Фоновый поток не начал вывод записи')
+        return handler
+
+    def test_drop_newest(self):
+        """
+        Проверка отбрасывания новых записей при заполненной очереди.
+        """
+        handler = self.make_handler(queue_size=3, overflow_policy=OVERFLOW_DROP_NEWEST)
+        for i in range(5):
+            handler.handle(make_record(f'record-{i}'))
+        self.stream.gate.set()
+        handler.flush()
+
+        output = self.stream.getvalue()
+        self.assertIn('record-2', output)
+        self.assertNotIn('record-3', output, 'Новые записи должны отбрасываться')
+        self.assertEqual(handler.stats()['dropped'], 2)
+        self.assertEqual(handler.stats()['queued'], 4)
+        self.assertEqual(handler.stats()['written'], 4)
+
+    def test_drop_oldest(self):
+        """
+        Проверка вытеснения самых старых записей при заполненной очереди.
+        """
+        handler = self.make_handler(queue_size=3, overflow_policy=OVERFLOW_DROP_OLDEST)
+        for i in range(5):
+            handler.handle(make_record(f'record-{i}'))
+        self.stream.gate.set()
+        handler.flush()
+
+        output = self.stream.getvalue()
+        self.assertNotIn('record-1', output, 'Старые записи должны вытесняться')
+        self.assertIn('record-4', output)
+        self.assertEqual(handler.stats()['dropped'], 2)
+
+    def test_sample_keeps_errors(self):
+        """
+        Проверка сохранения записей уровня ERROR при выборочной политике.
+        """
+        handler = self.make_handler(queue_size=2, overflow_policy=OVERFLOW_SAMPLE, sample_rate=1000)
+        for i in range(4):
+            handler.handle(make_record(f'info-{i}'))
+        handler.handle(make_record('error-record', level=logging.ERROR))
+        self.stream.gate.set()
+        handler.flush()
+
+        self.assertNotIn('info-3', self.stream.getvalue())
+        self.assertNotIn('error-record', self.stream.getvalue(), 'Запись ERROR фильтруется StdoutHandler')
+        self.assertEqual(handler.stats()['dropped'], 3)
+        self.assertEqual(handler.stats()['written'], 3)
+
+    def test_batch_write(self):
+        """
+        Проверка вывода накопленных записей одним вызовом write().
+        """
+        handler = self.make_handler(queue_size=100)
+        for i in range(10):
+            handler.handle(make_record(f'record-{i}'))
+        self.stream.gate.set()
+        handler.flush()
+
+        self.assertEqual(self.stream.writes, 2, 'Накопленные записи выводятся одним пакетом')
+        self.assertEqual(self.stream.getvalue().count('\n'), 11)
+
+    def test_close_drains_queue(self):
+        """
+        Проверка вывода оставшихся записей при закрытии обработчика.
+        """
+        handler = self.make_handler(queue_size=100)
+        for i in range(10):
+            handler.handle(make_record(f'record-{i}'))
+        self.stream.gate.set()
+        handler.close()
+
+        self.assertIn('record-9', self.stream.getvalue())
+        self.assertEqual(handler.stats()['pending'], 0)
+
+    def test_unknown_policy(self):
+        """
+        Проверка контроля политики переполнения.
+        """
+        with self.assertRaises(ValueError):
+            BufferedQueueHandler(handlers=[], overflow_policy='unknown')
+
+
+class TestQueuedRootLogger(unittest.TestCase):
+    def tearDown(self) -> None:
+        PyTraceLog.reset()
+
+    def test_init_root_logger_queue(self):
+        """
+        Проверка инициализации root логгера с очередью записей.
+        """
+        PyTraceLog.init_root_logger(queue_size=100)
+        self.assertEqual(len(logging.root.handlers), 1)
+
+        handler = logging.root.handlers[0]
+        self.assertIsInstance(handler, BufferedQueueHandler)
+        self.assertTrue(any(isinstance(h, StdoutHandler) for h in handler.handlers))
+        self.assertTrue(any(isinstance(h, StderrHandler) for h in handler.handlers))
+
+        stdout, stderr = StringIO(), StringIO()
+        for target, stream in zip(handler.handlers, (stdout, stderr)):
+            target.setStream(stream)
+
+        logging.warning('warning message')
+        logging.error('error message')
+        PyTraceLog.reset()
+
+        self.assertEqual(stdout.getvalue(), 'WARNING:root:warning message\n')
+        self.assertEqual(stderr.getvalue(), 'ERROR:root:error message\n')
+        self.assertEqual(len(logging.root.handlers), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import pickle
+import unittest
+from contextvars import ContextVar
+from itertools import count
+from logging.handlers import QueueHandler
+from queue import SimpleQueue
+from threading import Lock
+
+from logstash_async.formatter import LogstashFormatter
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import use_span
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.handlers import TracerHandler
+from pytracelog.logging.records import (
+    CachedLogRecord,
+    LogContext,
+    RecordFactory,
+    bind_log_context,
+    get_log_context,
+    reset_log_context,
+)
+
+
+class TestRecordFactory(unittest.TestCase):
+    def test_static_and_dynamic_attrs(self):
+        """
+        Проверка добавления статических и динамических атрибутов.
+        """
+        counter = count()
+        request_id = ContextVar('request_id')
+
+        factory = RecordFactory(base_factory=logging.LogRecord)
+        factory.extend(app_name='my_app', seq=lambda: next(counter), request_id=request_id)
+
+        record = factory('test', logging.INFO, __file__, 1, 'message', (), None)
+        self.assertEqual(record.app_name, 'my_app')
+        self.assertEqual(record.seq, 0)
+        self.assertIsNone(record.request_id, 'Значение ContextVar по умолчанию - None')
+
+        request_id.set('42')
+        record = factory('test', logging.INFO, __file__, 1, 'message', (), None)
+        self.assertEqual(record.seq, 1, 'Вызываемый объект вычисляется для каждой записи')
+        self.assertEqual(record.request_id, '42')
+
+    def test_override(self):
+        """
+        Проверка замены статического атрибута динамическим и наоборот.
+        """
+        factory = RecordFactory(base_factory=logging.LogRecord)
+        factory.extend(attr='static')
+        factory.extend(attr=lambda: 'dynamic')
+        self.assertEqual(factory.static_attrs, {})
+
+        factory.extend(attr='static')
+        self.assertEqual(factory.dynamic_attrs, ())
+        self.assertEqual(factory.static_attrs, {'attr': 'static'})
+
+
+class TestCachedLogRecord(unittest.TestCase):
+    def test_message_cache(self):
+        """
+        Проверка однократного формирования сообщения и сброса кэша при замене шаблона.
+        """
+        class Arg:
+            calls = 0
+
+            def __str__(self):
+                Arg.calls += 1
+                return 'arg'
+
+        factory = RecordFactory(base_factory=logging.LogRecord)
+        record = factory('test', logging.INFO, __file__, 1, 'message %s', (Arg(),), None)
+        self.assertIsInstance(record, CachedLogRecord)
+        self.assertEqual(record.getMessage(), 'message arg')
+        self.assertEqual(record.getMessage(), 'message arg')
+        self.assertEqual(Arg.calls, 1)
+        self.assertNotIn('_message', record.__dict__, 'Кэш не попадает в атрибуты записи')
+
+        record.msg = 'other %s'
+        self.assertEqual(record.getMessage(), 'other arg')
+        self.assertEqual(Arg.calls, 2)
+
+        self.assertIs(
+            RecordFactory(base_factory=logging.makeLogRecord).base_factory, logging.makeLogRecord,
+            'Пользовательская фабрика записей не заменяется'
+        )
+
+    def test_attrs_cache(self):
+        """
+        Проверка формирования атрибутов записи один раз для обработчиков с одинаковыми настройками.
+        """
+        record = CachedLogRecord('test', logging.INFO, __file__, 1, 'message %s', ('arg',), None)
+        first, second = TracerHandler(), TracerHandler()
+        self.assertIs(first._event_attrs, second._event_attrs)
+
+        attrs = first._event_attrs(record)
+        self.assertIs(second._event_attrs(record), attrs)
+        self.assertIsNot(TracerHandler(exclude_attrs={'args'})._event_attrs(record), attrs)
+
+        record.msg = 'other %s'
+        self.assertIsNot(first._event_attrs(record), attrs, 'Кэш сбрасывается при замене шаблона')
+
+        attrs = first._event_attrs(record)
+        record.tenant = 'tenant'
+        self.assertEqual(first._event_attrs(record)['tenant'], 'tenant', 'Кэш сбрасывается при добавлении атрибута')
+
+        with use_span(TracerProvider().get_tracer(__name__).start_span('test')) as span:
+            record.reset_cache()
+            first.emit(record)
+            second.emit(record)
+        self.assertEqual(span.events[0].attributes, span.events[1].attributes)
+
+
+    def test_pickle(self):
+        """
+        Проверка сериализации записи, подготовленной `QueueHandler`: кэш с исходными аргументами не переносится.
+        """
+        record = CachedLogRecord('test', logging.INFO, __file__, 1, 'lock %s', (Lock(),), None)
+        TracerHandler()._event_attrs(record)
+        prepared = QueueHandler(SimpleQueue()).prepare(record)
+        self.assertIsNone(prepared._message)
+        self.assertIsNone(prepared._attrs)
+
+        restored = pickle.loads(pickle.dumps(prepared))
+        self.assertIsInstance(restored, CachedLogRecord)
+        self.assertEqual(restored.getMessage(), record.getMessage())
+        self.assertIsNotNone(record._message, 'Кэш исходной записи сохраняется')
+
+
+class TestExtendLogRecord(unittest.TestCase):
+    def setUp(self) -> None:
+        self.original_factory = logging.getLogRecordFactory()
+
+    def tearDown(self) -> None:
+        PyTraceLog.reset()
+
+    def test_single_factory(self):
+        """
+        Проверка того, что повторные расширения не увеличивают цепочку фабрик.
+        """
+        PyTraceLog.extend_log_record(app_name='my_app')
+        factory = logging.getLogRecordFactory()
+        PyTraceLog.extend_log_record(env='test')
+
+        self.assertIs(logging.getLogRecordFactory(), factory)
+        self.assertIs(factory.base_factory, self.original_factory)
+
+        record = logging.makeLogRecord({'msg': 'Some message'})
+        self.assertEqual(record.app_name, 'my_app')
+        self.assertEqual(record.env, 'test')
+
+    def test_reset_restores_factory(self):
+        """
+        Проверка восстановления исходной фабрики записей после нескольких расширений.
+        """
+        PyTraceLog.extend_log_record(app_name='my_app')
+        PyTraceLog.extend_log_record(env='test')
+        PyTraceLog.reset()
+
+        self.assertIs(logging.getLogRecordFactory(), self.original_factory)
+        self.assertNotIn('app_name', logging.makeLogRecord({'msg': 'Some message'}).__dict__)
+
+
+class TestLogContext(unittest.TestCase):
+    def setUp(self) -> None:
+        self.factory = RecordFactory(base_factory=logging.LogRecord)
+
+    def make_record(self):
+        return self.factory('test', logging.INFO, __file__, 1, 'message', (), None)
+
+    def test_context_manager(self):
+        """
+        Проверка привязки атрибутов в контекстном менеджере, включая вложенные контексты.
+        """
+        with LogContext(request_id='1', tenant='a'):
+            with LogContext(user='bob'):
+                record = self.make_record()
+            self.assertEqual((record.request_id, record.tenant, record.user), ('1', 'a', 'bob'))
+            self.assertNotIn('user', self.make_record().__dict__)
+
+        self.assertEqual(get_log_context(), {})
+        self.assertNotIn('request_id', self.make_record().__dict__)
+
+    def test_bind_and_reset(self):
+        """
+        Проверка привязки атрибутов без контекстного менеджера.
+        """
+        token = bind_log_context(request_id='1')
+        self.assertEqual(self.make_record().request_id, '1')
+        reset_log_context(token)
+        self.assertEqual(get_log_context(), {})
+
+    def test_async_tasks(self):
+        """
+        Проверка изоляции атрибутов между задачами asyncio и их сохранения после await.
+        """
+        @LogContext(handler='async')
+        async def handle(request_id):
+            with LogContext(request_id=request_id):
+                await asyncio.sleep(0)
+                return self.make_record()
+
+        async def main():
+            return await asyncio.gather(*(handle(str(i)) for i in range(3)))
+
+        records = asyncio.run(main())
+        self.assertEqual([r.request_id for r in records], ['0', '1', '2'])
+        self.assertTrue(all(r.handler == 'async' for r in records))
+
+    def test_decorator(self):
+        """
+        Проверка использования в качестве декоратора синхронной функции.
+        """
+        @LogContext(job='sync')
+        def job():
+            return self.make_record()
+
+        self.assertEqual(job().job, 'sync')
+        self.assertEqual(get_log_context(), {})
+
+
+class TestPyTraceLogContext(unittest.TestCase):
+    def tearDown(self) -> None:
+        PyTraceLog.reset()
+
+    def test_logstash_and_tracer(self):
+        """
+        Проверка передачи атрибутов контекста в Logstash и в атрибуты событий трассировки.
+        """
+        with PyTraceLog.log_context(request_id='42'):
+            record = logging.makeLogRecord({'msg': 'Some message', 'levelno': logging.INFO})
+
+        payload = json.loads(LogstashFormatter(extra_prefix=None).format(record))
+        self.assertEqual(payload['request_id'], '42')
+
+        with use_span(TracerProvider().get_tracer(__name__).start_span('test')) as span:
+            TracerHandler().handle(record)
+        self.assertEqual(span.events[0].attributes['request_id'], '42')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import logging
+import unittest
+from threading import (
+    Barrier,
+    Thread,
+)
+from unittest.mock import patch
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import (
+    ALWAYS_OFF,
+    ALWAYS_ON,
+    Decision,
+    ParentBased,
+    StaticSampler,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import use_span
+
+from pytracelog.base import PyTraceLog
+from pytracelog.logging.handlers import TracerHandler
+from pytracelog.tracing.samplers import (
+    RateLimitingSampler,
+    RuleBasedSampler,
+    get_sampler,
+    parse_rules,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_threads(target, count=8):
+    barrier = Barrier(count)
+
+    def run():
+        barrier.wait()
+        target()
+
+    threads = [Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestRateLimitingSampler(unittest.TestCase):
+    def test_budget_under_load(self):
+        """
+        Проверка соблюдения лимита при одновременной выборке из нескольких потоков.
+        """
+        clock = FakeClock()
+        sampler = RateLimitingSampler(rate=10, capacity=20, clock=clock)
+        decisions = list()
+
+        def sample():
+            for _ in range(500):
+                decisions.append(sampler.should_sample(None, 1, 'span').decision)
+
+        run_threads(sample)
+        self.assertEqual(decisions.count(Decision.RECORD_AND_SAMPLE), 20, 'Выбирается не больше емкости корзины')
+
+        decisions.clear()
+        clock.now += 1.5
+        run_threads(sample)
+        self.assertEqual(decisions.count(Decision.RECORD_AND_SAMPLE), 15, 'Корзина пополняется со скоростью rate')
+
+    def test_tracer_provider(self):
+        """
+        Проверка выборки SPAN провайдером трассировки из нескольких потоков.
+        """
+        clock = FakeClock()
+        tracer = TracerProvider(
+            sampler=ParentBased(root=RateLimitingSampler(rate=5, clock=clock))
+        ).get_tracer(__name__)
+        sampled = list()
+
+        def trace():
+            for _ in range(100):
+                with tracer.start_as_current_span('root') as root:
+                    with tracer.start_as_current_span('child') as child:
+                        sampled.append((root.is_recording(), child.is_recording()))
+
+        run_threads(trace)
+        self.assertEqual(sampled.count((True, True)), 5)
+        self.assertEqual(sampled.count((False, False)), 795, 'Дочерние SPAN следуют решению для корневого')
+
+
+class TestRuleBasedSampler(unittest.TestCase):
+    def test_rules(self):
+        sampler = RuleBasedSampler(
+            rules=[('/health*', ALWAYS_OFF), ('GET /api/*', ALWAYS_ON)],
+            default=ALWAYS_OFF,
+        )
+
+        def decision(name, **attributes):
+            return sampler.should_sample(None, 1, name, attributes=attributes).decision
+
+        self.assertEqual(decision('GET /api/orders'), Decision.RECORD_AND_SAMPLE)
+        self.assertEqual(decision('GET', **{'http.route': '/health'}), Decision.DROP)
+        self.assertEqual(decision('GET', **{'http.target': '/healthz?full=1'}), Decision.DROP)
+        self.assertEqual(decision('POST /api/orders'), Decision.DROP, 'Выборка по умолчанию')
+        self.assertEqual(decision('POST /api/orders'), Decision.DROP, 'Повторная выборка по кэшу правил')
+
+    def test_parse_rules(self):
+        rules, default = parse_rules('/health*=always_off; /api/orders*=10/s;*=0.25')
+        self.assertEqual([pattern for pattern, _ in rules], ['/health*', '/api/orders*'])
+        self.assertIs(rules[0][1], ALWAYS_OFF)
+        self.assertIsInstance(rules[1][1], RateLimitingSampler)
+        self.assertEqual(rules[1][1].rate, 10)
+        self.assertIsInstance(default, TraceIdRatioBased)
+        self.assertEqual(default.rate, 0.25)
+
+        with self.assertRaises(ValueError):
+            parse_rules('always_off')
+
+
+class TestGetSampler(unittest.TestCase):
+    @patch.dict('os.environ', {
+        'OTEL_TRACES_SAMPLER': 'parentbased_ratelimiting',
+        'OTEL_TRACES_SAMPLER_ARG': '50',
+    })
+    def test_from_env(self):
+        sampler = get_sampler()
+        self.assertIsInstance(sampler, ParentBased)
+        self.assertIsInstance(sampler._root, RateLimitingSampler)
+        self.assertEqual(sampler._root.rate, 50)
+
+    def test_names(self):
+        self.assertIs(get_sampler('always_off'), ALWAYS_OFF)
+        self.assertEqual(get_sampler('parentbased_traceidratio', '0.5')._root.rate, 0.5)
+        sampler = get_sampler('rules', '/health*=always_off')
+        self.assertIsInstance(sampler, RuleBasedSampler)
+
+        with self.assertLogs('pytracelog.tracing.samplers', 'WARNING'):
+            self.assertEqual(get_sampler('unknown').get_description(), get_sampler().get_description())
+
+    @patch('opentelemetry.trace.set_tracer_provider')
+    @patch.dict('pytracelog.base.environ', {'OTEL_EXPORTER_JAEGER_AGENT_HOST': 'localhost'})
+    def test_init_tracer(self, set_tracer_provider):
+        self.addCleanup(setattr, PyTraceLog, '_span_processor', None)
+        self.addCleanup(PyTraceLog.reset)
+        PyTraceLog.init_tracer(service='test', sampler='parentbased_traceidratio', sampler_arg='0.1')
+        provider = set_tracer_provider.call_args.kwargs['tracer_provider']
+        self.addCleanup(provider.shutdown)
+        self.assertEqual(provider.sampler._root.rate, 0.1)
+
+
+class TestTracerHandlerSampling(unittest.TestCase):
+    def test_skip_unsampled(self):
+        """
+        Проверка пропуска записей для SPAN, не попавших в выборку.
+        """
+        handler = TracerHandler()
+        record = logging.makeLogRecord(dict(msg='Test logging message', levelno=logging.ERROR))
+        record_only = StaticSampler(Decision.RECORD_ONLY)
+
+        for sampler in (ALWAYS_OFF, record_only):
+            with self.subTest(sampler=sampler.get_description()):
+                tracer = TracerProvider(sampler=sampler).get_tracer(__name__)
+                with patch.object(handler, 'emit') as emit_mock:
+                    with use_span(tracer.start_span('test'), end_on_exit=True):
+                        self.assertFalse(handler.handle(record))
+                    emit_mock.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
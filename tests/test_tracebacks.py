@@ -0,0 +1,117 @@
+import sys
+import traceback
+import unittest
+
+from pytracelog.logging.tracebacks import (
+    TracebackCache,
+    TRUNCATED_MARKER,
+)
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def fail_nested(depth, message):
+    if depth:
+        fail_nested(depth - 1, message)
+    fail(message)
+
+
+def catch(func, *args):
+    try:
+        func(*args)
+    except ValueError:
+        return sys.exc_info()
+
+
+def catch_chained(message):
+    try:
+        try:
+            fail('cause')
+        except ValueError as e:
+            raise KeyError(message) from e
+    except KeyError:
+        return sys.exc_info()
+
+
+def catch_context(user):
+    try:
+        try:
+            {}[user]
+        except KeyError:
+            fail(f'unknown user {user}')
+    except ValueError:
+        return sys.exc_info()
+
+
+class TestTracebackCache(unittest.TestCase):
+    def test_format(self):
+        """
+        Проверка совпадения стека вызовов с `traceback.format_exception` и кэширования по отпечатку.
+        """
+        cache = TracebackCache()
+        for exc_info in (
+                catch(fail, 'first'), catch(fail, 'second'), catch_chained('key'),
+                catch_context('alice'), catch_context('bob'),
+        ):
+            entry = cache.get(*exc_info)
+            self.assertEqual(
+                cache.format(entry, *exc_info[:2]) + '\n', ''.join(traceback.format_exception(*exc_info))
+            )
+        self.assertEqual((cache.hits, cache.misses), (2, 3), 'Текст исключения не входит в отпечаток')
+        bob = catch_context('bob')
+        self.assertNotIn('alice', cache.format(cache.get(*bob), *bob[:2]), 'Тексты цепочки формируются заново')
+
+        first, other_line = cache.get(*catch(fail, 'third')), cache.get(*catch(fail_nested, 0, 'third'))
+        self.assertNotEqual(first.fingerprint, other_line.fingerprint)
+        self.assertEqual(len(first.fingerprint), 16)
+
+    def test_limits(self):
+        """
+        Проверка ограничения количества кадров и длины стека вызовов.
+        """
+        exc_info = catch(fail_nested, 10, 'nested')
+        cache = TracebackCache(max_frames=2, max_length=100)
+        text = cache.format(cache.get(*exc_info), *exc_info[:2])
+        self.assertEqual(text.count('File '), 2)
+        self.assertIn('in fail\n', text, 'Сохраняются кадры, ближайшие к месту исключения')
+
+        truncated = cache.truncate(text)
+        self.assertEqual(len(truncated), 100)
+        self.assertTrue(truncated.startswith(TRUNCATED_MARKER))
+        self.assertTrue(truncated.endswith('ValueError: nested'))
+
+        exc_info = catch_context('bob')
+        text = cache.format(cache.get(*exc_info), *exc_info[:2])
+        self.assertEqual(text.count('File '), 3, 'Количество кадров ограничивается для каждого исключения цепочки')
+        self.assertIn("KeyError: 'bob'\n\nDuring handling of the above exception", text)
+
+        with self.assertRaises(ValueError):
+            TracebackCache(max_frames=0)
+
+    def test_eviction(self):
+        """
+        Проверка вытеснения записей по количеству и суммарной длине стеков вызовов.
+        """
+        exc_infos = [catch(fail_nested, depth, 'message') for depth in range(4)]
+
+        cache = TracebackCache(max_entries=2)
+        entries = [cache.get(*exc_info) for exc_info in exc_infos]
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertIs(cache.get(*exc_infos[3]), entries[3])
+        self.assertIsNot(cache.get(*exc_infos[0]), entries[0], 'Давно не использованная запись вытеснена')
+
+        size = entries[1].size
+        cache = TracebackCache(max_size=size)
+        cache.get(*exc_infos[0])
+        cache.get(*exc_infos[1])
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertLessEqual(cache.stats()['size'], size)
+        self.assertIsNot(
+            cache.get(*exc_infos[3]), cache.get(*exc_infos[3]), 'Стек длиннее ограничения не кэшируется'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from pytracelog.utils import (
+    PathMatcher,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_consume(self):
+        """
+        Проверка расхода и пополнения маркеров.
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+        self.assertEqual([bucket.consume() for _ in range(4)], [True, True, True, False])
+
+        clock.now += 1.0
+        self.assertEqual([bucket.consume() for _ in range(3)], [True, True, False])
+
+        clock.now += 10.0
+        self.assertEqual(sum(bucket.consume() for _ in range(10)), 3, 'Емкость корзины ограничивает всплеск')
+
+    def test_default_capacity(self):
+        """
+        Проверка емкости корзины по умолчанию.
+        """
+        self.assertEqual(TokenBucket(rate=0.5).capacity, 1.0)
+        self.assertEqual(TokenBucket(rate=100).capacity, 100.0)
+
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=-1)
+
+
+
+class TestPathMatcher(unittest.TestCase):
+    def test_match(self):
+        """
+        Проверка точного совпадения и совпадения по префиксу.
+        """
+        matcher = PathMatcher(('/health', '/ready/', '/static/*'))
+        for path in ('/health', '/health/', '/ready', '/static/', '/static/app.js'):
+            self.assertTrue(matcher(path), path)
+        for path in ('/healthz', '/health/live', '/', '/static', '/api/static/app.js'):
+            self.assertFalse(matcher(path), path)
+
+        self.assertFalse(PathMatcher())
+        self.assertFalse(PathMatcher()('/health'))
+
+
+if __name__ == '__main__':
+    unittest.main()